@@ -1,9 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.database import AttendanceDB
+from src.periods import month_key, week_key
 import sqlite3
 from datetime import datetime, timedelta
-import json
 import sys
 import os
 # This adds the root directory to the search path
@@ -26,21 +26,6 @@ app.add_middleware(
 
 db = AttendanceDB()
 
-# Path fix for Vercel environment
-STAFF_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'staff_registry.json')
-
-def load_staff_registry():
-    """Load staff registry from JSON file"""
-    try:
-        if not os.path.exists(STAFF_REGISTRY_PATH):
-            return []
-        with open(STAFF_REGISTRY_PATH, 'r') as f:
-            data = json.load(f)
-            return data.get('staff', [])
-    except Exception as e:
-        print(f"⚠️ Error loading registry: {e}")
-        return []
-
 @app.get("/")
 def root():
     return {"message": "WiBiz Attendance API", "status": "running on Vercel"}
@@ -51,12 +36,14 @@ def get_today_attendance():
     cursor = conn.cursor()
     pst_now = db.get_current_pst_time()
     today = pst_now.strftime('%Y-%m-%d')
+    # Names live in staff; attendance carries only user_id
     cursor.execute('''
-        SELECT name, time_in, time_out, break_start, break_end, 
-               break_duration, hours_worked, status
-        FROM attendance
-        WHERE date = ?
-        ORDER BY time_in
+        SELECT s.name, a.time_in, a.time_out, a.break_start, a.break_end,
+               a.break_duration, a.hours_worked, a.status
+        FROM attendance a
+        LEFT JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date = ?
+        ORDER BY a.time_in
     ''', (today,))
     results = cursor.fetchall()
     conn.close()
@@ -70,16 +57,22 @@ def get_attendance_count():
     cursor = conn.cursor()
     pst_now = db.get_current_pst_time()
     today = pst_now.strftime('%Y-%m-%d')
-    cursor.execute('SELECT DISTINCT user_id FROM attendance WHERE date = ?', (today,))
-    present_ids = {row[0] for row in cursor.fetchall()}
+    # Present/absent in one anti-join against the staff table (see scripts/sync_staff_registry.py)
+    cursor.execute('''
+        SELECT s.user_id, s.name, s.role, s.active, p.user_id IS NOT NULL
+        FROM staff s
+        LEFT JOIN (SELECT DISTINCT user_id FROM attendance WHERE date = ?) p
+               ON p.user_id = s.user_id
+        WHERE s.active
+        ORDER BY s.position, s.name
+    ''', (today,))
+    rows = cursor.fetchall()
     conn.close()
-    all_staff = load_staff_registry()
-    active_staff = [s for s in all_staff if s.get('active')]
-    present = [s for s in active_staff if s['user_id'] in present_ids]
-    absent = [s for s in active_staff if s['user_id'] not in present_ids]
+    present = [{"user_id": r[0], "name": r[1], "role": r[2], "active": bool(r[3])} for r in rows if r[4]]
+    absent = [{"user_id": r[0], "name": r[1], "role": r[2], "active": bool(r[3])} for r in rows if not r[4]]
     return {
         "date": today,
-        "total_staff": len(active_staff),
+        "total_staff": len(rows),
         "present_count": len(present),
         "absent_count": len(absent),
         "present": present,
@@ -109,14 +102,14 @@ def get_weekly_summary():
     conn = sqlite3.connect(db.db_file)
     cursor = conn.cursor()
     pst_now = db.get_current_pst_time()
-    twelve_weeks_ago = (pst_now - timedelta(weeks=12)).strftime('%Y-%m-%d')
+    twelve_weeks_ago = (pst_now - timedelta(weeks=12)).date()
     cursor.execute('''
-        SELECT strftime('%Y-W%W', date) as week, MIN(date), MAX(date),
+        SELECT week_key as week, MIN(date), MAX(date),
                COUNT(DISTINCT user_id), COUNT(DISTINCT date || user_id),
                SUM(hours_worked), AVG(hours_worked)
-        FROM attendance WHERE date >= ? AND status = 'complete'
+        FROM attendance WHERE status = 'complete' AND week_key >= ?
         GROUP BY week ORDER BY week DESC
-    ''', (twelve_weeks_ago,))
+    ''', (week_key(twelve_weeks_ago),))
     results = cursor.fetchall()
     conn.close()
     data = [{"week": r[0], "week_start": r[1], "week_end": r[2], "unique_staff": r[3],
@@ -128,14 +121,14 @@ def get_monthly_summary():
     conn = sqlite3.connect(db.db_file)
     cursor = conn.cursor()
     pst_now = db.get_current_pst_time()
-    twelve_months_ago = (pst_now - timedelta(days=365)).strftime('%Y-%m-%d')
+    twelve_months_ago = (pst_now - timedelta(days=365)).date()
     cursor.execute('''
-        SELECT strftime('%Y-%m', date) as month, COUNT(DISTINCT user_id),
+        SELECT month_key as month, COUNT(DISTINCT user_id),
                COUNT(DISTINCT date || user_id), SUM(hours_worked),
                AVG(hours_worked), SUM(break_duration)
-        FROM attendance WHERE date >= ? AND status = 'complete'
+        FROM attendance WHERE status = 'complete' AND month_key >= ?
         GROUP BY month ORDER BY month DESC
-    ''', (twelve_months_ago,))
+    ''', (month_key(twelve_months_ago),))
     results = cursor.fetchall()
     conn.close()
     data = []
@@ -153,9 +146,11 @@ def get_week_attendance():
     pst_now = db.get_current_pst_time()
     monday = (pst_now.date() - timedelta(days=pst_now.date().weekday())).strftime('%Y-%m-%d')
     cursor.execute('''
-        SELECT name, SUM(hours_worked), COUNT(*)
-        FROM attendance WHERE date >= ? AND status = 'complete'
-        GROUP BY name ORDER BY SUM(hours_worked) DESC
+        SELECT MAX(s.name), SUM(a.hours_worked), COUNT(*)
+        FROM attendance a
+        LEFT JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date >= ? AND a.status = 'complete'
+        GROUP BY a.user_id ORDER BY SUM(a.hours_worked) DESC
     ''', (monday,))
     results = cursor.fetchall()
     conn.close()
@@ -168,7 +163,12 @@ def get_today_tasks():
     cursor = conn.cursor()
     pst_now = db.get_current_pst_time()
     today = pst_now.strftime('%Y-%m-%d')
-    cursor.execute('SELECT name, task_description, deliverable_url, created_at FROM tasks WHERE date = ? ORDER BY created_at DESC', (today,))
+    cursor.execute('''
+        SELECT s.name, t.task_description, t.deliverable_url, t.created_at
+        FROM tasks t
+        LEFT JOIN staff s ON s.user_id = t.user_id
+        WHERE t.date = ? ORDER BY t.created_at DESC
+    ''', (today,))
     results = cursor.fetchall()
     conn.close()
     data = [{"name": r[0], "task": r[1], "url": r[2], "created_at": r[3]} for r in results]
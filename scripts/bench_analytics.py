@@ -0,0 +1,157 @@
+"""
+Benchmark the vectorized analytics engine (src/analytics.py) at 10M rows.
+
+Synthesizes attendance columns directly as NumPy arrays (default 10M rows:
+1,100 staff over ~35 years, 5% night shifts that end past midnight), then times:
+
+  metrics     every /api/analytics/* computation over all rows and over a
+              one-year / one-person slice
+  baseline    the same hours percentile, arrival histogram and heatmap in
+              plain Python over --baseline-rows rows, extrapolated to --rows
+  convert     driver rows -> column arrays (the full-reload path), per 100k rows
+  snapshot    .npz save and load of the full column set
+
+Run:
+    python scripts/bench_analytics.py
+    python scripts/bench_analytics.py --rows 1000000 --baseline-rows 100000 --json out.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.analytics import (COMPLETE, AttendanceColumns, arrival_distribution, break_distribution,
+                           hours_distribution, person_trends, select, weekly_heatmap)
+
+
+def synthesize(n_rows, n_staff, seed=42):
+    rng = np.random.default_rng(seed)
+    last_day = date(2026, 10, 16).toordinal()
+    time_in = rng.normal(8.5 * 60, 45, n_rows).clip(0, 1439).astype(np.int16)
+    night = rng.random(n_rows) < 0.05
+    time_in[night] = rng.integers(20 * 60, 23 * 60, night.sum())
+    worked = rng.normal(8 * 60, 40, n_rows).clip(60, 14 * 60).astype(np.int32)
+    breaks = np.where(rng.random(n_rows) < 0.7, rng.integers(10, 75, n_rows), 0)
+    status = np.full(n_rows, COMPLETE, dtype=np.int8)
+    status[rng.random(n_rows) < 0.01] = 0
+    return AttendanceColumns(
+        [str(1000000000000000000 + i) for i in range(n_staff)],
+        user=rng.integers(0, n_staff, n_rows),
+        day=last_day - rng.integers(0, n_rows // n_staff * 7 // 5 + 1, n_rows),
+        time_in=time_in,
+        time_out=((time_in + worked + breaks) % 1440).astype(np.int16),
+        hours=(worked / 60).astype(np.float32),
+        break_hours=(breaks / 60).astype(np.float32),
+        status=status,
+    )
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 1)
+
+
+# ─── Plain-Python baseline ───────────────────────────────────────────────────
+
+def python_metrics(rows):
+    hours = sorted(h for _, _, _, _, h, _, s in rows if s == COMPLETE)
+    median = hours[len(hours) // 2]
+    arrivals = {}
+    heat = [[0.0] * 24 for _ in range(7)]
+    for user, day, t_in, t_out, h, b, s in rows:
+        if s != COMPLETE:
+            continue
+        arrivals[t_in // 15] = arrivals.get(t_in // 15, 0) + 1
+        end = t_out if t_out >= t_in else t_out + 1440
+        weekday = (day - 1) % 7
+        for minute in range(t_in, end, 60):
+            slot = minute // 60
+            heat[(weekday + slot // 24) % 7][slot % 24] += (min(end, (slot + 1) * 60) - minute) / 60
+    return median, arrivals, heat
+
+
+def main(args):
+    print(f"🧪 Synthesizing {args.rows:,} rows for {args.staff:,} staff...")
+    columns = synthesize(args.rows, args.staff)
+    nbytes = sum(getattr(columns, name).nbytes for name in
+                 ('user', 'day', 'time_in', 'time_out', 'hours', 'break_hours', 'status'))
+    print(f"📦 Columns: {nbytes / 1e6:.0f} MB ({nbytes / args.rows:.0f} B/row)")
+
+    last = date.fromordinal(int(columns.day.max()))
+    everything = select(columns)
+    one_year = select(columns, last - timedelta(days=365), last)
+    one_person = select(columns, user_id=columns.users[0])
+
+    results = {'rows': args.rows, 'staff': args.staff, 'bytes_per_row': nbytes / args.rows, 'metrics_ms': {}}
+    metrics = {
+        'select (all filters)': lambda: select(columns, last - timedelta(days=365), last, columns.users[0]),
+        'arrivals': lambda: arrival_distribution(columns, everything),
+        'heatmap': lambda: weekly_heatmap(columns, everything),
+        'hours': lambda: hours_distribution(columns, everything),
+        'breaks': lambda: break_distribution(columns, everything),
+        'trends (month)': lambda: person_trends(columns, everything, "month"),
+        'heatmap (1 year)': lambda: weekly_heatmap(columns, one_year),
+        'trends (1 person)': lambda: person_trends(columns, one_person, "month"),
+    }
+    for label, fn in metrics.items():
+        ms = timed(fn, args.repeat)
+        results['metrics_ms'][label] = ms
+        print(f"⚡ {label:<22} {ms:>9.1f} ms")
+
+    n = min(args.baseline_rows, args.rows)
+    sample = list(zip(*(getattr(columns, name)[:n].tolist() for name in
+                        ('user', 'day', 'time_in', 'time_out', 'hours', 'break_hours', 'status'))))
+    started = time.perf_counter()
+    python_metrics(sample)
+    python_ms = (time.perf_counter() - started) * 1000 * args.rows / n
+    vector_ms = (results['metrics_ms']['hours'] + results['metrics_ms']['arrivals']
+                 + results['metrics_ms']['heatmap'])
+    results['python_baseline_ms'] = round(python_ms, 1)
+    print(f"🐢 Plain Python hours+arrivals+heatmap: ~{python_ms:,.0f} ms at {args.rows:,} rows "
+          f"(measured on {n:,}) → {python_ms / vector_ms:.0f}x slower")
+
+    # Full-reload conversion cost, measured on driver-shaped rows
+    driver_rows = [(str(1000000000000000000 + i % args.staff),
+                    (date(2020, 1, 1) + timedelta(days=i % 2000)).isoformat(),
+                    f"{7 + i % 4}:{i % 60:02d} AM", f"{4 + i % 3}:{i % 60:02d} PM",
+                    8.25, 0.5, 'complete') for i in range(100000)]
+    convert_ms = timed(lambda: AttendanceColumns().rows_to_arrays(driver_rows), args.repeat)
+    results['convert_ms_per_100k'] = convert_ms
+    print(f"🔄 Row conversion: {convert_ms:.0f} ms per 100k rows "
+          f"(~{convert_ms * args.rows / 100000 / 1000:.1f} s for a full reload, excluding the query)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'snapshot.npz')
+        save_ms = timed(lambda: columns.save(path, high_water=0, version=0), 1)
+        load_ms = timed(lambda: AttendanceColumns.load(path), args.repeat)
+        size = os.path.getsize(path)
+    results.update(snapshot_save_ms=save_ms, snapshot_load_ms=load_ms, snapshot_bytes=size)
+    print(f"💾 Snapshot: save {save_ms:.0f} ms, load {load_ms:.0f} ms, {size / 1e6:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vectorized analytics benchmark')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--staff', type=int, default=1100)
+    parser.add_argument('--baseline-rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    main(parser.parse_args())
@@ -0,0 +1,168 @@
+"""
+Benchmark the async API against the previous sync (threadpool) implementation.
+
+Seeds a throwaway SQLite database, then drives the two hottest dashboard
+endpoints — /api/attendance/today and /api/stats — in-process over ASGI with
+50, 200 and 1000 concurrent clients. The "sync" app is the old implementation:
+plain `def` routes doing blocking sqlite3 calls, which FastAPI runs on its
+limited threadpool. The "async" app is src/api.py.
+
+Run:
+    python scripts/bench_api_async.py
+    python scripts/bench_api_async.py --staff 100 --days 365 --concurrency 50 200 1000 --json out.json
+
+Dependencies:
+    pip install httpx aiosqlite
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+from datetime import timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+from fastapi import FastAPI
+
+from scripts.seed_synthetic_data import seed
+from src.async_db import AsyncDB
+import src.api as async_api
+
+ENDPOINTS = ['/api/attendance/today', '/api/stats']
+
+
+def build_sync_app(db_file):
+    """The pre-async endpoints, kept verbatim in spirit for comparison."""
+    app = FastAPI()
+    tz_db = async_api.db
+
+    @app.get("/api/attendance/today")
+    def get_today_attendance():
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        today = tz_db.get_current_pst_time().strftime('%Y-%m-%d')
+        cursor.execute('''
+            SELECT s.name, a.time_in, a.time_out, a.break_start, a.break_end,
+                   a.break_duration, a.hours_worked, a.status
+            FROM attendance a JOIN staff s ON s.user_id = a.user_id
+            WHERE a.date = ? ORDER BY a.time_in
+        ''', (today,))
+        results = cursor.fetchall()
+        conn.close()
+        keys = ("name", "time_in", "time_out", "break_start", "break_end",
+                "break_duration", "hours_worked", "status")
+        return {"data": [dict(zip(keys, row)) for row in results]}
+
+    @app.get("/api/stats")
+    def get_stats():
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        today = tz_db.get_current_pst_time().date()
+        monday = (today - timedelta(days=today.weekday())).strftime('%Y-%m-%d')
+        today = today.strftime('%Y-%m-%d')
+        cursor.execute('SELECT COUNT(*) FROM attendance')
+        total_attendance = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM tasks')
+        total_tasks = cursor.fetchone()[0]
+        cursor.execute("SELECT SUM(hours_worked) FROM attendance WHERE status = 'complete'")
+        total_hours = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT SUM(hours_worked) FROM attendance WHERE date >= ? AND status = 'complete'", (monday,))
+        week_hours = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM attendance WHERE date = ? AND status = 'clocked_in'", (today,))
+        currently_working = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM attendance WHERE date = ? AND status = 'on_break'", (today,))
+        on_break = cursor.fetchone()[0]
+        conn.close()
+        return {"total_attendance": total_attendance, "total_tasks": total_tasks,
+                "total_hours": round(total_hours, 1), "week_hours": round(week_hours, 1),
+                "currently_working": currently_working, "on_break": on_break}
+
+    return app
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+async def run_load(app, path, concurrency, total_requests):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total_requests))
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total_requests,
+        'errors': errors,
+        'rps': round(total_requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+        counts = seed(db_file, args.staff, args.days)
+        print(f"🌱 Seeded {counts['attendance']} attendance rows, {counts['tasks']} tasks")
+
+        async_api.db.db_file = db_file
+        async_api.adb = AsyncDB(db_file=db_file, pool_size=args.pool_size)
+        apps = {'sync': build_sync_app(db_file), 'async': async_api.app}
+
+        results = []
+        for path in ENDPOINTS:
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency * 2)
+                for label, app in apps.items():
+                    stats = await run_load(app, path, concurrency, total)
+                    stats.update({'impl': label, 'endpoint': path, 'concurrency': concurrency})
+                    results.append(stats)
+                    print(f"{path:<26} c={concurrency:<5} {label:<5} "
+                          f"{stats['rps']:>9} req/s  p50 {stats['p50_ms']:>8} ms  "
+                          f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+                          f"errors {stats['errors']}")
+
+        await async_api.adb.close()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sync vs async API throughput/latency benchmark')
+    parser.add_argument('--staff', type=int, default=50)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint/concurrency/impl run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--json', help='Write raw results to this JSON file')
+    asyncio.run(main(parser.parse_args()))
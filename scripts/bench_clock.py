@@ -0,0 +1,177 @@
+"""
+Check and benchmark the table-driven clock parser (src/clock.py) against strptime.
+
+  equivalence   every minute of the day (1440) in every spelling strptime's
+                '%I:%M %p' accepts (leading zero or not, any case) parses to
+                the same minute; no-space and 24-hour spellings agree with
+                '%I:%M%p' / '%H:%M'; calculate_hours matches the old strptime
+                implementation for every start minute against every 7th end
+                minute (~300k pairs), and save_break_end's duration math too
+  speed         single parse (the bot's old strip/re.sub/upper + strptime path
+                vs parse_clock), calculate_hours old vs new, and the batch
+                form over --rows history values vs a strptime loop
+
+Exits 1 if any equivalence check fails or a speedup is below --min-speedup.
+
+Run:
+    python scripts/bench_clock.py
+    python scripts/bench_clock.py --rows 1000000 --json out.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.clock import CLOCK_LABELS, clock_span, parse_clock, parse_clocks
+from src.utils import calculate_hours
+
+
+# ─── The strptime implementations being replaced ─────────────────────────────
+
+def legacy_parse(captured):
+    text = re.sub(r'\s+', ' ', captured.strip()).upper()
+    parsed = datetime.strptime(text, '%I:%M %p')
+    return parsed.hour * 60 + parsed.minute
+
+
+def legacy_calculate_hours(time_in_str, time_out_str):
+    try:
+        time_in = datetime.strptime(time_in_str.strip(), '%I:%M %p')
+        time_out = datetime.strptime(time_out_str.strip(), '%I:%M %p')
+        if time_out < time_in:
+            time_out = time_out + timedelta(hours=24)
+        return round((time_out - time_in).total_seconds() / 3600, 2)
+    except Exception:
+        return 0.0
+
+
+def legacy_break_duration(break_start, break_end):
+    try:
+        start = datetime.strptime(break_start, '%I:%M %p')
+        end = datetime.strptime(break_end, '%I:%M %p')
+        if end < start:
+            end = end + timedelta(hours=24)
+        return (end - start).total_seconds() / 3600
+    except Exception:
+        return 0
+
+
+def spellings(minute):
+    """(text, strptime format) pairs for one minute of the day."""
+    hour, m = divmod(minute, 60)
+    hour12 = (hour % 12) or 12
+    marker = 'AM' if hour < 12 else 'PM'
+    for h in {str(hour12), f"{hour12:02d}"}:
+        for case in (marker, marker.lower(), marker.title()):
+            yield f"{h}:{m:02d} {case}", '%I:%M %p'
+            yield f"{h}:{m:02d}{case}", '%I:%M%p'
+    yield f"{hour:02d}:{m:02d}", '%H:%M'
+    yield f"{hour}:{m:02d}", '%H:%M'
+
+
+# ─── Checks ──────────────────────────────────────────────────────────────────
+
+def check_equivalence():
+    failures = []
+    checked = 0
+    for minute in range(1440):
+        for text, fmt in spellings(minute):
+            parsed = datetime.strptime(text, fmt)
+            checked += 1
+            if parse_clock(text) != parsed.hour * 60 + parsed.minute:
+                failures.append(f"{text!r}: {parse_clock(text)} != strptime {parsed.time()}")
+        if legacy_parse(f" {CLOCK_LABELS[minute].lower()} ") != parse_clock(f" {CLOCK_LABELS[minute].lower()} "):
+            failures.append(f"padded {CLOCK_LABELS[minute]!r} differs")
+    print(f"{'✅' if not failures else '❌'} parse_clock: {checked:,} spellings of all 1440 minutes")
+
+    pairs = 0
+    for start in range(1440):
+        for end in range(0, 1440, 7):
+            pairs += 1
+            old = legacy_calculate_hours(CLOCK_LABELS[start], CLOCK_LABELS[end])
+            new = calculate_hours(CLOCK_LABELS[start], CLOCK_LABELS[end])
+            if old != new:
+                failures.append(f"calculate_hours({CLOCK_LABELS[start]!r}, {CLOCK_LABELS[end]!r}): {new} != {old}")
+            old = legacy_break_duration(CLOCK_LABELS[start], CLOCK_LABELS[end])
+            new = clock_span(start, end) / 60
+            if abs(old - new) > 1e-9:
+                failures.append(f"break duration {CLOCK_LABELS[start]!r}-{CLOCK_LABELS[end]!r}: {new} != {old}")
+    print(f"{'✅' if not failures else '❌'} calculate_hours / break duration: {pairs:,} pairs")
+
+    for text in ('13:05 PM', '0:30 AM', '9:5 PM', 'noon', '', None):
+        if parse_clock(text) is not None:
+            failures.append(f"{text!r} should not parse")
+    return failures
+
+
+def per_call(fn, inputs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for args in inputs:
+            fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best / len(inputs) * 1e9
+
+
+def main(args):
+    failures = check_equivalence()
+    for failure in failures[:20]:
+        print(f"   {failure}")
+
+    rng = random.Random(42)
+    captured = [(rng.choice([CLOCK_LABELS[m], CLOCK_LABELS[m].lower(), CLOCK_LABELS[m].replace(' ', '  ')]),)
+                for m in (rng.randrange(1440) for _ in range(20000))]
+    pairs = [(CLOCK_LABELS[rng.randrange(1440)], CLOCK_LABELS[rng.randrange(1440)]) for _ in range(20000)]
+
+    results = {'equivalence_failures': len(failures), 'ns_per_call': {}, 'speedup': {}}
+    comparisons = {
+        'parse': (legacy_parse, parse_clock, captured),
+        'calculate_hours': (legacy_calculate_hours, calculate_hours, pairs),
+    }
+    for name, (old_fn, new_fn, inputs) in comparisons.items():
+        old_ns = per_call(old_fn, inputs, args.repeat)
+        new_ns = per_call(new_fn, inputs, args.repeat)
+        results['ns_per_call'][name] = {'strptime': round(old_ns, 1), 'table': round(new_ns, 1)}
+        results['speedup'][name] = round(old_ns / new_ns, 1)
+        print(f"⚡ {name:<16} strptime {old_ns:>8,.0f} ns  table {new_ns:>6,.0f} ns  → {old_ns / new_ns:.1f}x")
+
+    history = [CLOCK_LABELS[rng.randrange(1440)] for _ in range(args.rows)]
+    started = time.perf_counter()
+    for text in history:
+        parsed = datetime.strptime(text, '%I:%M %p')
+        parsed.hour * 60 + parsed.minute
+    old_s = time.perf_counter() - started
+    started = time.perf_counter()
+    minutes = parse_clocks(history)
+    new_s = time.perf_counter() - started
+    results['batch'] = {'rows': args.rows, 'strptime_s': round(old_s, 3), 'table_s': round(new_s, 3)}
+    results['speedup']['batch'] = round(old_s / new_s, 1)
+    print(f"⚡ {'batch':<16} strptime {old_s:>8.2f} s   table {new_s:>6.3f} s  → {old_s / new_s:.1f}x "
+          f"({args.rows:,} rows, {minutes.nbytes / 1e6:.0f} MB int16)")
+
+    slow = {name: speedup for name, speedup in results['speedup'].items() if speedup < args.min_speedup}
+    if slow:
+        print(f"❌ Below {args.min_speedup:g}x: {slow}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    return 1 if failures or slow else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Clock parser equivalence check and benchmark')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='History values for the batch comparison')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-speedup', type=float, default=10.0)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+Benchmark the payroll engine (src/payroll.py) on a full year for 500 staff.
+
+Builds a synthetic SQLite database (reused across runs when it exists):
+every weekday each person works a day shift or, 15% of the time, a night
+shift starting 8-11 PM that ends past midnight, with 9-11 hour spans so
+overtime and night differential both show up. Then times run_payroll for
+the whole year in-process and with a process pool, checks both give the
+same numbers, and reports rows per second.
+
+Run:
+    python scripts/bench_payroll.py
+    python scripts/bench_payroll.py --staff 500 --days 365 --workers 4 --json out.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, datetime, timedelta
+
+import pytz
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AttendanceDB
+from src.payroll import load_rules, run_payroll, totals
+from scripts.seed_synthetic_data import fmt_12hr, staff_ids
+
+LAST_DAY = date(2026, 10, 16)
+
+
+def shifts(n_staff, n_days, seed=42):
+    rng = random.Random(seed)
+    for offset in range(n_days - 1, -1, -1):
+        day = LAST_DAY - timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        for user_id in staff_ids(n_staff):
+            if rng.random() < 0.05:
+                continue
+            start = rng.randint(20 * 60, 23 * 60) if rng.random() < 0.15 else rng.randint(7 * 60, 10 * 60)
+            end = start + rng.randint(9 * 60, 11 * 60)
+            b_start = start + rng.randint(180, 300)
+            b_len = rng.randint(30, 60)
+            yield (user_id, day.isoformat(), fmt_12hr(start), fmt_12hr(end), fmt_12hr(b_start),
+                   fmt_12hr(b_start + b_len), round(b_len / 60, 4),
+                   round((end - start - b_len) / 60, 2), 'complete')
+
+
+def build(db_file, n_staff, n_days):
+    AttendanceDB(db_file=db_file)
+    conn = sqlite3.connect(db_file)
+    conn.executemany('''
+        INSERT OR IGNORE INTO staff (user_id, name, active, position, updated_at)
+        VALUES (?, ?, TRUE, ?, ?)
+    ''', [(user_id, f"Staff {idx:04d}", 1000 + idx, datetime.now(pytz.utc).isoformat())
+          for idx, user_id in enumerate(staff_ids(n_staff))])
+    conn.executemany('''
+        INSERT INTO attendance (user_id, date, time_in, time_out, break_start, break_end,
+                                break_duration, hours_worked, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', shifts(n_staff, n_days))
+    conn.commit()
+    rows = conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+    conn.close()
+    return rows
+
+
+def main(args):
+    db_file = os.path.abspath(args.db)
+    if not os.path.exists(db_file):
+        print(f"🧪 Building {args.staff} staff x {args.days} days in {db_file}...")
+        started = time.perf_counter()
+        build(db_file, args.staff, args.days)
+        print(f"   done in {time.perf_counter() - started:.1f}s")
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+    conn.close()
+
+    date_from, date_to = LAST_DAY - timedelta(days=args.days - 1), LAST_DAY
+    rules = load_rules()
+    rules['base_rate'] = 100.0
+    results = {'rows': rows, 'staff': args.staff, 'days': args.days, 'seconds': {}}
+    outputs = {}
+    for label, workers in (('in-process', 1), (f'{args.workers} workers', args.workers)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            outputs[label] = run_payroll(db_file, date_from, date_to, rules, workers=workers)
+            best = min(best, time.perf_counter() - started)
+        results['seconds'][label] = round(best, 3)
+        print(f"⚡ {label:<14} {best:6.2f} s  ({rows / best:,.0f} rows/s, {len(outputs[label])} employees)")
+
+    first, second = outputs.values()
+    results['identical'] = first == second
+    print("✅ Pool and in-process results match" if first == second else "❌ Results differ")
+    results['totals'] = totals(first)
+    print(f"📋 {results['totals']}")
+    print(f"ℹ️  {os.cpu_count()} CPU(s) available")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Payroll engine benchmark')
+    parser.add_argument('--db', default='/tmp/bench_payroll.db', help='SQLite file (built if missing)')
+    parser.add_argument('--staff', type=int, default=500)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    main(parser.parse_args())
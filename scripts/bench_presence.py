@@ -0,0 +1,225 @@
+"""
+Benchmark the presence bitmaps (src/presence.py) against SQL over the raw table.
+
+Builds a synthetic SQLite database, reused when it exists: 1,000 staff x 5
+years of weekdays. Each person has their own absence rate (2-14%), nobody
+works a handful of holidays, and everyone is in on the first day, so the
+bitmaps' "expected since first clock-in" matches the SQL baseline. It then
+answers the same questions both ways, checks that the answers agree, and
+reports the timings:
+
+  rates       present/absent days and attendance rate per person, whole range
+  mondays     who was absent on more than 3 Mondays in the last year
+  streaks     longest run of consecutive open days present (gaps-and-islands SQL)
+  day         who was missing on one day
+
+It also reports the cost of one bitmap update at clock-in, the bitmap
+rebuild time, and storage.
+
+Run:
+    python scripts/bench_presence.py
+    python scripts/bench_presence.py --staff 1000 --years 5 --repeat 5 --json out.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import contextlib
+from datetime import date, datetime, timedelta
+
+import pytz
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AttendanceDB
+from scripts.seed_synthetic_data import staff_ids
+
+LAST_DAY = date(2026, 10, 16)
+
+# Weekdays only; person p misses day n when a hash of (p, n) falls under
+# their rate; every 97th day is a holiday for everyone; day 0 nobody misses
+ATTENDANCE_LOAD_SQL = '''
+    WITH RECURSIVE d(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM d WHERE n < :days - 1),
+    p(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM p WHERE i < :staff - 1)
+    INSERT INTO attendance (user_id, date, time_in, time_out, hours_worked, status)
+    SELECT CAST(1000000000000000000 + i AS TEXT), date(:first_day, '+' || n || ' days'),
+           '9:00 AM', '5:00 PM', 8.0, 'complete'
+    FROM d, p
+    WHERE strftime('%w', date(:first_day, '+' || n || ' days')) NOT IN ('0', '6')
+      AND n % 97 <> 50
+      AND (n = 0 OR (((i + 1) * (n + 7) * 2654435761) % 4294967296) / 65536 % 100 >= 2 + i % 13)
+'''
+
+RATES_SQL = '''
+    WITH open_days AS (
+        SELECT DISTINCT date FROM attendance
+        WHERE date >= ? AND date <= ? AND strftime('%w', date) NOT IN ('0', '6')
+    )
+    SELECT a.user_id, COUNT(DISTINCT a.date), (SELECT COUNT(*) FROM open_days)
+    FROM attendance a JOIN open_days o ON o.date = a.date
+    GROUP BY a.user_id
+'''
+
+MONDAYS_SQL = '''
+    WITH mondays AS (
+        SELECT DISTINCT date FROM attendance
+        WHERE date >= ? AND date <= ? AND strftime('%w', date) = '1'
+    )
+    SELECT s.user_id, (SELECT COUNT(*) FROM mondays) - COUNT(DISTINCT a.date) AS absent
+    FROM staff s
+    LEFT JOIN attendance a ON a.user_id = s.user_id AND a.date IN (SELECT date FROM mondays)
+    WHERE s.active
+    GROUP BY s.user_id
+    HAVING absent > ?
+'''
+
+STREAKS_SQL = '''
+    WITH open_days AS (
+        SELECT date, ROW_NUMBER() OVER (ORDER BY date) AS n FROM (
+            SELECT DISTINCT date FROM attendance
+            WHERE date >= ? AND date <= ? AND strftime('%w', date) NOT IN ('0', '6')
+        )
+    ),
+    present AS (
+        SELECT DISTINCT a.user_id, o.n FROM attendance a JOIN open_days o ON o.date = a.date
+    ),
+    islands AS (
+        SELECT user_id, n - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY n) AS island FROM present
+    )
+    SELECT user_id, MAX(length) FROM (
+        SELECT user_id, COUNT(*) AS length FROM islands GROUP BY user_id, island
+    ) GROUP BY user_id
+'''
+
+DAY_SQL = '''
+    SELECT s.user_id FROM staff s
+    WHERE s.active AND NOT EXISTS (SELECT 1 FROM attendance a WHERE a.user_id = s.user_id AND a.date = ?)
+'''
+
+
+def build(db_file, n_staff, n_days):
+    with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        AttendanceDB(db_file=db_file)
+    conn = sqlite3.connect(db_file)
+    conn.executemany('''
+        INSERT OR IGNORE INTO staff (user_id, name, active, position, updated_at)
+        VALUES (?, ?, TRUE, ?, ?)
+    ''', [(user_id, f"Staff {idx:04d}", 1000 + idx, datetime.now(pytz.utc).isoformat())
+          for idx, user_id in enumerate(staff_ids(n_staff))])
+    # Registry people seeded by AttendanceDB never clock in here; leave them out of "expected"
+    conn.execute(f"UPDATE staff SET active = FALSE WHERE user_id NOT IN ({','.join('?' * n_staff)})",
+                 list(staff_ids(n_staff)))
+    conn.commit()
+    first_day = LAST_DAY - timedelta(days=n_days - 1)
+    first_day -= timedelta(days=first_day.weekday())  # start on a Monday so day 0 is open
+    conn.execute(ATTENDANCE_LOAD_SQL, {'days': (LAST_DAY - first_day).days + 1, 'staff': n_staff,
+                                       'first_day': first_day.isoformat()})
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def timed(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(args):
+    db_file = os.path.abspath(args.db)
+    n_days = args.years * 365 + args.years // 4
+    if not os.path.exists(db_file):
+        print(f"🧪 Building {args.staff} staff x {args.years} years in {db_file}...")
+        started = time.perf_counter()
+        build(db_file, args.staff, n_days)
+        print(f"   done in {time.perf_counter() - started:.1f}s")
+    with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        db = AttendanceDB(db_file=db_file)
+    rebuild_s, days = timed(db.rebuild_presence, 1)
+
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+    first = date.fromisoformat(conn.execute('SELECT MIN(date) FROM attendance').fetchone()[0])
+    bitmap_bytes = conn.execute('SELECT SUM(LENGTH(bits)) FROM presence_days').fetchone()[0]
+    print(f"📦 {rows:,} attendance rows → {days:,} bitmaps, {bitmap_bytes / 1024:,.0f} KB "
+          f"(rebuild {rebuild_s:.2f}s)")
+    user_of = {ordinal: user_id for user_id, ordinal in conn.execute('SELECT user_id, ordinal FROM staff')}
+
+    year_ago = LAST_DAY - timedelta(days=364)
+    probe_day = LAST_DAY - timedelta(days=(LAST_DAY.weekday() + 7) % 7)  # a recent Monday
+    load_s, index = timed(db.load_presence, args.repeat)
+    results = {'rows': rows, 'staff': args.staff, 'days': days, 'bitmap_bytes': bitmap_bytes,
+               'rebuild_s': round(rebuild_s, 3), 'load_ms': round(load_s * 1000, 2), 'queries': {}}
+    print(f"⚡ {'load bitmaps':<10} {load_s * 1000:9.1f} ms")
+
+    comparisons = {
+        'rates': (
+            lambda: conn.execute(RATES_SQL, (first.isoformat(), LAST_DAY.isoformat())).fetchall(),
+            lambda: index.summary(first, LAST_DAY),
+            lambda sql, bits: ({u: (p, o - p) for u, p, o in sql}
+                               == {r['user_id']: (r['present'], r['absent']) for r in bits}),
+        ),
+        'mondays': (
+            lambda: conn.execute(MONDAYS_SQL, (year_ago.isoformat(), LAST_DAY.isoformat(), 3)).fetchall(),
+            lambda: index.absent_more_than(3, year_ago, LAST_DAY, {0}),
+            lambda sql, bits: dict(sql) == {u: c for u, _, c in bits},
+        ),
+        'streaks': (
+            lambda: conn.execute(STREAKS_SQL, (first.isoformat(), LAST_DAY.isoformat())).fetchall(),
+            lambda: index.summary(first, LAST_DAY),
+            lambda sql, bits: dict(sql) == {r['user_id']: r['longest_streak'] for r in bits},
+        ),
+        'day': (
+            lambda: conn.execute(DAY_SQL, (probe_day.isoformat(),)).fetchall(),
+            lambda: index.on(probe_day),
+            lambda sql, bits: {u for u, in sql} == {u for u, _ in bits[1]},
+        ),
+    }
+    mismatches = []
+    for name, (sql_fn, bitmap_fn, agree) in comparisons.items():
+        sql_s, sql_result = timed(sql_fn, args.repeat)
+        bitmap_s, bitmap_result = timed(bitmap_fn, args.repeat)
+        same = agree(sql_result, bitmap_result)
+        if not same:
+            mismatches.append(name)
+        results['queries'][name] = {'sql_ms': round(sql_s * 1000, 2), 'bitmap_ms': round(bitmap_s * 1000, 2),
+                                    'speedup': round(sql_s / bitmap_s, 1), 'match': same}
+        print(f"⚡ {name:<10} SQL {sql_s * 1000:9.1f} ms  bitmaps {bitmap_s * 1000:7.1f} ms  "
+              f"→ {sql_s / bitmap_s:6.1f}x  {'✅' if same else '❌ answers differ'}")
+
+    # Clock-in cost: one bitmap read-modify-write inside the caller's transaction
+    cursor = conn.cursor()
+    people = list(user_of.values())[:args.clock_ins]
+    started = time.perf_counter()
+    for user_id in people:
+        db._mark_present(cursor, user_id, LAST_DAY + timedelta(days=1))
+    mark_s = (time.perf_counter() - started) / len(people)
+    conn.rollback()
+    results['mark_present_us'] = round(mark_s * 1e6, 1)
+    print(f"⚡ {'clock-in':<10} {mark_s * 1e6:9.1f} µs per bitmap update")
+    conn.close()
+
+    print("✅ Bitmap answers match SQL" if not mismatches else f"❌ Mismatches: {', '.join(mismatches)}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Presence bitmap benchmark')
+    parser.add_argument('--db', default='/tmp/bench_presence.db', help='SQLite file (built if missing)')
+    parser.add_argument('--staff', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--clock-ins', type=int, default=200, help='Bitmap updates to time')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,330 @@
+"""
+Scaling load test: API latency and DB time as attendance history grows.
+
+For each size (attendance rows; default 10k, 100k, 1M, 10M) a SQLite
+database is built with one recursive-CTE INSERT per table (≈1 task per
+attendance row, the latest day left clocked in); shift times come from a
+hash of the row number, so every build is identical. Indexes and outbox
+triggers are dropped for the load and recreated afterwards by
+AttendanceDB. The databases are kept in --dir and reused on later runs.
+
+Each endpoint is then driven in-process over ASGI by --concurrency clients
+for --duration seconds with the response cache disabled, so every request
+runs its queries. Per endpoint and size it records throughput, p50/p99
+latency, the share of requests slower than --timeout (the serverless
+function limit) and the mean DB time per request (time spent inside
+AsyncConnection fetches).
+
+The report fits the growth exponent k in time ∝ rows^k between consecutive
+sizes: k ≈ 0 is O(1), k ≈ 1 is a full scan. An endpoint "stops being O(1)"
+at the first size where the DB-time exponent exceeds --o1-slope.
+
+Run:
+    python scripts/bench_scaling.py
+    python scripts/bench_scaling.py --sizes 10000 100000 1000000 --concurrency 20 --json scaling.json
+
+Dependencies:
+    pip install httpx aiosqlite
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import asyncio
+import argparse
+import contextlib
+from datetime import datetime
+
+import pytz
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+
+from scripts.bench_api_async import percentile
+from src.async_db import AsyncConnection, AsyncDB
+from src.cache import MemoryCache
+from src.database import AttendanceDB
+import src.api as api
+
+DEFAULT_ENDPOINTS = [
+    '/api/attendance/today',
+    '/api/stats',
+    '/api/attendance/summary/daily',
+    '/api/attendance/summary/monthly',
+    '/api/dashboard',
+    '/api/reports/attendance?from={month_start}&to={last_day}',
+    '/api/staff/{user_id}/timesheet?from={month_start}&to={last_day}',
+]
+
+# minute -> '9:05 AM' in SQL; {m} is the minutes-since-midnight expression
+SQL_12HR = "printf('%d:%02d %s', (({m}) / 60 + 11) % 12 + 1, ({m}) % 60, CASE WHEN ({m}) % 1440 < 720 THEN 'AM' ELSE 'PM' END)"
+
+ATTENDANCE_LOAD_SQL = f'''
+    WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < :rows),
+    hashed AS (SELECT i, (i * 2654435761) % 1000003 AS h FROM n),
+    shifts AS (SELECT i, 420 + h % 180 AS m, 420 + (h / 180) % 180 AS len, 15 + (h / 32400) % 30 AS brk FROM hashed)
+    INSERT INTO attendance (user_id, date, time_in, time_out, break_start, break_end,
+                            break_duration, hours_worked, status, created_at)
+    SELECT CAST(1000000000000000000 + i % :staff AS TEXT),
+           date(:last_day, '-' || ((:rows - 1 - i) / :staff) || ' days'),
+           {SQL_12HR.format(m='m')},
+           CASE WHEN i >= :open_from THEN NULL ELSE {SQL_12HR.format(m='m + len')} END,
+           {SQL_12HR.format(m='m + 240')},
+           CASE WHEN i >= :open_from THEN NULL ELSE {SQL_12HR.format(m='m + 240 + brk')} END,
+           CASE WHEN i >= :open_from THEN 0 ELSE round(brk / 60.0, 4) END,
+           CASE WHEN i >= :open_from THEN NULL ELSE round((len - brk) / 60.0, 2) END,
+           CASE WHEN i >= :open_from THEN 'clocked_in' ELSE 'complete' END,
+           date(:last_day, '-' || ((:rows - 1 - i) / :staff) || ' days')
+    FROM shifts
+'''
+
+TASKS_LOAD_SQL = '''
+    INSERT INTO tasks (user_id, date, task_description, has_link, deliverable_url, created_at)
+    SELECT user_id, date, 'Worked on report ' || id, id % 3 = 0,
+           CASE WHEN id % 3 = 0 THEN 'https://example.com/' || id END, created_at
+    FROM attendance
+'''
+
+
+# ─── Data ────────────────────────────────────────────────────────────────────
+
+def quietly_init(db_file):
+    """Create/upgrade the schema (indexes, triggers) without AttendanceDB's startup prints."""
+    with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        return AttendanceDB(db_file=db_file)
+
+
+def build(db_file, rows, n_staff, last_day):
+    """Create db_file with `rows` attendance rows over n_staff people ending on last_day."""
+    quietly_init(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.executemany('''
+        INSERT OR IGNORE INTO staff (user_id, name, active, position, updated_at)
+        VALUES (?, ?, TRUE, ?, ?)
+    ''', [(str(1000000000000000000 + idx), f"Staff {idx:04d}", 1000 + idx,
+           datetime.now(pytz.utc).isoformat()) for idx in range(n_staff)])
+    conn.commit()
+    # Bulk load without secondary indexes or outbox triggers; AttendanceDB puts them back
+    for kind, name in conn.execute('''
+        SELECT type, name FROM sqlite_master
+        WHERE tbl_name IN ('attendance', 'tasks') AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''').fetchall():
+        conn.execute(f'DROP {kind.upper()} {name}')
+    conn.commit()
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute(ATTENDANCE_LOAD_SQL, {'rows': rows, 'staff': n_staff, 'last_day': last_day,
+                                       'open_from': rows - min(n_staff, rows)})
+    conn.execute(TASKS_LOAD_SQL)
+    conn.commit()
+    conn.close()
+    quietly_init(db_file).rebuild_presence()
+    conn = sqlite3.connect(db_file)
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def database_for(args, rows, last_day):
+    db_file = os.path.join(args.dir, f"scale-{rows}.db")
+    if os.path.exists(db_file):
+        conn = sqlite3.connect(db_file)
+        current = conn.execute('SELECT MAX(date) FROM attendance').fetchone()[0]
+        conn.close()
+        if current == last_day:
+            return db_file
+        os.remove(db_file)  # "today" moved on; the live endpoints would see nothing
+    print(f"🌱 Building {rows:,} attendance rows in {db_file}...")
+    started = time.perf_counter()
+    build(db_file, rows, args.staff, last_day)
+    print(f"   {time.perf_counter() - started:.1f}s, {os.path.getsize(db_file) / 1e6:,.0f} MB")
+    return db_file
+
+
+# ─── Instrumentation ─────────────────────────────────────────────────────────
+
+class NoCache(MemoryCache):
+    """Never stores anything, so every request reaches the database."""
+
+    def _set(self, key, value, ttl):
+        pass
+
+
+db_seconds = [0.0]
+
+
+def instrument_db():
+    """Accumulate time spent in AsyncConnection fetches into db_seconds."""
+    def timed(method):
+        async def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                db_seconds[0] += time.perf_counter() - started
+        return wrapper
+
+    def timed_stream(method):
+        async def wrapper(self, *args, **kwargs):
+            chunks = method(self, *args, **kwargs)
+            while True:
+                started = time.perf_counter()
+                try:
+                    rows = await chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    db_seconds[0] += time.perf_counter() - started
+                yield rows
+        return wrapper
+
+    AsyncConnection.fetchall = timed(AsyncConnection.fetchall)
+    AsyncConnection.fetchone = timed(AsyncConnection.fetchone)  # fetchval goes through fetchone
+    AsyncConnection.stream = timed_stream(AsyncConnection.stream)
+
+
+async def drive(path, concurrency, duration, timeout):
+    latencies = []
+    errors = 0
+    transport = httpx.ASGITransport(app=api.app)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', limits=limits,
+                                 timeout=None) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        db_seconds[0] = 0.0
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'over_timeout': round(sum(1 for latency in latencies if latency > timeout) / len(latencies), 4),
+        'db_ms_per_request': round(db_seconds[0] / len(latencies) * 1000, 3),
+    }
+
+
+# ─── Report ──────────────────────────────────────────────────────────────────
+
+def exponent(small, large, n_small, n_large):
+    if small <= 0 or large <= 0:
+        return 0.0
+    return math.log(large / small) / math.log(n_large / n_small)
+
+
+def scaling_report(results, sizes, o1_slope):
+    lines = ["# API scaling report", ""]
+    verdicts = {}
+    for endpoint in dict.fromkeys(result['endpoint'] for result in results):
+        runs = {result['rows']: result for result in results
+                if result['endpoint'] == endpoint and not result.get('skipped')}
+        measured = [size for size in sizes if size in runs]
+        skipped = [result['rows'] for result in results if result['endpoint'] == endpoint and result.get('skipped')]
+        lines += [f"## {endpoint}", "",
+                  "| rows | req/s | p50 ms | p99 ms | DB ms/req | > timeout | k (DB) |",
+                  "|---:|---:|---:|---:|---:|---:|---:|"]
+        stops_at = None
+        for i, size in enumerate(measured):
+            run = runs[size]
+            k = ''
+            if i:
+                prev = runs[measured[i - 1]]
+                slope = exponent(prev['db_ms_per_request'], run['db_ms_per_request'], measured[i - 1], size)
+                k = f"{slope:.2f}"
+                if stops_at is None and slope > o1_slope:
+                    stops_at = size
+            lines.append(f"| {size:,} | {run['rps']:,} | {run['p50_ms']:,} | {run['p99_ms']:,} | "
+                         f"{run['db_ms_per_request']:,} | {run['over_timeout']:.1%} | {k} |")
+        lines += [f"| {size:,} | skipped: p50 already over the timeout | | | | | |" for size in skipped]
+        verdict = f"stops being O(1) at {stops_at:,} rows" if stops_at else "O(1) over the measured range"
+        over = [size for size in measured if runs[size]['over_timeout'] > 0.01]
+        if over:
+            verdict += f"; over the timeout from {over[0]:,} rows"
+        verdicts[endpoint] = stops_at
+        lines += ["", f"**{verdict}**", ""]
+    return "\n".join(lines), verdicts
+
+
+async def main(args):
+    os.makedirs(args.dir, exist_ok=True)
+    last_day = datetime.now(pytz.timezone('Asia/Manila')).date().isoformat()
+    month_start = last_day[:8] + '01'
+    instrument_db()
+    api.cache = NoCache()
+    results = []
+    timed_out = {}  # endpoint -> first size whose p50 exceeded --timeout
+
+    for rows in args.sizes:
+        db_file = database_for(args, rows, last_day)
+        api.db.db_file = db_file
+        api.adb = AsyncDB(db_file=db_file, pool_size=args.pool_size)
+        api.feed.adb = api.adb
+        for template in args.endpoints:
+            endpoint = template.split('?')[0]
+            if endpoint in timed_out:
+                # Already past the limit at a smaller size; a bigger run would only take longer
+                results.append({'endpoint': endpoint, 'rows': rows, 'skipped': True})
+                print(f"{endpoint:<36} {rows:>11,} rows  skipped (p50 over {args.timeout:g}s "
+                      f"at {timed_out[endpoint]:,} rows)")
+                continue
+            path = template.format(last_day=last_day, month_start=month_start,
+                                   user_id=str(1000000000000000000))
+            stats = await drive(path, args.concurrency, args.duration, args.timeout)
+            stats.update({'endpoint': endpoint, 'rows': rows})
+            results.append(stats)
+            if stats['p50_ms'] > args.timeout * 1000:
+                timed_out[endpoint] = rows
+            print(f"{stats['endpoint']:<36} {rows:>11,} rows  {stats['rps']:>9,.1f} req/s  "
+                  f"p50 {stats['p50_ms']:>9,.1f} ms  p99 {stats['p99_ms']:>9,.1f} ms  "
+                  f"DB {stats['db_ms_per_request']:>9,.2f} ms/req  "
+                  f">{args.timeout:g}s {stats['over_timeout']:.0%}  errors {stats['errors']}")
+        await api.adb.close()
+
+    report, verdicts = scaling_report(results, args.sizes, args.o1_slope)
+    print()
+    for endpoint, stops_at in verdicts.items():
+        print(f"📈 {endpoint:<36} " + (f"stops being O(1) at {stops_at:,} rows" if stops_at else "O(1)"))
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report + "\n")
+        print(f"📝 Report written to {args.report}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'params': {key: value for key, value in vars(args).items()},
+                       'results': results}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='API scaling load test over growing data sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--staff', type=int, default=500)
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS,
+                        help='Paths; {last_day}, {month_start} and {user_id} are filled in')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per endpoint and size')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Serverless function limit in seconds')
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--o1-slope', type=float, default=0.2, help='Growth exponent above which an endpoint is not O(1)')
+    parser.add_argument('--dir', default='/tmp/wibiz-scaling', help='Where the size databases are kept')
+    parser.add_argument('--report', help='Write the markdown scaling report here')
+    parser.add_argument('--json', help='Write raw results to this JSON file')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Benchmark response serialization: old dict + jsonable_encoder path vs RowEncoder.
+
+Encodes N synthetic attendance rows (default 10k) three ways and reports the
+best-of-R time and the tracemalloc allocation high-water mark:
+
+  legacy    one dict per row with str() on every date/time, FastAPI's
+            jsonable_encoder, then json.dumps (what JSONResponse did)
+  records   RowEncoder.records() + orjson
+  columnar  RowEncoder.columnar() + orjson
+
+--postgres-types makes the rows carry date/time/datetime objects the way
+psycopg2/asyncpg return them; the default mimics SQLite's text columns.
+
+Run:
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --rows 10000 --repeat 7 --postgres-types --json out.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import date, datetime, time as dtime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from fastapi.encoders import jsonable_encoder
+
+from src.reports import REPORT_COLUMNS
+from src.serialization import RowEncoder, dumps, to_str
+
+COLUMNS = REPORT_COLUMNS["attendance"]
+
+
+def make_rows(n, postgres_types, seed=42):
+    rng = random.Random(seed)
+    start = date(2023, 1, 2)
+    rows = []
+    for i in range(n):
+        day = start + timedelta(days=i // 50)
+        t_in = dtime(rng.randint(7, 9), rng.randint(0, 59))
+        t_out = dtime(rng.randint(16, 19), rng.randint(0, 59))
+        created = datetime.combine(day, t_out)
+        if postgres_types:
+            values = (day, t_in, t_out, created)
+        else:
+            values = (day.isoformat(), t_in.strftime('%I:%M %p'), t_out.strftime('%I:%M %p'),
+                      created.strftime('%Y-%m-%d %I:%M:%S %p'))
+        rows.append((i + 1, str(1000000000000000000 + i % 50), f"Staff {i % 50:04d}", values[0],
+                     values[1], values[2], None, None, 0.5, 8.25, 'complete', values[3]))
+    return rows
+
+
+def legacy(rows):
+    data = []
+    for row in rows:
+        record = {}
+        for column, value in zip(COLUMNS, row):
+            record[column] = str(value) if isinstance(value, (date, dtime)) else value
+        data.append(record)
+    content = jsonable_encoder({"data": data})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def run(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    output = fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': round(best * 1000, 2), 'peak_kb': round(peak / 1024, 1), 'bytes_out': len(output)}
+
+
+def main(args):
+    rows = make_rows(args.rows, args.postgres_types)
+    encoder = RowEncoder([(column, to_str if column == 'created_at' and args.postgres_types else None)
+                          for column in COLUMNS])
+    variants = {
+        'legacy': legacy,
+        'records': lambda r: dumps({"data": encoder.records(r)}),
+        'columnar': lambda r: dumps(encoder.columnar(r)),
+    }
+    results = {}
+    print(f"📦 {args.rows} rows, {'postgres' if args.postgres_types else 'sqlite'} column types")
+    for label, fn in variants.items():
+        stats = run(fn, rows, args.repeat)
+        results[label] = stats
+        print(f"{label:<9} {stats['ms']:>9} ms  peak alloc {stats['peak_kb']:>9} KB  "
+              f"out {stats['bytes_out']:>9} B")
+    base = results['legacy']['ms']
+    for label in ('records', 'columnar'):
+        print(f"⚡ {label}: {base / results[label]['ms']:.1f}x faster than legacy")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rows': args.rows, 'postgres_types': args.postgres_types, 'results': results}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serialization time/allocation benchmark')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--postgres-types', action='store_true')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    main(parser.parse_args())
@@ -0,0 +1,297 @@
+"""
+Microbenchmark suite: message parsing, hour math, persistence and the API.
+
+Groups (select with --only):
+
+  parse     calculate_hours, extract_tasks, extract_urls and the on_message
+            regex chain (break start -> break end -> time out -> time in)
+            over a seeded mix of synthetic Discord messages
+  save      each AttendanceDB.save_* method on a seeded SQLite copy, one
+            full day (in, break, back, out, tasks) per staff member
+  api       every src/api.py GET endpoint through TestClient, cold (response
+            cache cleared before each call) and warm; /api/events is a
+            long-lived SSE stream and is left out
+
+Data comes from scripts/seed_synthetic_data.py (N staff x M days with breaks
+and tasks), so the same --seed gives the same inputs on every commit.
+Results are written as JSON (per benchmark: calls, best/mean/p95 in µs,
+plus the git commit); --compare prints the change against an earlier run
+and exits 1 when anything is slower by more than --threshold percent.
+
+Run:
+    python scripts/bench_suite.py --json bench/HEAD.json
+    python scripts/bench_suite.py --only parse save --compare bench/HEAD.json --threshold 15
+
+Dependencies:
+    pip install httpx aiosqlite
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import contextlib
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from scripts.seed_synthetic_data import TASK_WORDS, fmt_12hr, seed, staff_ids
+from src.clock import normalize_clock
+from src.utils import (calculate_hours, extract_tasks, extract_urls, TIME_IN_PATTERN,
+                       TIME_OUT_PATTERN, BREAK_START_PATTERN, BREAK_END_PATTERN)
+
+
+def measure(fn, calls, repeat):
+    """Per-call timings of fn(i) for i in range(calls), best of `repeat` rounds of batches."""
+    samples = []
+    batch = max(1, calls // 50)
+    for _ in range(repeat):
+        for start in range(0, calls, batch):
+            stop = min(start + batch, calls)
+            started = time.perf_counter()
+            for i in range(start, stop):
+                fn(i)
+            samples.append((time.perf_counter() - started) / (stop - start))
+    samples.sort()
+    return {
+        'calls': calls * repeat,
+        'best_us': round(samples[0] * 1e6, 3),
+        'mean_us': round(sum(samples) / len(samples) * 1e6, 3),
+        'p95_us': round(samples[int(0.95 * (len(samples) - 1))] * 1e6, 3),
+    }
+
+
+def report(results, name, stats):
+    results[name] = stats
+    print(f"⚡ {name:<44} best {stats['best_us']:>11,.2f} µs  mean {stats['mean_us']:>11,.2f} µs  "
+          f"p95 {stats['p95_us']:>11,.2f} µs")
+
+
+# ─── Synthetic messages ──────────────────────────────────────────────────────
+
+def synthetic_messages(n, seed=42):
+    """Seeded mix of the bot channel's traffic: reports, breaks, clock-ins and chatter."""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(n):
+        kind = rng.random()
+        start = rng.randint(7 * 60, 10 * 60)
+        if kind < 0.3:
+            messages.append(f"Name: Staff {i % 500:04d}\nTime In: {fmt_12hr(start)}")
+        elif kind < 0.45:
+            messages.append(f"On break: {fmt_12hr(start + 240).lower()}")
+        elif kind < 0.6:
+            messages.append(f"Back from break {fmt_12hr(start + 290)}")
+        elif kind < 0.9:
+            tasks = []
+            for t in range(rng.randint(1, 6)):
+                words = ' '.join(rng.sample(TASK_WORDS, 3))
+                url = f" https://example.com/{i}/{t}" if rng.random() < 0.4 else ''
+                tasks.append(f"{rng.choice(['•', '-', '*', f'{t + 1}.'])} Worked on {words}{url}")
+            messages.append(f"Name: Staff {i % 500:04d}\nDate: 17 Feb 2026\n"
+                            f"Time In: {fmt_12hr(start)}\nTime Out: {fmt_12hr(start + 540)}\n"
+                            "Tasks:\n" + '\n'.join(tasks))
+        else:
+            messages.append(rng.choice(["good morning team!", "running 5 min late, sorry",
+                                        "can someone review the landing page?", "thanks!"]))
+    return messages
+
+
+def regex_chain(content):
+    """The pattern checks on_message runs per message, in its order, without the DB writes."""
+    match = re.search(BREAK_START_PATTERN, content, re.IGNORECASE)
+    if match:
+        return 'break_start', normalize_clock(match.group(1))
+    match = re.search(BREAK_END_PATTERN, content, re.IGNORECASE)
+    if match:
+        return 'break_end', normalize_clock(match.group(1))
+    time_out = re.search(TIME_OUT_PATTERN, content, re.IGNORECASE)
+    time_in = re.search(TIME_IN_PATTERN, content, re.IGNORECASE)
+    if time_out:
+        return 'time_out', time_in and normalize_clock(time_in.group(1)), normalize_clock(time_out.group(1))
+    if time_in:
+        return 'time_in', normalize_clock(time_in.group(1))
+    return None
+
+
+def bench_parse(args, results):
+    messages = synthetic_messages(args.messages, args.seed)
+    reports = [m for m in messages if 'Time Out' in m]
+    rng = random.Random(args.seed)
+    pairs = [(fmt_12hr(start), fmt_12hr(start + rng.randint(7 * 60, 10 * 60)))
+             for start in (rng.randint(0, 1439) for _ in range(args.messages))]
+    n = len(messages)
+    report(results, 'parse.calculate_hours', measure(lambda i: calculate_hours(*pairs[i]), n, args.repeat))
+    report(results, 'parse.extract_tasks', measure(lambda i: extract_tasks(reports[i % len(reports)]), n, args.repeat))
+    report(results, 'parse.extract_urls', measure(lambda i: extract_urls(reports[i % len(reports)]), n, args.repeat))
+    report(results, 'parse.on_message_regex_chain', measure(lambda i: regex_chain(messages[i]), n, args.repeat))
+
+
+# ─── Persistence ─────────────────────────────────────────────────────────────
+
+def bench_save(args, results, seeded_db):
+    from src.database import AttendanceDB
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'save.db')
+        shutil.copy(seeded_db, db_file)
+        conn = sqlite3.connect(db_file)
+        # Close the seeder's open rows so every save_time_in starts a fresh shift
+        conn.execute("UPDATE attendance SET status = 'complete' WHERE status != 'complete'")
+        conn.commit()
+        conn.close()
+
+        db = AttendanceDB(db_file=db_file)
+        day = db.get_current_pst_time().strftime('%Y-%m-%d')
+        users = staff_ids(args.staff)
+        n = len(users)
+
+        def user(i):
+            return users[i], f"Staff {i:04d}", day
+
+        steps = [
+            ('save_time_in', lambda i: db.save_time_in(*user(i), '8:00 AM')),
+            ('save_break_start', lambda i: db.save_break_start(*user(i), '12:00 PM')),
+            ('save_break_end', lambda i: db.save_break_end(*user(i), '12:45 PM')),
+            ('save_time_out', lambda i: db.save_time_out(*user(i), '8:00 AM', '5:00 PM', 9.0)),
+            ('save_task', lambda i: db.save_task(*user(i), 'Worked on bench task', 'https://example.com/t')),
+        ]
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):  # save_* print per call
+            stats = {name: measure(fn, n, 1) for name, fn in steps}
+        for name, entry in stats.items():
+            report(results, f'save.{name}', entry)
+
+
+# ─── API ─────────────────────────────────────────────────────────────────────
+
+def api_paths(seeded_db):
+    conn = sqlite3.connect(seeded_db)
+    user_id, last_day = conn.execute('SELECT user_id, MAX(date) FROM attendance').fetchone()
+    conn.close()
+    month = f"from={last_day[:8]}01&to={last_day}"
+    return [
+        '/', '/api/attendance/today', '/api/attendance/count', '/api/attendance/summary/daily',
+        '/api/attendance/summary/weekly', '/api/attendance/summary/monthly', '/api/attendance/week',
+        '/api/tasks/today', '/api/stats', '/api/dashboard',
+        f'/api/reports/summary?{month}', f'/api/reports/attendance?{month}',
+        f'/api/reports/tasks?{month}', f'/api/reports/attendance/export?{month}&format=csv',
+        f'/api/staff/{user_id}/timesheet?{month}',
+        '/api/analytics/arrivals', '/api/analytics/heatmap', '/api/analytics/hours',
+        '/api/analytics/breaks', '/api/analytics/trends',
+    ]
+
+
+def bench_api(args, results, seeded_db):
+    from fastapi.testclient import TestClient
+    import src.api as api
+    from src.analytics import AnalyticsStore
+    from src.async_db import AsyncDB
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'api.db')
+        shutil.copy(seeded_db, db_file)
+        api.db.db_file = db_file
+        api.adb = AsyncDB(db_file=db_file)
+        api.feed.adb = api.adb
+        api.analytics = AnalyticsStore(os.path.join(tmp, 'analytics.npz'))
+
+        with TestClient(api.app) as client:
+            for path in api_paths(seeded_db):
+                response = client.get(path)
+                if response.status_code != 200:
+                    print(f"⚠️  {path} -> {response.status_code}; skipped")
+                    continue
+
+                def cold(i, path=path):
+                    api.cache.clear()
+                    client.get(path)
+
+                label = re.sub(r'/staff/[^/]+/', '/staff/{user_id}/', path.split('?')[0])
+                report(results, f'api.cold {label}', measure(cold, args.requests, args.repeat))
+                report(results, f'api.warm {label}', measure(lambda i, path=path: client.get(path),
+                                                             args.requests, args.repeat))
+
+
+# ─── Results ─────────────────────────────────────────────────────────────────
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print per-benchmark change in mean time; returns the names slower than threshold %."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 vs {baseline_path} (commit {baseline.get('commit')})")
+    regressions = []
+    for name, stats in results.items():
+        old = baseline['benchmarks'].get(name)
+        if not old:
+            continue
+        change = (stats['mean_us'] - old['mean_us']) / old['mean_us'] * 100
+        marker = '🔺' if change > threshold else ('🔻' if change < -threshold else '  ')
+        print(f"{marker} {name:<44} {old['mean_us']:>11,.2f} → {stats['mean_us']:>11,.2f} µs ({change:+.1f}%)")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded_db = os.path.join(tmp, 'seed.db')
+        if {'save', 'api'} & set(args.only):
+            counts = seed(seeded_db, args.staff, args.days, args.seed)
+            print(f"🌱 Seeded {counts['attendance']} attendance rows, {counts['tasks']} tasks "
+                  f"({args.staff} staff x {args.days} days)")
+        if 'parse' in args.only:
+            bench_parse(args, results)
+        if 'save' in args.only:
+            bench_save(args, results, seeded_db)
+        if 'api' in args.only:
+            bench_api(args, results, seeded_db)
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'params': {key: getattr(args, key) for key in ('staff', 'days', 'seed', 'messages', 'requests', 'repeat')},
+                'benchmarks': results,
+            }, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) slower by more than {args.threshold}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parsing, persistence and API microbenchmarks')
+    parser.add_argument('--only', nargs='+', choices=['parse', 'save', 'api'], default=['parse', 'save', 'api'])
+    parser.add_argument('--staff', type=int, default=50)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--messages', type=int, default=5000, help='Synthetic messages for the parse group')
+    parser.add_argument('--requests', type=int, default=50, help='Calls per endpoint per round')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    sys.exit(main(parser.parse_args()))
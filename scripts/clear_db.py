@@ -1,16 +1,26 @@
+import os
+import sys
 import sqlite3
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cache import get_cache
+
 conn = sqlite3.connect('./attendance.db')
 cursor = conn.cursor()
 
 # Clear all data
 cursor.execute('DELETE FROM attendance')
 cursor.execute('DELETE FROM tasks')
+cursor.execute('DELETE FROM presence_days')
 
-# Reset the auto-increment counters
-cursor.execute('DELETE FROM sqlite_sequence')
+# Reset the auto-increment counters (not change_outbox's: its ids must never repeat).
+# The capture triggers have recorded the deletes and bumped data_version for the API ETags.
+cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('attendance', 'tasks')")
 
 conn.commit()
 conn.close()
 
+# Drop cached reads (only reaches other processes with a shared CACHE_URL backend)
+get_cache().invalidate('attendance', 'tasks')
+
 print("✅ Database cleared and ID counters reset!")
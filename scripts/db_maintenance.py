@@ -0,0 +1,458 @@
+"""
+Database maintenance: online backup, incremental vacuum, ANALYZE, integrity
+checks and size reports, for SQLite and Postgres (DATABASE_URL).
+
+  backup    SQLite: online copy through the backup API, a few hundred pages
+            per step so the bot's writes interleave, verified with
+            quick_check. Postgres: `pg_dump -Fc` when it is installed,
+            otherwise a plain-SQL COPY dump (restorable with psql) taken in
+            one read-only snapshot. Keeps the newest --keep backups.
+  vacuum    SQLite: converts the file to auto_vacuum=INCREMENTAL once (a full
+            VACUUM), afterwards hands free pages back in --step page chunks,
+            each its own short transaction. Postgres: VACUUM per table.
+  analyze   Refresh planner statistics (ANALYZE; PRAGMA optimize on SQLite).
+  check     SQLite integrity_check (quick_check with --quick) and rows whose
+            user_id has no staff row; Postgres: the same orphan check plus
+            amcheck's bt_index_check when the extension is installed.
+  sizes     Bytes per table and index (dbstat / pg_*_size) and row counts.
+  all       check, backup, vacuum, analyze, sizes: the one to schedule.
+
+Every run prints the space reclaimed and which of a fixed set of app queries
+changed plan (EXPLAIN before vs after). The exit status is 1 when a check or
+backup fails, so a scheduler can alert on it.
+
+Run:
+    python scripts/db_maintenance.py sizes
+    python scripts/db_maintenance.py backup --dir backups --keep 7
+    python scripts/db_maintenance.py all --dir backups --json maintenance.json
+
+Cron (nightly at 03:15):
+    15 3 * * * cd /path/to/wibiz-attendance-bot && python scripts/db_maintenance.py all --dir backups
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import USE_POSTGRES, AttendanceDB
+from src.outbox import USER_HEAD_SQL
+from src.timesheet import TIMESHEET_SQL
+
+BACKUP_PAGES = 256      # pages copied per backup step
+BACKUP_SLEEP = 0.005    # seconds between steps, when writers get the lock
+VACUUM_STEP = 1000      # free pages returned per incremental_vacuum transaction
+
+# Hot queries whose plans are compared around each run (SQLite syntax)
+PLAN_QUERIES = {
+    'today attendance': ('''
+        SELECT s.name, a.time_in, a.status FROM attendance a
+        JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date = ? ORDER BY a.time_in
+    ''', ('day',)),
+    'open session': ('''
+        SELECT id FROM attendance
+        WHERE user_id = ? AND status IN ('clocked_in', 'on_break')
+        ORDER BY id DESC LIMIT 1
+    ''', ('user',)),
+    'timesheet': (TIMESHEET_SQL, ('user', 'month_ago', 'day')),
+    'report page': ('SELECT id FROM attendance WHERE date >= ? ORDER BY date, id LIMIT 200', ('month_ago',)),
+    'tasks today': ('SELECT id FROM tasks WHERE date = ? ORDER BY created_at DESC', ('day',)),
+    'user change version': (USER_HEAD_SQL, ('user',)),
+    'outbox poll': ('SELECT id FROM change_outbox WHERE id > ? ORDER BY id LIMIT 1000', ('zero',)),
+}
+
+CHECKED_TABLES = ('attendance', 'tasks')
+
+
+def human(n_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n_bytes) < 1024 or unit == 'GB':
+            return f"{n_bytes:.0f} {unit}" if unit == 'B' else f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1024
+
+
+def rotate(directory, pattern, keep):
+    """Delete all but the newest `keep` files matching pattern. Returns the deleted paths."""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    stale = paths[:-keep] if keep > 0 else []
+    for path in stale:
+        os.remove(path)
+    return stale
+
+
+class Maintenance:
+    """Shared plan capture; subclasses implement the backend-specific steps."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def plan_params(self, cursor):
+        cursor.execute('SELECT user_id, date FROM attendance ORDER BY id DESC LIMIT 1')
+        row = cursor.fetchone()
+        user_id, day = (row[0], str(row[1])[:10]) if row else ('', datetime.now().date().isoformat())
+        month_ago = (datetime.fromisoformat(day) - timedelta(days=30)).date().isoformat()
+        return {'user': user_id, 'day': day, 'month_ago': month_ago, 'zero': 0}
+
+    def plans(self):
+        """{query name: plan text} for PLAN_QUERIES."""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            values = self.plan_params(cursor)
+            result = {}
+            for name, (sql, params) in PLAN_QUERIES.items():
+                try:
+                    result[name] = self.explain(cursor, self.db._fix_sql(sql), tuple(values[p] for p in params))
+                except Exception as e:
+                    result[name] = f"unavailable: {e}"
+                    if USE_POSTGRES:
+                        conn.rollback()
+            return result
+        finally:
+            conn.close()
+
+
+class SQLiteMaintenance(Maintenance):
+
+    def connect(self):
+        return sqlite3.connect(self.db.db_file)
+
+    def footprint(self):
+        """Bytes on disk (database + WAL)."""
+        return sum(os.path.getsize(path) for path in (self.db.db_file, self.db.db_file + '-wal')
+                   if os.path.exists(path))
+
+    def explain(self, cursor, sql, params):
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return '; '.join(row[3] for row in cursor.fetchall())
+
+    def backup(self, directory, keep):
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, f"attendance-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db")
+        source = sqlite3.connect(self.db.db_file)
+        destination = sqlite3.connect(target)
+        started = time.perf_counter()
+        try:
+            # Stepwise: the source is only read-locked while a step runs
+            source.backup(destination, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP)
+            verdict = destination.execute('PRAGMA quick_check').fetchone()[0]
+        finally:
+            destination.close()
+            source.close()
+        return {'path': target, 'bytes': os.path.getsize(target), 'ok': verdict == 'ok',
+                'seconds': round(time.perf_counter() - started, 2), 'verify': verdict,
+                'rotated': rotate(directory, 'attendance-*.db', keep)}
+
+    def vacuum(self, step=VACUUM_STEP):
+        conn = sqlite3.connect(self.db.db_file, isolation_level=None)
+        try:
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                # Changing auto_vacuum only takes effect through one full VACUUM
+                print("🔧 Converting to auto_vacuum=INCREMENTAL (one-time full VACUUM; writers wait for it)")
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+                mode = 'full (converted to incremental)'
+            else:
+                while conn.execute('PRAGMA freelist_count').fetchone()[0]:
+                    conn.execute(f'PRAGMA incremental_vacuum({step})').fetchall()
+                    time.sleep(BACKUP_SLEEP)
+                mode = 'incremental'
+            if conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            return {'mode': mode, 'free_pages_before': free_before,
+                    'free_pages_after': conn.execute('PRAGMA freelist_count').fetchone()[0]}
+        finally:
+            conn.close()
+
+    def analyze(self):
+        conn = sqlite3.connect(self.db.db_file, isolation_level=None)
+        try:
+            conn.execute('ANALYZE')
+            conn.execute('PRAGMA optimize')
+            return {'stat1_rows': conn.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0]}
+        finally:
+            conn.close()
+
+    def check(self, quick=False):
+        conn = self.connect()
+        try:
+            problems = [row[0] for row in conn.execute('PRAGMA quick_check' if quick else 'PRAGMA integrity_check')]
+            problems = [] if problems == ['ok'] else problems
+            problems += orphan_problems(conn.cursor())
+            return {'ok': not problems, 'problems': problems}
+        finally:
+            conn.close()
+
+    def sizes(self):
+        conn = self.connect()
+        try:
+            owners = dict(conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')"))
+            try:
+                usage = conn.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name').fetchall()
+            except sqlite3.OperationalError:  # built without SQLITE_ENABLE_DBSTAT_VTAB
+                usage = []
+            tables = {}
+            for name, n_bytes in usage:
+                table = owners.get(name, name)
+                entry = tables.setdefault(table, {'rows': None, 'table_bytes': 0, 'indexes': {}})
+                if name == table:
+                    entry['table_bytes'] = n_bytes
+                else:
+                    entry['indexes'][name] = n_bytes
+            for table, entry in tables.items():
+                if owners.get(table) == table:
+                    entry['rows'] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            return tables
+        finally:
+            conn.close()
+
+
+class PostgresMaintenance(Maintenance):
+
+    def connect(self):
+        return self.db._get_conn()
+
+    def footprint(self):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT pg_database_size(current_database())')
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def explain(self, cursor, sql, params):
+        cursor.execute(f'EXPLAIN (COSTS OFF) {sql}', params)
+        return '; '.join(row[0].strip() for row in cursor.fetchall())
+
+    def tables(self, cursor):
+        cursor.execute('''
+            SELECT table_name FROM information_schema.tables
+            WHERE table_schema = 'public' AND table_type = 'BASE TABLE' ORDER BY table_name
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
+    def backup(self, directory, keep):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        started = time.perf_counter()
+        if shutil.which('pg_dump'):
+            target = os.path.join(directory, f"attendance-{stamp}.dump")
+            result = subprocess.run(['pg_dump', '--format=custom', '--file', target, self.db.db_url],
+                                    capture_output=True, text=True)
+            ok, verify = result.returncode == 0, result.stderr.strip() or 'pg_dump ok'
+        else:
+            target = os.path.join(directory, f"attendance-{stamp}.sql")
+            ok, verify = self.copy_dump(target), 'COPY dump (pg_dump not installed)'
+        return {'path': target, 'bytes': os.path.getsize(target) if os.path.exists(target) else 0, 'ok': ok,
+                'seconds': round(time.perf_counter() - started, 2), 'verify': verify,
+                'rotated': rotate(directory, 'attendance-*.dump', keep) + rotate(directory, 'attendance-*.sql', keep)}
+
+    def copy_dump(self, target):
+        """Data-only plain SQL in pg_dump's COPY format; the schema comes from init_database."""
+        conn = self.connect()
+        try:
+            # One MVCC snapshot for every table; readers never block the bot's writes
+            conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            cursor = conn.cursor()
+            with open(target, 'w') as f:
+                f.write(f"-- wibiz-attendance-bot data dump {datetime.now().isoformat()}\n")
+                f.write("-- Restore into a database initialized by AttendanceDB: psql \"$DATABASE_URL\" -f <this file>\n")
+                f.write("SET session_replication_role = replica;\n\n")  # triggers/FKs off while loading
+                for table in self.tables(cursor):
+                    cursor.execute('''
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position
+                    ''', (table,))
+                    columns = ', '.join(row[0] for row in cursor.fetchall())
+                    f.write(f"COPY {table} ({columns}) FROM stdin;\n")
+                    f.flush()
+                    cursor.copy_expert(f'COPY {table} ({columns}) TO STDOUT', f)
+                    f.write("\\.\n\n")
+                    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+                    sequence = cursor.fetchone()[0]
+                    if sequence:
+                        # The sequence's own position, not MAX(id): ids deleted at the top of the
+                        # range must stay used, or outbox consumers would see an id twice.
+                        # Sequences sit outside the snapshot, so this is never behind the rows.
+                        cursor.execute(f'SELECT last_value, is_called FROM {sequence}')
+                        last_value, is_called = cursor.fetchone()
+                        f.write(f"SELECT setval('{sequence}', {last_value}, {'true' if is_called else 'false'});\n\n")
+                f.write("SET session_replication_role = DEFAULT;\n")
+            return True
+        finally:
+            conn.close()
+
+    def vacuum(self, step=None):
+        conn = self.connect()
+        conn.autocommit = True
+        try:
+            cursor = conn.cursor()
+            dead = 'SELECT COALESCE(SUM(n_dead_tup), 0) FROM pg_stat_user_tables'
+            cursor.execute(dead)
+            dead_before = cursor.fetchone()[0]
+            for table in self.tables(cursor):
+                cursor.execute(f'VACUUM {table}')
+            cursor.execute(dead)
+            return {'mode': 'vacuum', 'dead_tuples_before': dead_before, 'dead_tuples_after': cursor.fetchone()[0]}
+        finally:
+            conn.close()
+
+    def analyze(self):
+        conn = self.connect()
+        conn.autocommit = True
+        try:
+            conn.cursor().execute('ANALYZE')
+            return {}
+        finally:
+            conn.close()
+
+    def check(self, quick=False):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            problems = orphan_problems(cursor)
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'amcheck'")
+            if cursor.fetchone() and not quick:
+                cursor.execute('''
+                    SELECT c.relname FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    JOIN pg_am am ON am.oid = c.relam
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE am.amname = 'btree' AND n.nspname = 'public'
+                ''')
+                for index, in cursor.fetchall():
+                    try:
+                        cursor.execute('SELECT bt_index_check(%s::regclass)', (index,))
+                    except Exception as e:
+                        conn.rollback()
+                        problems.append(f"index {index}: {e}")
+            elif not quick:
+                print("ℹ️  amcheck not installed; index structure not verified (CREATE EXTENSION amcheck)")
+            return {'ok': not problems, 'problems': problems}
+        finally:
+            conn.close()
+
+    def sizes(self):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.relname, c.reltuples::bigint, pg_relation_size(c.oid)
+                FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public' AND c.relkind = 'r'
+            ''')
+            tables = {name: {'rows': max(rows, 0), 'table_bytes': n_bytes, 'indexes': {}}
+                      for name, rows, n_bytes in cursor.fetchall()}
+            cursor.execute('SELECT indexrelname, relname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes')
+            for index, table, n_bytes in cursor.fetchall():
+                if table in tables:
+                    tables[table]['indexes'][index] = n_bytes
+            return tables
+        finally:
+            conn.close()
+
+
+def orphan_problems(cursor):
+    problems = []
+    for table in CHECKED_TABLES:
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM {table} t
+            WHERE NOT EXISTS (SELECT 1 FROM staff s WHERE s.user_id = t.user_id)
+        ''')
+        orphans = cursor.fetchone()[0]
+        if orphans:
+            problems.append(f"{orphans} {table} rows reference a user_id missing from staff")
+    return problems
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_sizes(tables):
+    print(f"{'table / index':<40} {'rows':>10} {'size':>10}")
+    for table, entry in sorted(tables.items(), key=lambda item: -(item[1]['table_bytes'] + sum(item[1]['indexes'].values()))):
+        rows = '' if entry['rows'] is None else f"{entry['rows']:,}"
+        print(f"{table:<40} {rows:>10} {human(entry['table_bytes']):>10}")
+        for index, n_bytes in sorted(entry['indexes'].items(), key=lambda item: -item[1]):
+            print(f"  └ {index:<36} {'':>10} {human(n_bytes):>10}")
+
+
+def plan_changes(before, after):
+    return {name: {'before': before.get(name), 'after': plan} for name, plan in after.items()
+            if before.get(name) != plan}
+
+
+def main(args):
+    db = AttendanceDB()
+    maintenance = PostgresMaintenance(db) if USE_POSTGRES else SQLiteMaintenance(db)
+    steps = ['check', 'backup', 'vacuum', 'analyze', 'sizes'] if args.command == 'all' else [args.command]
+    report = {'started_at': datetime.now().isoformat(), 'backend': 'postgres' if USE_POSTGRES else 'sqlite'}
+    failed = False
+
+    plans_before = maintenance.plans()
+    size_before = maintenance.footprint()
+
+    for step in steps:
+        started = time.perf_counter()
+        if step == 'check':
+            result = maintenance.check(quick=args.quick)
+            failed |= not result['ok']
+            print("✅ Integrity check passed" if result['ok'] else "❌ Integrity problems:")
+            for problem in result['problems']:
+                print(f"   {problem}")
+        elif step == 'backup':
+            result = maintenance.backup(args.dir, args.keep)
+            failed |= not result['ok']
+            status = '✅' if result['ok'] else '❌'
+            print(f"{status} Backup {result['path']} ({human(result['bytes'])}, {result['seconds']}s): {result['verify']}")
+            for path in result['rotated']:
+                print(f"🗑️  Rotated out {path}")
+        elif step == 'vacuum':
+            result = maintenance.vacuum(args.step)
+            print(f"🧹 Vacuum ({result.pop('mode')}): {result}")
+        elif step == 'analyze':
+            result = maintenance.analyze()
+            print(f"📊 Statistics refreshed {result or ''}")
+        else:
+            result = maintenance.sizes()
+            print_sizes(result)
+        report[step] = result
+        report.setdefault('seconds', {})[step] = round(time.perf_counter() - started, 2)
+
+    size_after = maintenance.footprint()
+    report['bytes_before'], report['bytes_after'] = size_before, size_after
+    print(f"💾 Size: {human(size_before)} → {human(size_after)} (reclaimed {human(size_before - size_after)})")
+
+    report['plan_changes'] = plan_changes(plans_before, maintenance.plans())
+    for name, change in report['plan_changes'].items():
+        print(f"📈 Plan changed: {name}\n   before: {change['before']}\n   after:  {change['after']}")
+    if not report['plan_changes']:
+        print("📈 No query plan changes")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"💾 Report written to {args.json}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backup, vacuum, analyze and check the attendance database')
+    parser.add_argument('command', choices=['backup', 'vacuum', 'analyze', 'check', 'sizes', 'all'])
+    parser.add_argument('--dir', default=os.path.join(ROOT_DIR, 'backups'), help='Backup directory')
+    parser.add_argument('--keep', type=int, default=7, help='Backups to keep (0 keeps all)')
+    parser.add_argument('--step', type=int, default=VACUUM_STEP, help='Pages per incremental vacuum step (SQLite)')
+    parser.add_argument('--quick', action='store_true', help='quick_check instead of integrity_check; skip amcheck')
+    parser.add_argument('--json', help='Write the run report to this JSON file')
+    sys.exit(main(parser.parse_args()))
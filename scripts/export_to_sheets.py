@@ -1,5 +1,5 @@
 """
-Export attendance.db to Google Sheets in near-real-time (polling demo).
+Export attendance.db to Google Sheets in near-real-time (incremental polling).
 
 Setup (summary):
 1. Create a Google Cloud service account with the "Google Sheets API" enabled.
@@ -9,8 +9,15 @@ Setup (summary):
 5. Set environment variables or edit variables below: SPREADSHEET_ID, SERVICE_ACCOUNT_FILE.
 
 Run:
-    python sripts/export_to_sheets.py --once
-    python sripts/export_to_sheets.py        # runs polling loop (default 10s)
+    python scripts/export_to_sheets.py --once
+    python scripts/export_to_sheets.py              # runs polling loop (default 10s)
+    python scripts/export_to_sheets.py --full       # rewrite both sheets, then keep polling
+    python scripts/export_to_sheets.py --fake --check --interval 2   # local fake, no credentials
+
+Each poll costs one query while nothing has changed; otherwise only new rows
+are appended and changed rows patched (see src/sheets_sync.py). Sheet row
+positions are remembered in SHEETS_STATE_FILE (default sheets_sync_state.db
+in the project root); delete it, or pass --full, to start over.
 
 Dependencies:
     pip install google-api-python-client google-auth-httplib2 google-auth
@@ -21,105 +28,84 @@ This script writes two sheets/tabs: "Attendance" and "Tasks".
 import os
 import sys
 import time
-import json
-import sqlite3
 import argparse
-from hashlib import md5
 
 # Make project root importable
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
 
 from src.database import AttendanceDB
-
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from src.sheets_sync import TABLES, FakeSpreadsheet, SheetsExporter
 
 # Config (can be overridden via env)
 SERVICE_ACCOUNT_FILE = os.environ.get('SERVICE_ACCOUNT_FILE') or os.path.join(ROOT_DIR, 'config', 'service_account.json')
 SPREADSHEET_ID = os.environ.get('SPREADSHEET_ID') or '<YOUR_SPREADSHEET_ID>'
+SHEETS_STATE_FILE = os.environ.get('SHEETS_STATE_FILE') or os.path.join(ROOT_DIR, 'sheets_sync_state.db')
 
 # Scopes
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
 def get_sheets_service(sa_file: str):
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
+
     creds = Credentials.from_service_account_file(sa_file, scopes=SCOPES)
     service = build('sheets', 'v4', credentials=creds)
     return service.spreadsheets()
 
-def fetch_attendance(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT user_id, name, date, time_in, time_out, hours_worked, status, created_at
-        FROM attendance
-        ORDER BY date, time_in
-    ''')
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
-
-def fetch_tasks(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT user_id, name, date, task_description, has_link, deliverable_url, created_at
-        FROM tasks
-        ORDER BY created_at DESC
-    ''')
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
-
-def rows_to_values(rows):
-    return [list(r) for r in rows]
-
-def compute_hash(data):
-    return md5(json.dumps(data, default=str, sort_keys=True).encode('utf-8')).hexdigest()
-
-def write_sheet(spreadsheet, sheet_name, header, rows):
-    # Clear existing range by overwriting
-    values = [header] + rows_to_values(rows)
-    body = {'values': values}
-    range_name = f"{sheet_name}!A1"
-    spreadsheet.values().clear(spreadsheetId=SPREADSHEET_ID, range=sheet_name).execute()
-    spreadsheet.values().update(spreadsheetId=SPREADSHEET_ID, range=range_name, valueInputOption='RAW', body=body).execute()
+def report(stats):
+    if not stats:
+        return
+    total = 0
+    for table, table_stats in stats.items():
+        total += table_stats['appended'] + table_stats['patched'] + table_stats['blanked']
+        line = (f"📤 {TABLES[table]['sheet']}: +{table_stats['appended']} appended, "
+                f"{table_stats['patched']} patched, {table_stats['blanked']} blanked "
+                f"({table_stats['requests']} requests)")
+        if table_stats.get('full'):
+            line += f" — full rewrite: {table_stats['reason']}"
+        print(line)
+    print(f"✅ Google Sheet updated: {total} rows written")
+
+def check(exporter, spreadsheet):
+    """Compare the fake sheet with the database (row order aside)."""
+    for table, spec in TABLES.items():
+        expected = sorted(map(repr, exporter.expected_rows(table)))
+        actual = sorted(map(repr, spreadsheet.rows(spec['sheet'])))
+        status = '✅' if expected == actual else '❌'
+        print(f"{status} {spec['sheet']}: sheet has {len(actual)} rows, database has {len(expected)}")
 
 def main(args):
-    if not os.path.exists(SERVICE_ACCOUNT_FILE):
-        print('❌ service account JSON not found at', SERVICE_ACCOUNT_FILE)
-        return
+    if args.fake:
+        spreadsheet = FakeSpreadsheet()
+        spreadsheet_id, state_path = 'fake', ':memory:'
+    else:
+        if not os.path.exists(SERVICE_ACCOUNT_FILE):
+            print('❌ service account JSON not found at', SERVICE_ACCOUNT_FILE)
+            return
 
-    if SPREADSHEET_ID == '<YOUR_SPREADSHEET_ID>':
-        print('❌ Please set SPREADSHEET_ID in env or edit the script to include your spreadsheet id.')
-        return
+        if SPREADSHEET_ID == '<YOUR_SPREADSHEET_ID>':
+            print('❌ Please set SPREADSHEET_ID in env or edit the script to include your spreadsheet id.')
+            return
 
-    db = AttendanceDB()
-    spreadsheet = get_sheets_service(SERVICE_ACCOUNT_FILE)
+        spreadsheet = get_sheets_service(SERVICE_ACCOUNT_FILE)
+        spreadsheet_id, state_path = SPREADSHEET_ID, args.state
 
-    last_hash = None
+    db = AttendanceDB()
+    exporter = SheetsExporter(db, spreadsheet, spreadsheet_id, state_path)
 
+    full = args.full
     try:
         while True:
-            attendance = fetch_attendance(db.db_file)
-            tasks = fetch_tasks(db.db_file)
-
-            payload = {'attendance': attendance, 'tasks': tasks}
-            current_hash = compute_hash(payload)
-
-            if current_hash != last_hash or args.once:
+            stats = exporter.sync(full=full)
+            full = False
+            if stats:
                 print('🔁 Updating Google Sheet...')
-
-                # Attendance sheet
-                attendance_header = ['user_id', 'name', 'date', 'time_in', 'time_out', 'hours_worked', 'status', 'created_at']
-                write_sheet(spreadsheet, 'Attendance', attendance_header, attendance)
-
-                # Tasks sheet
-                tasks_header = ['user_id', 'name', 'date', 'task_description', 'has_link', 'deliverable_url', 'created_at']
-                write_sheet(spreadsheet, 'Tasks', tasks_header, tasks)
-
-                print('✅ Google Sheet updated')
-                last_hash = current_hash
+                report(stats)
+                if args.fake:
+                    print(f"🧪 Fake sheet: {spreadsheet.requests} requests, {spreadsheet.cells_written} cells written so far")
+                    if args.check:
+                        check(exporter, spreadsheet)
 
             if args.once:
                 break
@@ -130,8 +116,12 @@ def main(args):
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Export attendance.db to Google Sheets (polling demo)')
+    parser = argparse.ArgumentParser(description='Export attendance.db to Google Sheets (incremental polling)')
     parser.add_argument('--interval', type=int, default=10, help='Polling interval in seconds')
     parser.add_argument('--once', action='store_true', help='Run once and exit')
+    parser.add_argument('--full', action='store_true', help='Rewrite both sheets completely on the first sync')
+    parser.add_argument('--state', default=SHEETS_STATE_FILE, help='Sync state file (sheet row positions)')
+    parser.add_argument('--fake', action='store_true', help='Export to an in-memory fake spreadsheet (no credentials)')
+    parser.add_argument('--check', action='store_true', help='With --fake: verify the sheet against the database after each sync')
     args = parser.parse_args()
     main(args)
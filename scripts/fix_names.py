@@ -1,4 +1,15 @@
-import sqlite3
+"""
+Apply data/name_mapping.json to the staff table.
+
+Attendance and tasks rows carry only user_id and get display names from
+staff, so this is one single-row update per person whose name differs:
+O(users), and history is never rewritten. People not yet in staff are
+added as inactive.
+
+Run:
+    python scripts/fix_names.py
+"""
+
 import json
 import sys
 import os
@@ -20,34 +31,9 @@ except FileNotFoundError:
     print("❌ name_mapping.json not found!")
     exit()
 
-# Use the same DB path as the app
+# Use the same DB as the app
 db = AttendanceDB()
-conn = sqlite3.connect(db.db_file)
-cursor = conn.cursor()
-
-attendance_updated = 0
-tasks_updated = 0
-
-for user_id, real_name in name_map.items():
-    # Update attendance table
-    cursor.execute('''
-        UPDATE attendance 
-        SET name = ? 
-        WHERE user_id = ?
-    ''', (real_name, user_id))
-    attendance_updated += cursor.rowcount
-    
-    # Update tasks table
-    cursor.execute('''
-        UPDATE tasks 
-        SET name = ? 
-        WHERE user_id = ?
-    ''', (real_name, user_id))
-    tasks_updated += cursor.rowcount
-
-conn.commit()
-conn.close()
-
-print(f"✅ Updated {attendance_updated} attendance records")
-print(f"✅ Updated {tasks_updated} task records")
-print(f"📋 Mapped {len(name_map)} users")
\ No newline at end of file
+renamed = db.rename_staff(name_map)
+
+print(f"✅ Updated {renamed} staff names")
+print(f"📋 Mapped {len(name_map)} users")
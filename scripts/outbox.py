@@ -0,0 +1,85 @@
+"""
+Inspect, tail and prune the change-capture outbox (see src/outbox.py).
+
+Run:
+    python scripts/outbox.py status                 # consumers, checkpoints, lag
+    python scripts/outbox.py tail                   # print changes as they happen
+    python scripts/outbox.py tail --name audit --once
+    python scripts/outbox.py prune                  # drop what every consumer has acked
+    python scripts/outbox.py prune --max-age-days 30
+    python scripts/outbox.py drop sheets:fake       # forget a consumer (unblocks pruning)
+"""
+
+import os
+import sys
+import argparse
+from datetime import timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AttendanceDB
+from src.outbox import OutboxConsumer, consumer_status, prune
+
+
+def status(db, args):
+    consumers, (oldest, newest) = consumer_status(db)
+    print(f"📦 Outbox holds ids {oldest}..{newest}")
+    if not consumers:
+        print("ℹ️  No consumers registered")
+    for name, position, lag, updated_at in consumers:
+        print(f"   {name:<24} at {position:<10} lag {lag:<8} acked {updated_at}")
+
+
+def tail(db, args):
+    def show(records):
+        latest = OutboxConsumer.latest(records)
+        print(f"📥 {len(records)} changes ({len(latest)} distinct rows)")
+        for record in records:
+            print(f"   #{record.id} {record.created_at} {record.op:<6} {record.table_name}:{record.pk} v{record.version}")
+
+    consumer = OutboxConsumer(db, args.name, batch_size=args.batch, start=args.start)
+    print(f"👀 Tailing as {args.name!r} from {consumer.position}")
+    try:
+        consumer.run(show, interval=args.interval, once=args.once)
+    except KeyboardInterrupt:
+        print('\nStopped by user')
+    finally:
+        consumer.close()
+
+
+def prune_command(db, args):
+    max_age = timedelta(days=args.max_age_days) if args.max_age_days is not None else None
+    print(f"🧹 Pruned {prune(db, max_age)} outbox records")
+
+
+def drop(db, args):
+    conn = db._get_conn()
+    cursor = conn.cursor()
+    cursor.execute(db._fix_sql('DELETE FROM outbox_consumers WHERE name = ?'), (args.consumer,))
+    dropped = cursor.rowcount
+    conn.commit()
+    conn.close()
+    print(f"🗑️  Dropped consumer {args.consumer!r}" if dropped else f"ℹ️  No consumer named {args.consumer!r}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Change-capture outbox tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status').set_defaults(fn=status)
+    tail_parser = commands.add_parser('tail')
+    tail_parser.add_argument('--name', default='tail', help='Consumer name (checkpoint key)')
+    tail_parser.add_argument('--start', choices=['earliest', 'latest'], default='latest',
+                             help='Where a new consumer starts')
+    tail_parser.add_argument('--batch', type=int, default=1000)
+    tail_parser.add_argument('--interval', type=int, default=5, help='Poll interval in seconds (SQLite)')
+    tail_parser.add_argument('--once', action='store_true', help='Drain what is pending and exit')
+    tail_parser.set_defaults(fn=tail)
+    prune_parser = commands.add_parser('prune')
+    prune_parser.add_argument('--max-age-days', type=float, help='Also drop records older than this, acked or not')
+    prune_parser.set_defaults(fn=prune_command)
+    drop_parser = commands.add_parser('drop')
+    drop_parser.add_argument('consumer')
+    drop_parser.set_defaults(fn=drop)
+    args = parser.parse_args()
+    args.fn(AttendanceDB(), args)
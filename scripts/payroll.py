@@ -0,0 +1,72 @@
+"""
+Compute payroll hours and pay for one pay period (see src/payroll.py).
+
+The period defaults to the current semi-monthly one (1st-15th or 16th-end).
+Rates and thresholds come from a JSON rules file overlaid on
+payroll.DEFAULT_RULES, e.g.
+
+    {"base_rate": 80.0, "rates": {"123456789012345678": 95.0},
+     "weekly_overtime_after": 40}
+
+Run:
+    python scripts/payroll.py --from 2026-10-01 --to 2026-10-15 --rules data/payroll_rules.json
+    python scripts/payroll.py --format json --out payroll.json --workers 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+from datetime import date, datetime
+
+import pytz
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import USE_POSTGRES, AttendanceDB
+from src.payroll import load_rules, run_payroll, semi_monthly_period, totals, write_csv, write_json
+
+
+def main(args):
+    today = datetime.now(pytz.timezone('Asia/Manila')).date()
+    period_from, period_to = semi_monthly_period(today)
+    date_from = date.fromisoformat(args.date_from) if args.date_from else period_from
+    date_to = date.fromisoformat(args.date_to) if args.date_to else period_to
+    rules = load_rules(args.rules)
+
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the report
+        db = AttendanceDB()
+    target = db.db_url if USE_POSTGRES else db.db_file
+
+    started = time.perf_counter()
+    summaries = run_payroll(target, date_from, date_to, rules, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    try:
+        if args.format == 'csv':
+            write_csv(summaries, out)
+        else:
+            write_json(summaries, out, date_from, date_to, rules)
+    finally:
+        if args.out:
+            out.close()
+
+    summary = totals(summaries)
+    print(f"✅ Payroll {date_from} → {date_to}: {len(summaries)} employees, "
+          f"{summary['regular_hours']:,.2f} regular / {summary['overtime_hours']:,.2f} OT / "
+          f"{summary['night_hours']:,.2f} night hours, gross {summary['gross_pay']:,.2f} "
+          f"({elapsed:.2f}s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute payroll for a pay period')
+    parser.add_argument('--from', dest='date_from', help='First day (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Last day (YYYY-MM-DD)')
+    parser.add_argument('--rules', help='JSON rules file (rates, thresholds, night window)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU; 1 = in-process)')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--out', help='Output file (default: stdout)')
+    main(parser.parse_args())
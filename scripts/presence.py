@@ -0,0 +1,92 @@
+"""
+Presence bitmaps: rebuild them and query attendance rates, absences and streaks (see src/presence.py).
+
+  rebuild   recompute every day's bitmap from the attendance table (after
+            bulk loads, imports or deletes that bypassed the bot)
+  summary   per-person present/absent open days, rate and streaks
+  absent    people absent on more than N open days (e.g. --weekdays mon)
+  day       who was in and who was missing on one day
+
+Run:
+    python scripts/presence.py rebuild
+    python scripts/presence.py summary --from 2025-10-01 --to 2026-09-30
+    python scripts/presence.py absent --weekdays mon --more-than 3
+    python scripts/presence.py day --date 2026-10-16
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+from datetime import date, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AttendanceDB
+from src.presence import WEEKDAY_NAMES, parse_weekdays
+
+
+def date_range(args, db):
+    date_to = date.fromisoformat(args.date_to) if args.date_to else db.get_current_pst_time().date()
+    date_from = date.fromisoformat(args.date_from) if args.date_from else date_to - timedelta(days=364)
+    return date_from, date_to
+
+
+def main(args):
+    with contextlib.redirect_stdout(sys.stderr):
+        db = AttendanceDB()
+
+    if args.command == 'rebuild':
+        days = db.rebuild_presence()
+        print(f"✅ Rebuilt presence bitmaps for {days:,} days")
+        return 0
+
+    index = db.load_presence()
+    if args.command == 'day':
+        day = date.fromisoformat(args.date) if args.date else db.get_current_pst_time().date()
+        present, absent = index.on(day)
+        if args.json:
+            print(json.dumps({"date": str(day), "present": present, "absent": absent}))
+            return 0
+        print(f"📅 {day} ({WEEKDAY_NAMES[day.weekday()]}): {len(present)} in, {len(absent)} missing")
+        for _, name in absent:
+            print(f"   ❌ {name}")
+        return 0
+
+    date_from, date_to = date_range(args, db)
+    weekdays = parse_weekdays(args.weekdays)
+    label = ','.join(WEEKDAY_NAMES[d] for d in sorted(weekdays))
+    if args.command == 'absent':
+        rows = index.absent_more_than(args.more_than, date_from, date_to, weekdays, not args.include_inactive)
+        if args.json:
+            print(json.dumps([{"user_id": u, "name": n, "absent": c} for u, n, c in rows]))
+            return 0
+        print(f"🔎 Absent on more than {args.more_than} open days ({label}), {date_from} → {date_to}: {len(rows)}")
+        for _, name, count in sorted(rows, key=lambda row: -row[2]):
+            print(f"   {name}: {count}")
+        return 0
+
+    rows = index.summary(date_from, date_to, weekdays, not args.include_inactive)
+    if args.json:
+        print(json.dumps(rows))
+        return 0
+    print(f"📊 Attendance {date_from} → {date_to} ({label}), {len(rows)} people")
+    for row in sorted(rows, key=lambda row: (row['rate'] or 0, row['name'] or '')):
+        print(f"   {row['name']:<24} {row['rate'] or 0:>6.1%}  {row['present']:>4} in / {row['absent']:>3} out"
+              f"  streak {row['current_streak']} (best {row['longest_streak']})")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Presence bitmaps: rebuild and query')
+    parser.add_argument('command', choices=['rebuild', 'summary', 'absent', 'day'])
+    parser.add_argument('--from', dest='date_from', help='First day (default: a year before --to)')
+    parser.add_argument('--to', dest='date_to', help='Last day (default: today)')
+    parser.add_argument('--date', help='day: the day to show (default: today)')
+    parser.add_argument('--weekdays', default='mon-fri', help="Weekdays that count, e.g. 'mon-fri', 'mon', 'all'")
+    parser.add_argument('--more-than', type=int, default=3, help='absent: minimum absences (exclusive)')
+    parser.add_argument('--include-inactive', action='store_true', help='Also count people no longer active')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    sys.exit(main(parser.parse_args()))
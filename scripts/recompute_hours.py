@@ -0,0 +1,121 @@
+"""
+Re-derive hours_worked and break_duration for a date range (see src/recompute.py).
+
+Runs against the live database: each chunk is a short transaction and the
+workers sleep between chunks so the bot's writes keep going. Progress is
+saved per run, so re-running the same command after an interruption picks
+up where it stopped.
+
+Run:
+    python scripts/recompute_hours.py --from 2026-01-01 --to 2026-06-30 --dry-run --diff diff.csv
+    python scripts/recompute_hours.py --from 2026-01-01 --to 2026-06-30 --workers 4 --duty 0.2
+    python scripts/recompute_hours.py --status
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import contextlib
+from datetime import date
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import USE_POSTGRES, AttendanceDB
+from src.recompute import DEFAULT_CHUNK, DEFAULT_DUTY, Change, recompute, run_status
+
+
+def write_diff(changes, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(Change._fields + ('hours_delta',))
+        for change in sorted(changes, key=lambda c: (c.date, c.user_id)):
+            writer.writerow(change + (round(change.new_hours - (change.old_hours or 0), 4),))
+
+
+def report_diff(changes, scanned):
+    delta = sum(change.new_hours - (change.old_hours or 0) for change in changes)
+    print(f"🔎 {len(changes):,} of {scanned:,} rows would change, net {delta:+,.2f} hours")
+    largest = sorted(changes, key=lambda c: abs(c.new_hours - (c.old_hours or 0)), reverse=True)[:10]
+    for change in largest:
+        print(f"   {change.date} {change.user_id}: hours {change.old_hours} → {change.new_hours}, "
+              f"break {change.old_break} → {round(change.new_break, 4)}")
+
+
+def show_status(target, run):
+    rows = run_status(target, run)
+    if not rows:
+        print("📭 No recompute runs recorded")
+        return
+    for run_name, part, last_id, end_id, scanned, changed, conflicts, done, updated_at in rows:
+        state = '✅ done' if done else f'⏸️  at id {last_id}/{end_id}'
+        print(f"{run_name} part {part}: {state} · {scanned:,} scanned, {changed:,} changed, "
+              f"{conflicts:,} conflicts · {updated_at}")
+
+
+def main(args):
+    with contextlib.redirect_stdout(sys.stderr):
+        db = AttendanceDB()
+    target = db.db_url if USE_POSTGRES else db.db_file
+
+    if args.status:
+        show_status(target, args.run)
+        return 0
+    if not args.date_from or not args.date_to:
+        print("❌ --from and --to are required")
+        return 2
+    if not 0 < args.duty <= 1:
+        print("❌ --duty must be in (0, 1]")
+        return 2
+    date_from, date_to = date.fromisoformat(args.date_from), date.fromisoformat(args.date_to)
+    workers = args.workers or (1 if not USE_POSTGRES else os.cpu_count() or 1)
+    if not USE_POSTGRES and workers > 1:
+        print("⚠️  SQLite has a single writer: extra workers only parallelize the reads and derivation")
+
+    started = time.perf_counter()
+    try:
+        stats, changes = recompute(target, date_from, date_to, run=args.run, workers=workers,
+                                   chunk=args.chunk, duty=args.duty, dry_run=args.dry_run,
+                                   restart=args.restart)
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted; re-run the same command to resume")
+        return 130
+    elapsed = time.perf_counter() - started
+    scanned = sum(s['scanned'] for s in stats)
+
+    if args.dry_run:
+        report_diff(changes, scanned)
+        if args.diff:
+            write_diff(changes, args.diff)
+            print(f"💾 Diff written to {args.diff}")
+        return 0
+
+    changed = sum(s['changed'] for s in stats)
+    conflicts = sum(s['conflicts'] for s in stats)
+    held = sum(s['write_seconds'] for s in stats)
+    if changed:
+        db._invalidate('attendance')
+    print(f"✅ Recomputed {date_from} → {date_to}: {scanned:,} rows scanned, {changed:,} updated, "
+          f"{conflicts:,} skipped (changed by the bot mid-run) in {elapsed:.1f}s "
+          f"({held:.1f}s holding the write lock)")
+    if not stats:
+        print("   Nothing left to do for this run (use --restart to run it again)")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute hours_worked / break_duration for a date range')
+    parser.add_argument('--from', dest='date_from', help='First day (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Last day (YYYY-MM-DD)')
+    parser.add_argument('--run', help='Run name for resuming (default: the date range)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: 1 on SQLite, one per CPU on Postgres)')
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='Rows per transaction')
+    parser.add_argument('--duty', type=float, default=DEFAULT_DUTY,
+                        help='Max share of time each worker holds the write lock (0-1]')
+    parser.add_argument('--dry-run', action='store_true', help='Report differences without writing')
+    parser.add_argument('--diff', help='With --dry-run: write every difference to this CSV')
+    parser.add_argument('--restart', action='store_true', help='Discard saved progress for this run')
+    parser.add_argument('--status', action='store_true', help='Show saved run progress')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,159 @@
+"""
+Local Redis stand-in for developing and testing CACHE_URL=redis://...
+
+Speaks enough of the Redis protocol (RESP2) for src/cache.py's RedisCache:
+PING, AUTH, SELECT, GET, SET (EX/PX), MGET, INCR, DEL, SCAN, DBSIZE,
+FLUSHDB. Data lives in memory and disappears when the process exits; keys
+expire lazily on read and during SCAN.
+
+Run:
+    python scripts/redis_standin.py                  # listens on 127.0.0.1:6379
+    python scripts/redis_standin.py --port 6380
+    CACHE_URL=redis://127.0.0.1:6380/0 uvicorn src.api:app
+"""
+
+import time
+import asyncio
+import fnmatch
+import argparse
+
+
+class Store:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def alive(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key] if self.alive(key) else None
+
+    def set(self, key, value, ttl_ms=None):
+        self.data[key] = value
+        if ttl_ms is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl_ms / 1000
+
+    def delete(self, key):
+        existed = self.alive(key)
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+        return existed
+
+
+class Error(Exception):
+    pass
+
+
+def encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Error):
+        return b'-ERR %s\r\n' % str(reply).encode()
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(encode(item) for item in reply)
+
+
+def execute(stores, session, args):
+    command = args[0].upper().decode()
+    store = stores.setdefault(session['db'], Store())
+
+    if command == 'PING':
+        return 'PONG'
+    if command == 'AUTH':
+        return 'OK'
+    if command == 'SELECT':
+        session['db'] = int(args[1])
+        return 'OK'
+    if command == 'GET':
+        return store.get(args[1])
+    if command == 'SET':
+        ttl_ms = None
+        options = [arg.upper() for arg in args[3:]]
+        for flag, scale in ((b'PX', 1), (b'EX', 1000)):
+            if flag in options:
+                ttl_ms = int(args[3 + options.index(flag) + 1]) * scale
+        store.set(args[1], args[2], ttl_ms)
+        return 'OK'
+    if command == 'MGET':
+        return [store.get(key) for key in args[1:]]
+    if command == 'INCR':
+        try:
+            value = int(store.get(args[1]) or 0) + 1
+        except ValueError:
+            return Error('value is not an integer or out of range')
+        store.data[args[1]] = str(value).encode()
+        return value
+    if command == 'DEL':
+        return sum(store.delete(key) for key in args[1:])
+    if command == 'SCAN':
+        # Single pass: returns every match with cursor 0
+        options = [arg.upper() for arg in args[2:]]
+        pattern = args[2 + options.index(b'MATCH') + 1].decode() if b'MATCH' in options else '*'
+        keys = [key for key in list(store.data) if store.alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+        return [b'0', keys]
+    if command == 'DBSIZE':
+        return sum(store.alive(key) for key in list(store.data))
+    if command == 'FLUSHDB':
+        stores[session['db']] = Store()
+        return 'OK'
+    return Error(f"unknown command '{command}'")
+
+
+async def read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        return line.split()  # inline command (e.g. from telnet)
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def serve(host, port):
+    stores = {}
+
+    async def handle(reader, writer):
+        session = {'db': 0}
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if args:
+                    writer.write(encode(execute(stores, session, args)))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"🧪 Redis stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-memory Redis-protocol server for local cache testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
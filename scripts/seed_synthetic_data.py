@@ -0,0 +1,131 @@
+"""
+Seed a SQLite database with synthetic attendance history for benchmarks.
+
+Generates N staff x M days ending today (PST): each workday gets a time-in
+between 7 and 10 AM, an optional break, a time-out 7-10 hours later and 1-3
+tasks. Each synthetic person also gets an active staff row ("Staff 0007").
+Today's rows are left open (clocked_in / on_break) so the "live"
+endpoints have something to show. The same --seed always produces the same data.
+
+Run:
+    python scripts/seed_synthetic_data.py --db /tmp/bench.db --staff 50 --days 365
+"""
+
+import os
+import sys
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+import pytz
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AttendanceDB
+from src.periods import period_keys
+
+TASK_WORDS = ['dashboard', 'invoice', 'landing page', 'video edit', 'thumbnail',
+              'client call', 'bug fix', 'report', 'newsletter', 'onboarding',
+              'database', 'graphics', 'social post', 'proposal', 'QA pass']
+
+
+def fmt_12hr(minutes):
+    hour, minute = divmod(minutes % 1440, 60)
+    return f"{(hour % 12) or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def staff_ids(n_staff):
+    return [str(1000000000000000000 + i) for i in range(n_staff)]
+
+
+def generate_rows(n_staff, n_days, seed=42, today=None):
+    """Yield ('attendance', row) / ('tasks', row) tuples in date order."""
+    rng = random.Random(seed)
+    if today is None:
+        today = datetime.now(pytz.timezone('Asia/Manila')).date()
+    ids = staff_ids(n_staff)
+    for day_offset in range(n_days - 1, -1, -1):
+        day = today - timedelta(days=day_offset)
+        if day.weekday() >= 5 and day_offset:
+            continue
+        day_str = day.isoformat()
+        keys = period_keys(day)
+        for idx, user_id in enumerate(ids):
+            if rng.random() < 0.08:
+                continue  # absent
+            start = rng.randint(7 * 60, 10 * 60)
+            end = start + rng.randint(7 * 60, 10 * 60)
+            created_at = f"{day_str} {fmt_12hr(end).zfill(8).replace(' ', ':00 ')}"
+            break_start = break_end = None
+            break_hours = 0
+            if rng.random() < 0.7:
+                b_start = start + rng.randint(180, 300)
+                b_len = rng.randint(15, 75)
+                break_start, break_end = fmt_12hr(b_start), fmt_12hr(b_start + b_len)
+                break_hours = round(b_len / 60, 4)
+            if day_offset == 0:
+                status = 'on_break' if break_start and rng.random() < 0.2 else 'clocked_in'
+                yield 'attendance', (user_id, day_str, fmt_12hr(start), None,
+                                     break_start if status == 'on_break' else None, None,
+                                     0, None, status, created_at, *keys)
+                continue
+            hours = round((end - start) / 60 - break_hours, 2)
+            yield 'attendance', (user_id, day_str, fmt_12hr(start), fmt_12hr(end),
+                                 break_start, break_end, break_hours, hours, 'complete', created_at, *keys)
+            for t in range(rng.randint(1, 3)):
+                words = ' '.join(rng.sample(TASK_WORDS, 3))
+                url = f"https://example.com/{user_id[-4:]}/{day_str}/{t}" if rng.random() < 0.4 else None
+                yield 'tasks', (user_id, day_str, f"Worked on {words}", url is not None, url, created_at)
+
+
+def seed(db_file, n_staff, n_days, seed=42, batch_size=5000):
+    """Create the schema in db_file and bulk-insert synthetic rows. Returns row counts."""
+    db = AttendanceDB(db_file=os.path.abspath(db_file))
+    conn = sqlite3.connect(os.path.abspath(db_file))
+    cursor = conn.cursor()
+    counts = {'attendance': 0, 'tasks': 0}
+    batches = {'attendance': [], 'tasks': []}
+    sql = {
+        'attendance': '''
+            INSERT INTO attendance (user_id, date, time_in, time_out, break_start, break_end,
+                                    break_duration, hours_worked, status, created_at,
+                                    week_key, month_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''',
+        'tasks': '''
+            INSERT INTO tasks (user_id, date, task_description, has_link, deliverable_url, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''',
+    }
+    cursor.executemany('''
+        INSERT OR IGNORE INTO staff (user_id, name, active, position, updated_at)
+        VALUES (?, ?, TRUE, ?, ?)
+    ''', [(user_id, f"Staff {idx:04d}", 1000 + idx, datetime.now(pytz.utc).isoformat())
+          for idx, user_id in enumerate(staff_ids(n_staff))])
+    for table, row in generate_rows(n_staff, n_days, seed):
+        batches[table].append(row)
+        if len(batches[table]) >= batch_size:
+            cursor.executemany(sql[table], batches[table])
+            counts[table] += len(batches[table])
+            batches[table].clear()
+    for table, rows in batches.items():
+        if rows:
+            cursor.executemany(sql[table], rows)
+            counts[table] += len(rows)
+    conn.commit()
+    conn.close()
+    db.rebuild_presence()  # the bulk insert bypassed save_time_in
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seed a SQLite database with synthetic attendance data')
+    parser.add_argument('--db', required=True, help='SQLite file to create/extend')
+    parser.add_argument('--staff', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    counts = seed(args.db, args.staff, args.days, args.seed)
+    print(f"✅ Seeded {counts['attendance']} attendance rows and {counts['tasks']} tasks into {args.db}")
@@ -0,0 +1,36 @@
+"""
+Import/sync data/staff_registry.json into the `staff` table.
+
+The API computes present/absent from the staff table, so run this after
+editing the registry file (the bot also syncs on startup).
+
+Run:
+    python scripts/sync_staff_registry.py
+    python scripts/sync_staff_registry.py --deactivate-missing   # mark staff removed from the file inactive
+    python scripts/sync_staff_registry.py --file other_registry.json
+"""
+
+import os
+import sys
+import argparse
+
+# Make project root importable
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AttendanceDB, STAFF_REGISTRY_FILE
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sync the staff registry JSON into the database')
+    parser.add_argument('--file', default=STAFF_REGISTRY_FILE, help='Registry JSON path')
+    parser.add_argument('--deactivate-missing', action='store_true',
+                        help='Mark staff that are no longer in the file as inactive')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print('❌ Staff registry not found at', args.file)
+        sys.exit(1)
+
+    db = AttendanceDB()
+    db.sync_staff_registry(args.file, deactivate_missing=args.deactivate_missing)
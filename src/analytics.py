@@ -0,0 +1,503 @@
+"""
+Vectorized workforce analytics over the whole attendance history.
+
+Attendance is held in memory as compact NumPy columns, one element per row:
+
+    user         int32    ordinal into AttendanceColumns.users (the user_id strings)
+    day          int32    date.toordinal()
+    time_in      int16    minutes since midnight, -1 when missing
+    time_out     int16    minutes since midnight, -1 when missing
+    hours        float32  hours_worked (NaN when missing)
+    break_hours  float32  break_duration
+    status       int8     STATUS_CODES
+
+10M rows take ~210 MB. AnalyticsStore keeps the columns in step with the
+database: while data_version is unchanged a refresh is one tiny query;
+otherwise the (user_id, date) pairs named by new change_outbox records
+(src/outbox.py) are dropped and re-read, and a row-count check falls back to
+a full reload when a bulk load ran without the capture triggers. The columns
+are snapshotted to an .npz file so a cold start only replays what changed
+since, unless the outbox was pruned past the snapshot.
+
+The metric functions take the columns plus a boolean row mask (`select`)
+and never loop over rows in Python.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from datetime import date, datetime, time as dtime
+
+import numpy as np
+
+from src.clock import parse_clock
+from src.outbox import HEAD_SQL, HoleWatch
+
+STATUS_CODES = {"clocked_in": 0, "on_break": 1, "complete": 2}
+COMPLETE = STATUS_CODES["complete"]
+
+COLUMN_DTYPES = {
+    "user": np.int32,
+    "day": np.int32,
+    "time_in": np.int16,
+    "time_out": np.int16,
+    "hours": np.float32,
+    "break_hours": np.float32,
+    "status": np.int8,
+}
+
+ATTENDANCE_SQL = '''
+    SELECT user_id, date, time_in, time_out, hours_worked, break_duration, status
+    FROM attendance
+'''
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+PERCENTILES = (10, 25, 50, 75, 90, 95)
+MINUTES_PER_WEEK = 7 * 1440
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+MIN_REFRESH_INTERVAL = 2       # seconds between database checks
+SAVE_EVERY_EVENTS = 1000       # re-snapshot after this many incremental changes
+MAX_INCREMENTAL_DATES = 500    # beyond this a full reload is cheaper
+
+
+# ─── Value conversion ────────────────────────────────────────────────────────
+
+_minutes_cache = {}
+_day_cache = {}
+
+
+def to_minutes(value):
+    """'9:05 AM' / '09:05' / '09:05:00' / time -> minutes since midnight (-1 if unparseable)."""
+    if value is None:
+        return -1
+    if isinstance(value, dtime):
+        return value.hour * 60 + value.minute
+    minutes = parse_clock(value)
+    if minutes is not None:
+        return minutes
+    minutes = _minutes_cache.get(value)
+    if minutes is None:
+        minutes = -1
+        text = str(value).strip().upper()
+        for fmt in ('%I:%M %p', '%I:%M%p', '%H:%M:%S', '%H:%M'):
+            try:
+                parsed = datetime.strptime(text, fmt)
+                minutes = parsed.hour * 60 + parsed.minute
+                break
+            except ValueError:
+                continue
+        _minutes_cache[value] = minutes
+    return minutes
+
+
+def to_day(value):
+    if isinstance(value, date):
+        return value.toordinal()
+    day = _day_cache.get(value)
+    if day is None:
+        day = _day_cache[value] = date.fromisoformat(str(value)[:10]).toordinal()
+    return day
+
+
+def format_minutes(minutes):
+    minutes = int(round(minutes)) % 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# ─── Column store ────────────────────────────────────────────────────────────
+
+class AttendanceColumns:
+    def __init__(self, users=None, **arrays):
+        self.users = list(users or [])
+        self.user_index = {user_id: i for i, user_id in enumerate(self.users)}
+        for name, dtype in COLUMN_DTYPES.items():
+            setattr(self, name, np.asarray(arrays.get(name, ()), dtype=dtype))
+
+    def __len__(self):
+        return len(self.day)
+
+    def user_ordinal(self, user_id):
+        index = self.user_index.get(user_id)
+        if index is None:
+            index = self.user_index[user_id] = len(self.users)
+            self.users.append(user_id)
+        return index
+
+    def rows_to_arrays(self, rows):
+        """Driver rows (ATTENDANCE_SQL column order) -> dict of typed arrays."""
+        n = len(rows)
+        user = np.empty(n, np.int32)
+        day = np.empty(n, np.int32)
+        time_in = np.empty(n, np.int16)
+        time_out = np.empty(n, np.int16)
+        hours = np.empty(n, np.float32)
+        break_hours = np.empty(n, np.float32)
+        status = np.empty(n, np.int8)
+        for i, (user_id, row_date, t_in, t_out, worked, breaks, row_status) in enumerate(rows):
+            user[i] = self.user_ordinal(user_id)
+            day[i] = to_day(row_date)
+            time_in[i] = to_minutes(t_in)
+            time_out[i] = to_minutes(t_out)
+            hours[i] = np.nan if worked is None else worked
+            break_hours[i] = breaks or 0
+            status[i] = STATUS_CODES.get(row_status, -1)
+        return {"user": user, "day": day, "time_in": time_in, "time_out": time_out,
+                "hours": hours, "break_hours": break_hours, "status": status}
+
+    # append/keep return new columns (sharing the users list, which only grows) so
+    # metrics running in worker threads never see a half-applied refresh
+
+    def _derive(self, arrays):
+        derived = AttendanceColumns.__new__(AttendanceColumns)
+        derived.users, derived.user_index = self.users, self.user_index
+        for name in COLUMN_DTYPES:
+            setattr(derived, name, arrays[name])
+        return derived
+
+    def append(self, *parts):
+        return self._derive({name: np.concatenate([getattr(self, name)] + [part[name] for part in parts])
+                             for name in COLUMN_DTYPES})
+
+    def keep(self, mask):
+        return self._derive({name: getattr(self, name)[mask] for name in COLUMN_DTYPES})
+
+    def pair_keys(self):
+        return self.user.astype(np.int64) << 32 | self.day.astype(np.int64)
+
+    def save(self, path, **meta):
+        """Write an .npz snapshot; `meta` holds integers (high-water mark, version)."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, users=np.array(self.users, dtype=str),
+                 **{f"meta_{key}": np.int64(value) for key, value in meta.items()},
+                 **{name: getattr(self, name) for name in COLUMN_DTYPES})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """(columns, meta) from an .npz snapshot."""
+        with np.load(path) as data:
+            columns = cls(data["users"].tolist(), **{name: data[name] for name in COLUMN_DTYPES})
+            meta = {key[5:]: int(data[key]) for key in data.files if key.startswith("meta_")}
+            return columns, meta
+
+
+def default_snapshot_path(identity):
+    """Per-database snapshot file under ANALYTICS_CACHE_DIR ('' disables snapshots)."""
+    directory = os.getenv('ANALYTICS_CACHE_DIR', tempfile.gettempdir())
+    if not directory:
+        return None
+    digest = hashlib.sha1(str(identity).encode()).hexdigest()[:12]
+    return os.path.join(directory, f"wibiz-analytics-{digest}.npz")
+
+
+class AnalyticsStore:
+    """AttendanceColumns kept current against an AsyncDB (see module docstring)."""
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self.columns = None
+        self.high_water = 0     # last change_outbox id applied
+        self.version = None     # data_version the columns reflect
+        self.checked_at = 0.0
+        self._events_since_save = 0
+        self._holes = HoleWatch()
+        self._lock = asyncio.Lock()
+
+    async def get(self, adb):
+        """Current columns, refreshing first if the database may have changed."""
+        async with self._lock:
+            if self.columns is None and self.snapshot_path and os.path.exists(self.snapshot_path):
+                try:
+                    self.columns, meta = await asyncio.to_thread(AttendanceColumns.load, self.snapshot_path)
+                    # version stays None so the first refresh replays events and checks the row count
+                    self.high_water = meta["high_water"]
+                except Exception as e:
+                    print(f"⚠️  Ignoring analytics snapshot {self.snapshot_path}: {e}")
+                    self.columns = None
+            if self.columns is None or time.monotonic() - self.checked_at >= MIN_REFRESH_INTERVAL:
+                async with adb.connection() as conn:
+                    await self.refresh(conn)
+                self.checked_at = time.monotonic()
+            return self.columns
+
+    async def refresh(self, conn):
+        version = await conn.fetchval('SELECT version FROM data_version WHERE id = 1')
+        if self.columns is not None and version == self.version:
+            return
+        # Nothing loaded yet, or records past the high-water mark were pruned (an old snapshot)
+        if self.columns is None or await conn.fetchval(
+                'SELECT pruned_through FROM outbox_state WHERE id = 1') > self.high_water:
+            await self.reload(conn)
+            return
+
+        records = await conn.fetchall('''
+            SELECT id, table_name, user_id, date FROM change_outbox WHERE id > ? ORDER BY id
+        ''', (self.high_water,))
+        # Every table's ids count for the hole check; stop short of an unsettled one
+        settled = self._holes.readable(self.high_water, [record[0] for record in records])
+        complete, records = settled == len(records), records[:settled]
+        events = [record for record in records if record[1] == 'attendance']
+        touched = {(user_id, str(event_date)[:10]) for _, _, user_id, event_date in events}
+        dates = sorted({event_date for _, event_date in touched})
+        # Records from before the outbox carried user_id/date can't be placed
+        if len(dates) > MAX_INCREMENTAL_DATES or any(user_id is None for user_id, _ in touched):
+            await self.reload(conn)
+            return
+
+        if touched:
+            columns = self.columns
+            keys = np.array([columns.user_ordinal(user_id) << 32 | to_day(event_date)
+                             for user_id, event_date in touched], dtype=np.int64)
+            placeholders = ', '.join('?' for _ in dates)
+            rows = await conn.fetchall(f"{ATTENDANCE_SQL} WHERE date IN ({placeholders})",
+                                       tuple(date.fromisoformat(d) for d in dates))
+            rows = [row for row in rows if (row[0], str(row[1])[:10]) in touched]
+            kept = columns.keep(~np.isin(columns.pair_keys(), keys))
+            self.columns = kept.append(columns.rows_to_arrays(rows))
+            self._events_since_save += len(events)
+        if records:
+            self.high_water = records[-1][0]
+
+        # Bulk loads that drop the capture triggers leave no records; the row count gives them away
+        if await conn.fetchval('SELECT COUNT(*) FROM attendance') != len(self.columns):
+            await self.reload(conn)
+            return
+        # Behind an unsettled hole: leave the version unset so the next refresh reads again
+        self.version = version if complete else None
+        if self._events_since_save >= SAVE_EVERY_EVENTS:
+            await self.save()
+
+    async def reload(self, conn):
+        """Full load (high-water mark and version are read first, so nothing is missed)."""
+        version = await conn.fetchval('SELECT version FROM data_version WHERE id = 1')
+        high_water = await conn.fetchval(HEAD_SQL)
+        columns = AttendanceColumns()
+        parts = []
+        async for rows in conn.stream(ATTENDANCE_SQL, chunk_size=50000):
+            parts.append(columns.rows_to_arrays(rows))
+        columns = columns.append(*parts)
+        self.columns, self.high_water, self.version = columns, high_water, version
+        await self.save()
+
+    async def save(self):
+        self._events_since_save = 0
+        if self.snapshot_path:
+            await asyncio.to_thread(self.columns.save, self.snapshot_path,
+                                    high_water=self.high_water, version=self.version)
+
+
+# ─── Metrics ─────────────────────────────────────────────────────────────────
+
+def select(columns, date_from=None, date_to=None, user_id=None, complete_only=True):
+    """Boolean row mask for the common filters."""
+    mask = np.ones(len(columns), dtype=bool)
+    if complete_only:
+        mask &= columns.status == COMPLETE
+    if date_from is not None:
+        mask &= columns.day >= date_from.toordinal()
+    if date_to is not None:
+        mask &= columns.day <= date_to.toordinal()
+    if user_id is not None:
+        index = columns.user_index.get(user_id)
+        if index is None:
+            return np.zeros(len(columns), dtype=bool)
+        mask &= columns.user == index
+    return mask
+
+
+def weekdays(days):
+    return (days - 1) % 7  # date(1, 1, 1) is ordinal 1 and a Monday
+
+
+def count_percentiles(counts, resolution=1, fmt=None):
+    """Percentiles (lower nearest-rank) from a histogram on a fixed grid.
+
+    `counts[i]` is how many values fall in [i, i+1) * resolution. Exact for
+    whole-minute arrivals, and within one grid step otherwise — an O(N)
+    bincount instead of np.percentile's partitions of the full array.
+    """
+    total = int(counts.sum())
+    if total == 0:
+        return {f"p{p}": None for p in PERCENTILES}
+    ranks = np.ceil(np.array(PERCENTILES) / 100 * total).clip(1, None)
+    positions = np.searchsorted(np.cumsum(counts), ranks) * resolution
+    return {f"p{p}": (fmt(v) if fmt else round(float(v), 2)) for p, v in zip(PERCENTILES, positions.tolist())}
+
+
+def grid_counts(values, resolution):
+    # The small nudge keeps float32 values like 20 min (0.33333334 h * 60) on their grid line
+    return np.bincount(np.floor(np.clip(values, 0, None) / resolution + 1e-4).astype(np.int64))
+
+
+def histogram_bins(counts, width, fmt):
+    """Regroup fine grid counts into `width`-step bins, dropping empty ones."""
+    coarse = np.add.reduceat(counts, np.arange(0, len(counts), width)) if len(counts) else counts
+    return [{"start": fmt(i), "count": int(coarse[i // width])}
+            for i in (np.flatnonzero(coarse) * width).tolist()]
+
+
+def arrival_distribution(columns, mask, bin_minutes=15):
+    """Histogram of clock-in times plus percentiles and the mean arrival."""
+    arrivals = columns.time_in[mask & (columns.time_in >= 0)]
+    counts = np.bincount(arrivals, minlength=1440)  # per minute of the day
+    return {
+        "rows": int(len(arrivals)),
+        "bin_minutes": bin_minutes,
+        "bins": histogram_bins(counts, bin_minutes, format_minutes),
+        "mean": format_minutes(counts @ np.arange(len(counts)) / len(arrivals)) if len(arrivals) else None,
+        "percentiles": count_percentiles(counts, fmt=format_minutes),
+    }
+
+
+def weekly_heatmap(columns, mask):
+    """Weekday x hour-of-day: arrivals, staffed person-hours and average headcount.
+
+    Coverage is a difference array over the 10,080 minutes of a week (+1 at
+    clock-in, -1 at clock-out, cumulative sum), so each row costs O(1) no
+    matter how long the shift is. Shifts past midnight carry into the next
+    weekday; Sunday night wraps to Monday.
+    """
+    valid = mask & (columns.time_in >= 0) & (columns.time_out >= 0)
+    time_in = columns.time_in[valid].astype(np.int32)
+    length = columns.time_out[valid] - time_in
+    length[length < 0] += 1440
+    days = columns.day[valid]
+    weekday = weekdays(days)
+
+    start = weekday * 1440 + time_in
+    end = start + length
+    wrapped = end >= MINUTES_PER_WEEK
+    end[wrapped] -= MINUTES_PER_WEEK
+    diff = (np.bincount(start, minlength=MINUTES_PER_WEEK)
+            - np.bincount(end, minlength=MINUTES_PER_WEEK))
+    on_duty = np.cumsum(diff) + int(np.count_nonzero(wrapped))
+    staffed_hours = on_duty.reshape(7, 24, 60).sum(axis=2) / 60
+
+    arrivals = np.bincount(weekday * 24 + time_in // 60, minlength=168).reshape(7, 24)
+
+    # Average headcount = person-hours / number of such weekdays in the covered range
+    occurrences = np.zeros(7)
+    if len(days):
+        span = np.arange(days.min(), days.max() + 1)
+        occurrences = np.bincount(weekdays(span), minlength=7)
+    average = np.divide(staffed_hours, occurrences[:, None], out=np.zeros_like(staffed_hours),
+                        where=occurrences[:, None] > 0)
+    return {
+        "rows": int(valid.sum()),
+        "weekdays": WEEKDAYS,
+        "hours": list(range(24)),
+        "arrivals": arrivals.tolist(),
+        "staffed_hours": np.round(staffed_hours, 1).tolist(),
+        "avg_headcount": np.round(average, 2).tolist(),
+    }
+
+
+def hours_distribution(columns, mask, bin_hours=0.5):
+    hours = columns.hours[mask & ~np.isnan(columns.hours)]
+    counts = grid_counts(hours, 0.01)
+    step = int(round(bin_hours / 0.01))
+    return {
+        "rows": int(len(hours)),
+        "mean": round(float(hours.mean(dtype=np.float64)), 2) if len(hours) else None,
+        "std": round(float(hours.std(dtype=np.float64)), 2) if len(hours) else None,
+        "percentiles": count_percentiles(counts, 0.01),
+        "bin_hours": bin_hours,
+        "bins": histogram_bins(counts, step, lambda start: round(start * 0.01, 2)),
+    }
+
+
+def break_distribution(columns, mask, bin_minutes=5):
+    breaks = columns.break_hours[mask]
+    taken = breaks[breaks > 0] * 60
+    counts = grid_counts(taken, 0.1)
+    return {
+        "rows": int(len(breaks)),
+        "with_break": int(len(taken)),
+        "share_with_break": round(len(taken) / len(breaks), 3) if len(breaks) else None,
+        "mean_minutes": round(float(taken.mean(dtype=np.float64)), 1) if len(taken) else None,
+        "percentiles_minutes": count_percentiles(counts, 0.1),
+        "bin_minutes": bin_minutes,
+        "bins": histogram_bins(counts, bin_minutes * 10, lambda start: int(round(start * 0.1))),
+    }
+
+
+def period_index(days, period):
+    """Day ordinals -> months (or years) since 1970, via a lookup table over the day span."""
+    if len(days) == 0:
+        return np.zeros(0, dtype=np.int64)
+    first = int(days.min())
+    span = (np.arange(first, int(days.max()) + 1) - EPOCH_ORDINAL).astype('datetime64[D]')
+    table = span.astype('datetime64[M]' if period == "month" else 'datetime64[Y]').astype(np.int64)
+    return table[days - first]
+
+
+def period_label(index, period):
+    if period == "month":
+        return f"{1970 + index // 12}-{index % 12 + 1:02d}"
+    return str(1970 + index)
+
+
+def person_trends(columns, mask, period="month"):
+    """Per person per month/year totals, plus the least-squares slope of hours per period."""
+    mask = mask & ~np.isnan(columns.hours)
+    users = columns.user[mask].astype(np.int64)
+    periods = period_index(columns.day[mask], period)
+    if len(users) == 0:
+        return {"period": period, "people": []}
+
+    first = periods.min()
+    n_periods = int(periods.max() - first + 1)
+    group = users * n_periods + (periods - first)
+    size = (int(users.max()) + 1) * n_periods
+    hours = np.bincount(group, weights=columns.hours[mask], minlength=size)
+    days_worked = np.bincount(group, minlength=size)
+    time_in = columns.time_in[mask]
+    arrived = time_in >= 0
+    arrival_sum = np.bincount(group[arrived], weights=time_in[arrived], minlength=size)
+    arrival_count = np.bincount(group[arrived], minlength=size)
+
+    # Slope of hours vs period index over the periods each person actually worked
+    active = np.flatnonzero(days_worked)
+    person = active // n_periods
+    x = (active % n_periods).astype(np.float64)
+    y = hours[active]
+    n_people = size // n_periods
+    n = np.bincount(person, minlength=n_people)
+    sx = np.bincount(person, weights=x, minlength=n_people)
+    sy = np.bincount(person, weights=y, minlength=n_people)
+    sxy = np.bincount(person, weights=x * y, minlength=n_people)
+    sxx = np.bincount(person, weights=x * x, minlength=n_people)
+    denominator = n * sxx - sx * sx
+    slope = np.divide(n * sxy - sx * sy, denominator, out=np.zeros(n_people), where=denominator > 0)
+
+    # active is sorted, so each person's groups are one contiguous run
+    labels = [period_label(int(first) + i, period) for i in range(n_periods)]
+    period_of = (active % n_periods).tolist()
+    totals = np.round(hours[active], 1).tolist()
+    days = days_worked[active].tolist()
+    averages = np.round(hours[active] / days_worked[active], 2).tolist()
+    counted = arrival_count[active]
+    mean_arrival = np.divide(arrival_sum[active], counted, out=np.full(len(active), -1.0), where=counted > 0)
+    arrivals = [format_minutes(m) if m >= 0 else None for m in mean_arrival.tolist()]
+    person_totals = np.bincount(person, weights=y, minlength=n_people)
+
+    people = []
+    starts = np.flatnonzero(np.r_[True, person[1:] != person[:-1]])
+    for start, end in zip(starts.tolist(), np.r_[starts[1:], len(active)].tolist()):
+        p = int(person[start])
+        people.append({
+            "user_id": columns.users[p],
+            "total_hours": round(float(person_totals[p]), 1),
+            "trend_hours_per_period": round(float(slope[p]), 2),
+            "points": [{
+                "period": labels[period_of[i]],
+                "total_hours": totals[i],
+                "days_worked": days[i],
+                "avg_hours_per_day": averages[i],
+                "avg_arrival": arrivals[i],
+            } for i in range(start, end)],
+        })
+    people.sort(key=lambda person_trend: person_trend["total_hours"], reverse=True)
+    return {"period": period, "people": people}
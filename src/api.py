@@ -1,15 +1,203 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from email.utils import format_datetime
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime, timedelta
-import json
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+from datetime import date as date_cls, datetime, timedelta
+import asyncio
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.database import AttendanceDB, USE_POSTGRES
+from src.analytics import (AnalyticsStore, arrival_distribution, break_distribution,
+                           default_snapshot_path, hours_distribution, person_trends, select,
+                           weekly_heatmap)
+from src.async_db import AsyncDB
+from src.cache import get_cache
+from src.metrics import CONTENT_TYPE, MetricsMiddleware, render
+from src.events import ChangeFeed, RESYNC, format_sse
+from src.outbox import USER_HEAD_SQL
+from src.reports import (REPORT_COLUMNS, PERIOD_EXPRESSIONS, build_filters, csv_chunk,
+                         decode_cursor, encode_cursor, ndjson_chunk, report_select)
+from src.periods import month_key, period_keys, week_key
+from src.presence import PRESENCE_DAYS_SQL, PRESENCE_STAFF_SQL, PresenceIndex, parse_weekdays
+from src.search import SEARCH_ORDERS, next_cursor, parse_terms, search_query
+from src.serialization import RowEncoder, dumps, json_response, round1, to_str, to_str_or_none
+from src.timesheet import TIMESHEET_SQL, build_timesheet
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await feed.close()
+    await adb.close()
 
+app = FastAPI(lifespan=lifespan)
+
+db = AttendanceDB()
+adb = AsyncDB(db_url=getattr(db, 'db_url', None), db_file=getattr(db, 'db_file', None))
+feed = ChangeFeed(adb)
+cache = get_cache()
+analytics = AnalyticsStore(default_snapshot_path(getattr(db, 'db_url', None) or getattr(db, 'db_file', None)))
+
+def fix_sql(sql):
+    """Convert SQLite syntax to PostgreSQL if needed (placeholders are handled by AsyncDB)."""
+    if USE_POSTGRES:
+        sql = sql.replace('"complete"', "'complete'")
+        sql = sql.replace('"clocked_in"', "'clocked_in'")
+        sql = sql.replace('"on_break"', "'on_break'")
+        # PostgreSQL date concat
+        sql = sql.replace("date || user_id", "date::text || user_id")
+    return sql
+
+# Dashboard endpoints whose response only changes when the data version
+# (bumped by attendance, task and staff writes) or the PST date changes.
+CONDITIONAL_PATHS = {
+    "/api/attendance/today",
+    "/api/attendance/count",
+    "/api/attendance/summary/daily",
+    "/api/attendance/summary/weekly",
+    "/api/attendance/summary/monthly",
+    "/api/attendance/week",
+    "/api/tasks/today",
+    "/api/tasks/search",
+    "/api/stats",
+    "/api/dashboard",
+    "/api/reports/attendance",
+    "/api/reports/tasks",
+    "/api/reports/summary",
+    "/api/analytics/arrivals",
+    "/api/analytics/heatmap",
+    "/api/analytics/hours",
+    "/api/analytics/breaks",
+    "/api/analytics/trends",
+    "/api/attendance/presence",
+}
+
+async def get_data_version():
+    """(version, updated_at) from the single-row data_version table."""
+    return await adb.fetchone('SELECT version, updated_at FROM data_version WHERE id = 1')
+
+def make_etag(version, today):
+    return f'W/"{version}-{today}"'
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    weak = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == weak for tag in if_none_match.split(','))
+
+# Read endpoints served through the cache, with the tables (cache namespaces)
+# they read; AttendanceDB invalidates a namespace whenever it writes that table.
+CACHED_PATHS = {
+    "/api/attendance/today": ("attendance", "staff"),
+    "/api/attendance/count": ("attendance", "staff"),
+    "/api/attendance/summary/daily": ("attendance",),
+    "/api/attendance/summary/weekly": ("attendance",),
+    "/api/attendance/summary/monthly": ("attendance",),
+    "/api/attendance/week": ("attendance", "staff"),
+    "/api/tasks/today": ("tasks", "staff"),
+    "/api/tasks/search": ("tasks", "staff"),
+    "/api/stats": ("attendance", "tasks"),
+    "/api/dashboard": ("attendance", "tasks", "staff"),
+    "/api/reports/summary": ("attendance",),
+    "/api/analytics/arrivals": ("attendance",),
+    "/api/analytics/heatmap": ("attendance",),
+    "/api/analytics/hours": ("attendance",),
+    "/api/analytics/breaks": ("attendance",),
+    "/api/analytics/trends": ("attendance",),
+    "/api/attendance/presence": ("attendance", "staff"),
+}
+
+# Both layers are plain ASGI rather than @app.middleware("http"): that wraps
+# every response in a chunked stream, and GZipMiddleware only applies
+# minimum_size to bodies sent as a single message.
+class ResponseCacheMiddleware:
+    """Serve repeat summary reads from the cache instead of re-running the query."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        namespaces = CACHED_PATHS.get(scope["path"]) if scope["type"] == "http" else None
+        if namespaces is None or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        key = f"{scope['path']}?{scope['query_string'].decode('latin-1')}@{db.get_current_pst_time().date()}"
+        if not cache.shared:
+            # A per-process cache never sees the bot's invalidations; key on the data version too
+            key += f"#{scope.get('state', {}).get('data_version', '')}"
+        key = await cache.akey(namespaces, key)
+        body = await cache.aget(key)
+        if body is not None:
+            return await Response(body, media_type="application/json", headers={"X-Cache": "hit"})(
+                scope, receive, send)
+
+        start, chunks = None, []
+
+        async def buffer(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] != 200:
+                    await send(message)
+                return
+            if start["status"] != 200:
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                body = b"".join(chunks)
+                await cache.aset(key, body)
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                headers["X-Cache"] = "miss"
+                headers["Content-Length"] = str(len(body))
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffer)
+
+
+class ConditionalGetMiddleware:
+    """Answer unchanged dashboard polls with 304 before any attendance query runs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in CONDITIONAL_PATHS:
+            return await self.app(scope, receive, send)
+        row = await get_data_version()
+        if not row:
+            return await self.app(scope, receive, send)
+        version, updated_at = row
+        scope.setdefault("state", {})["data_version"] = version
+        validators = {
+            "ETag": make_etag(version, db.get_current_pst_time().date()),
+            "Last-Modified": format_datetime(datetime.fromisoformat(updated_at), usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, validators["ETag"]):
+            return await Response(status_code=304, headers=validators)(scope, receive, send)
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                headers.update(validators)
+                message = {**message, "headers": headers.raw}
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
+
+
+# Added first so it runs inside ConditionalGetMiddleware: 304s never touch the cache
+app.add_middleware(ResponseCacheMiddleware)
+app.add_middleware(ConditionalGetMiddleware)
+
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Added after the other middleware so 304s and cache hits carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -23,170 +211,167 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-db = AttendanceDB()
+# Outermost: times every request end to end, including cache hits and 304s
+app.add_middleware(MetricsMiddleware)
 
-STAFF_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'staff_registry.json')
+# Per-endpoint row encoders. Dates and times are emitted by the JSON encoder
+# itself; only Postgres TIMESTAMPs need str() to keep the "YYYY-MM-DD HH:MM:SS" form.
+TIMESTAMP = to_str if USE_POSTGRES else None
 
-def load_staff_registry():
-    try:
-        with open(STAFF_REGISTRY_PATH, 'r') as f:
-            data = json.load(f)
-            return data['staff']
-    except FileNotFoundError:
-        print("⚠️  Staff registry not found")
-        return []
-
-def get_conn():
-    """Get a database connection regardless of backend."""
-    if USE_POSTGRES:
-        import psycopg2
-        return psycopg2.connect(db.db_url)
-    else:
-        import sqlite3
-        return sqlite3.connect(db.db_file)
+TODAY_ENCODER = RowEncoder([
+    ("name", None), ("time_in", to_str_or_none), ("time_out", to_str_or_none),
+    ("break_start", to_str_or_none), ("break_end", to_str_or_none),
+    ("break_duration", None), ("hours_worked", None), ("status", None),
+])
+TASKS_ENCODER = RowEncoder([
+    ("name", None), ("task", None), ("url", None), ("created_at", TIMESTAMP),
+])
+DAILY_ENCODER = RowEncoder([
+    ("date", None), ("staff_count", None), ("total_hours", round1),
+    ("completed", None), ("still_working", None),
+])
+WEEKLY_ENCODER = RowEncoder([
+    ("week", None), ("week_start", None), ("week_end", None), ("unique_staff", None),
+    ("days_worked", None), ("total_hours", round1), ("avg_hours_per_day", round1),
+])
+RANGE_SUMMARY_ENCODER = RowEncoder([
+    ("period", to_str), ("start", to_str), ("end", to_str), ("unique_staff", None),
+    ("days_worked", None), ("total_hours", round1), ("avg_hours_per_day", round1),
+    ("total_break_hours", round1),
+])
+WEEK_ENCODER = RowEncoder([
+    ("name", None), ("total_hours", round1), ("days_worked", None),
+])
+SEARCH_ENCODER = RowEncoder([
+    ("id", None), ("user_id", None), ("name", None), ("date", None), ("task", None),
+    # bm25 scores on a large corpus can be ~1e-6, so keep significant digits, not decimals
+    ("url", None), ("relevance", lambda score: float(f"{-score:.4g}")),
+])
+REPORT_ENCODERS = {
+    table: RowEncoder([(column, TIMESTAMP if column == "created_at" else None) for column in columns])
+    for table, columns in REPORT_COLUMNS.items()
+}
 
-def fix_sql(sql):
-    """Convert SQLite syntax to PostgreSQL if needed."""
-    if USE_POSTGRES:
-        sql = sql.replace('?', '%s')
-        sql = sql.replace('"complete"', "'complete'")
-        sql = sql.replace('"clocked_in"', "'clocked_in'")
-        sql = sql.replace('"on_break"', "'on_break'")
-        # PostgreSQL date concat
-        sql = sql.replace("date || user_id", "date::text || user_id")
-        # PostgreSQL week format (no strftime)
-        sql = sql.replace("strftime('%Y-W%W', date)", "to_char(date, 'IYYY-IW')")
-        sql = sql.replace("strftime('%Y-%m', date)", "to_char(date, 'YYYY-MM')")
-    return sql
-
-@app.get("/")
-def root():
-    return {"message": "WiBiz Attendance API", "status": "running"}
-
-@app.get("/api/attendance/today")
-def get_today_attendance():
-    conn = get_conn()
-    cursor = conn.cursor()
-    pst_now = db.get_current_pst_time()
-    today = pst_now.strftime('%Y-%m-%d')
-    cursor.execute(fix_sql('''
-        SELECT name, time_in, time_out, break_start, break_end,
-               break_duration, hours_worked, status
-        FROM attendance
-        WHERE date = ?
-        ORDER BY time_in
-    '''), (today,))
-    results = cursor.fetchall()
-    conn.close()
-    data = []
-    for name, time_in, time_out, break_start, break_end, break_duration, hours, status in results:
-        data.append({
-            "name": name,
-            "time_in": str(time_in) if time_in else None,
-            "time_out": str(time_out) if time_out else None,
-            "break_start": str(break_start) if break_start else None,
-            "break_end": str(break_end) if break_end else None,
-            "break_duration": break_duration,
-            "hours_worked": hours,
-            "status": status
-        })
-    return {"data": data}
+# Display names live in staff (attendance/tasks carry only user_id)
+TODAY_SQL = '''
+    SELECT s.name, a.time_in, a.time_out, a.break_start, a.break_end,
+           a.break_duration, a.hours_worked, a.status
+    FROM attendance a
+    JOIN staff s ON s.user_id = a.user_id
+    WHERE a.date = ?
+    ORDER BY a.time_in
+'''
+TASKS_TODAY_SQL = '''
+    SELECT s.name, t.task_description, t.deliverable_url, t.created_at
+    FROM tasks t
+    JOIN staff s ON s.user_id = t.user_id
+    WHERE t.date = ? ORDER BY t.created_at DESC
+'''
 
-@app.get("/api/attendance/count")
-def get_attendance_count():
-    conn = get_conn()
-    cursor = conn.cursor()
-    pst_now = db.get_current_pst_time()
-    today = pst_now.strftime('%Y-%m-%d')
-    cursor.execute(fix_sql('''
-        SELECT DISTINCT user_id, name FROM attendance WHERE date = ?
-    '''), (today,))
-    present_staff = cursor.fetchall()
-    conn.close()
-    all_staff = load_staff_registry()
-    active_staff = [s for s in all_staff if s['active']]
-    present_ids = {staff[0] for staff in present_staff}
+async def query_attendance_count(conn, today):
+    """Active staff split into present/absent with one anti-join."""
+    rows = await conn.fetchall('''
+        SELECT s.name, s.role, p.user_id IS NOT NULL
+        FROM staff s
+        LEFT JOIN (SELECT DISTINCT user_id FROM attendance WHERE date = ?) p
+               ON p.user_id = s.user_id
+        WHERE s.active
+        ORDER BY s.position, s.name
+    ''', (today,))
     present = []
     absent = []
-    for staff in active_staff:
-        if staff['user_id'] in present_ids:
-            present.append({"name": staff['name'], "role": staff['role']})
-        else:
-            absent.append({"name": staff['name'], "role": staff['role']})
+    for name, role, is_present in rows:
+        (present if is_present else absent).append({"name": name, "role": role})
     return {
-        "date": today,
-        "total_staff": len(active_staff),
+        "date": str(today),
+        "total_staff": len(rows),
         "present_count": len(present),
         "absent_count": len(absent),
         "present": present,
         "absent": absent
     }
 
+async def query_stats(conn, today):
+    """All /api/stats figures in one pass over attendance."""
+    monday = today - timedelta(days=today.weekday())
+    (total_attendance, total_tasks, total_hours, week_hours,
+     currently_working, on_break) = await conn.fetchone(fix_sql('''
+        SELECT COUNT(*),
+               (SELECT COUNT(*) FROM tasks),
+               SUM(CASE WHEN status = 'complete' THEN hours_worked END),
+               SUM(CASE WHEN status = 'complete' AND date >= ? THEN hours_worked END),
+               COUNT(DISTINCT CASE WHEN date = ? AND status = 'clocked_in' THEN user_id END),
+               COUNT(DISTINCT CASE WHEN date = ? AND status = 'on_break' THEN user_id END)
+        FROM attendance
+    '''), (monday, today, today))
+    return {
+        "total_attendance": total_attendance,
+        "total_tasks": total_tasks,
+        "total_hours": round(total_hours or 0, 1),
+        "week_hours": round(week_hours or 0, 1),
+        "currently_working": currently_working,
+        "on_break": on_break
+    }
+
+@app.get("/")
+async def root():
+    return {"message": "WiBiz Attendance API", "status": "running"}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request latency, status and DB statement metrics in Prometheus text format (this process)."""
+    return Response(render(), media_type=CONTENT_TYPE)
+
+@app.get("/api/attendance/today")
+async def get_today_attendance(format: str = None):
+    pst_now = db.get_current_pst_time()
+    today = pst_now.date()
+    results = await adb.fetchall(fix_sql(TODAY_SQL), (today,))
+    return json_response(TODAY_ENCODER.encode(results, columnar=format == "columnar"))
+
+@app.get("/api/attendance/count")
+async def get_attendance_count():
+    pst_now = db.get_current_pst_time()
+    async with adb.connection() as conn:
+        return await query_attendance_count(conn, pst_now.date())
+
 @app.get("/api/attendance/summary/daily")
-def get_daily_summary():
-    conn = get_conn()
-    cursor = conn.cursor()
+async def get_daily_summary(format: str = None):
     pst_now = db.get_current_pst_time()
-    thirty_days_ago = (pst_now - timedelta(days=30)).strftime('%Y-%m-%d')
-    cursor.execute(fix_sql('''
+    thirty_days_ago = (pst_now - timedelta(days=30)).date()
+    results = await adb.fetchall(fix_sql('''
         SELECT date, COUNT(DISTINCT user_id), SUM(hours_worked),
                COUNT(CASE WHEN status = 'complete' THEN 1 END),
                COUNT(CASE WHEN status = 'clocked_in' THEN 1 END)
         FROM attendance WHERE date >= ? GROUP BY date ORDER BY date DESC
     '''), (thirty_days_ago,))
-    results = cursor.fetchall()
-    conn.close()
-    data = []
-    for date, staff_count, total_hours, completed, still_working in results:
-        data.append({
-            "date": str(date),
-            "staff_count": staff_count,
-            "total_hours": round(total_hours, 1) if total_hours else 0,
-            "completed": completed,
-            "still_working": still_working
-        })
-    return {"data": data}
+    return json_response(DAILY_ENCODER.encode(results, columnar=format == "columnar"))
 
 @app.get("/api/attendance/summary/weekly")
-def get_weekly_summary():
-    conn = get_conn()
-    cursor = conn.cursor()
+async def get_weekly_summary(format: str = None):
     pst_now = db.get_current_pst_time()
-    twelve_weeks_ago = (pst_now - timedelta(weeks=12)).strftime('%Y-%m-%d')
-    cursor.execute(fix_sql('''
-        SELECT strftime('%Y-W%W', date), MIN(date), MAX(date),
+    twelve_weeks_ago = (pst_now - timedelta(weeks=12)).date()
+    # Stored keys: an ordered range scan of idx_attendance_week, same labels on every backend
+    results = await adb.fetchall(fix_sql('''
+        SELECT week_key, MIN(date), MAX(date),
                COUNT(DISTINCT user_id), COUNT(DISTINCT date || user_id),
                SUM(hours_worked), AVG(hours_worked)
-        FROM attendance WHERE date >= ? AND status = 'complete'
-        GROUP BY strftime('%Y-W%W', date) ORDER BY 1 DESC
-    '''), (twelve_weeks_ago,))
-    results = cursor.fetchall()
-    conn.close()
-    data = []
-    for week, week_start, week_end, unique_staff, days_worked, total_hours, avg_hours in results:
-        data.append({
-            "week": week, "week_start": str(week_start), "week_end": str(week_end),
-            "unique_staff": unique_staff, "days_worked": days_worked,
-            "total_hours": round(total_hours, 1) if total_hours else 0,
-            "avg_hours_per_day": round(avg_hours, 1) if avg_hours else 0
-        })
-    return {"data": data}
+        FROM attendance WHERE status = 'complete' AND week_key >= ?
+        GROUP BY week_key ORDER BY week_key DESC
+    '''), (week_key(twelve_weeks_ago),))
+    return json_response(WEEKLY_ENCODER.encode(results, columnar=format == "columnar"))
 
 @app.get("/api/attendance/summary/monthly")
-def get_monthly_summary():
-    conn = get_conn()
-    cursor = conn.cursor()
+async def get_monthly_summary():
     pst_now = db.get_current_pst_time()
-    twelve_months_ago = (pst_now - timedelta(days=365)).strftime('%Y-%m-%d')
-    cursor.execute(fix_sql('''
-        SELECT strftime('%Y-%m', date), COUNT(DISTINCT user_id),
+    twelve_months_ago = (pst_now - timedelta(days=365)).date()
+    results = await adb.fetchall(fix_sql('''
+        SELECT month_key, COUNT(DISTINCT user_id),
                COUNT(DISTINCT date || user_id), SUM(hours_worked),
                AVG(hours_worked), SUM(break_duration)
-        FROM attendance WHERE date >= ? AND status = 'complete'
-        GROUP BY strftime('%Y-%m', date) ORDER BY 1 DESC
-    '''), (twelve_months_ago,))
-    results = cursor.fetchall()
-    conn.close()
+        FROM attendance WHERE status = 'complete' AND month_key >= ?
+        GROUP BY month_key ORDER BY month_key DESC
+    '''), (month_key(twelve_months_ago),))
     data = []
     for month, unique_staff, days_worked, total_hours, avg_hours, break_hours in results:
         date_obj = datetime.strptime(str(month), '%Y-%m')
@@ -199,86 +384,437 @@ def get_monthly_summary():
             "avg_hours_per_day": round(avg_hours, 1) if avg_hours else 0,
             "total_break_hours": round(break_hours, 1) if break_hours else 0
         })
-    return {"data": data}
+    return json_response({"data": data})
 
 @app.get("/api/attendance/week")
-def get_week_attendance():
-    conn = get_conn()
-    cursor = conn.cursor()
+async def get_week_attendance(format: str = None):
     pst_now = db.get_current_pst_time()
     today = pst_now.date()
     monday = today - timedelta(days=today.weekday())
-    cursor.execute(fix_sql('''
-        SELECT name, SUM(hours_worked), COUNT(*)
-        FROM attendance WHERE date >= ? AND status = 'complete'
-        GROUP BY name ORDER BY 2 DESC
-    '''), (monday.strftime('%Y-%m-%d'),))
-    results = cursor.fetchall()
-    conn.close()
-    data = []
-    for name, total_hours, days in results:
-        data.append({
-            "name": name,
-            "total_hours": round(total_hours, 1) if total_hours else 0,
-            "days_worked": days
-        })
-    return {"data": data}
+    results = await adb.fetchall(fix_sql('''
+        SELECT MAX(s.name), SUM(a.hours_worked), COUNT(*)
+        FROM attendance a
+        JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date >= ? AND a.status = 'complete'
+        GROUP BY a.user_id ORDER BY 2 DESC
+    '''), (monday,))
+    return json_response(WEEK_ENCODER.encode(results, columnar=format == "columnar"))
 
 @app.get("/api/tasks/today")
-def get_today_tasks():
-    conn = get_conn()
-    cursor = conn.cursor()
+async def get_today_tasks(format: str = None):
     pst_now = db.get_current_pst_time()
-    today = pst_now.strftime('%Y-%m-%d')
-    cursor.execute(fix_sql('''
-        SELECT name, task_description, deliverable_url, created_at
-        FROM tasks WHERE date = ? ORDER BY created_at DESC
-    '''), (today,))
-    results = cursor.fetchall()
-    conn.close()
-    data = []
-    for name, task, url, created_at in results:
-        data.append({"name": name, "task": task, "url": url, "created_at": str(created_at)})
-    return {"data": data}
+    today = pst_now.date()
+    results = await adb.fetchall(fix_sql(TASKS_TODAY_SQL), (today,))
+    return json_response(TASKS_ENCODER.encode(results, columnar=format == "columnar"))
+
+@app.get("/api/tasks/search")
+async def search_tasks(
+    q: str,
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+    order: str = "rank",
+    after: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    format: str = None,
+):
+    """Full-text task search, best match first (or ?order=recent), paged by keyset (?after=<next_cursor>)."""
+    if order not in SEARCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order must be one of {', '.join(SEARCH_ORDERS)}")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    if not parse_terms(q):
+        raise HTTPException(status_code=400, detail="Query has no searchable words")
+    try:
+        sql, params = search_query(q, USE_POSTGRES, date_from, date_to, user_id, order, after, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    results = await adb.fetchall(sql, tuple(params))
+    return json_response(SEARCH_ENCODER.encode(
+        results, columnar=format == "columnar", next_cursor=next_cursor(results, order, limit)))
 
 @app.get("/api/stats")
-def get_stats():
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM attendance')
-    total_attendance = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM tasks')
-    total_tasks = cursor.fetchone()[0]
-    cursor.execute(fix_sql('''
-        SELECT SUM(hours_worked) FROM attendance WHERE status = 'complete'
-    '''))
-    total_hours = cursor.fetchone()[0] or 0
+async def get_stats():
     pst_now = db.get_current_pst_time()
-    today = pst_now.date()
+    async with adb.connection() as conn:
+        return await query_stats(conn, pst_now.date())
+
+DASHBOARD_SECTIONS = ("today", "count", "daily", "weekly", "monthly", "week", "tasks", "stats")
+
+def rollup_summaries(rows, today, sections):
+    """Build the daily/weekly/monthly/week sections from per-(date, user) aggregates.
+
+    Same shapes, labels (src/periods.py) and whole-period windows as the
+    individual summary endpoints.
+    """
+    daily_from = today - timedelta(days=30)
+    weekly_from = today - timedelta(weeks=12)
+    weekly_from -= timedelta(days=weekly_from.weekday())  # ISO weeks start on Monday
     monday = today - timedelta(days=today.weekday())
-    cursor.execute(fix_sql('''
-        SELECT SUM(hours_worked) FROM attendance
-        WHERE date >= ? AND status = 'complete'
-    '''), (monday.strftime('%Y-%m-%d'),))
-    week_hours = cursor.fetchone()[0] or 0
-    cursor.execute(fix_sql('''
-        SELECT COUNT(DISTINCT user_id) FROM attendance
-        WHERE date = ? AND status = 'clocked_in'
-    '''), (today.strftime('%Y-%m-%d'),))
-    currently_working = cursor.fetchone()[0]
-    cursor.execute(fix_sql('''
-        SELECT COUNT(DISTINCT user_id) FROM attendance
-        WHERE date = ? AND status = 'on_break'
-    '''), (today.strftime('%Y-%m-%d'),))
-    on_break = cursor.fetchone()[0]
-    conn.close()
-    return {
-        "total_attendance": total_attendance,
-        "total_tasks": total_tasks,
-        "total_hours": round(total_hours, 1),
-        "week_hours": round(week_hours, 1),
-        "currently_working": currently_working,
-        "on_break": on_break
-    }
+    daily, weekly, monthly, week = {}, {}, {}, {}
+
+    for (day, user_id, name, hours_all, completed, still_working,
+         complete_hours, complete_hours_count, complete_break) in rows:
+        day = date_cls.fromisoformat(str(day))
+        if day >= daily_from:
+            d = daily.setdefault(day, {"users": set(), "hours": 0.0, "completed": 0, "still_working": 0})
+            d["users"].add(user_id)
+            d["hours"] += hours_all or 0
+            d["completed"] += completed
+            d["still_working"] += still_working
+        if not completed:
+            continue
+        day_week, day_month = period_keys(day)
+        periods = [(monthly, day_month)]
+        if day >= weekly_from:
+            periods.append((weekly, day_week))
+        for bucket, key in periods:
+            p = bucket.setdefault(key, {"start": day, "end": day, "users": set(), "days": 0,
+                                        "hours": 0.0, "hours_count": 0, "breaks": 0.0})
+            p["start"], p["end"] = min(p["start"], day), max(p["end"], day)
+            p["users"].add(user_id)
+            p["days"] += 1
+            p["hours"] += complete_hours or 0
+            p["hours_count"] += complete_hours_count
+            p["breaks"] += complete_break or 0
+        if day >= monday:
+            w = week.setdefault(user_id, {"name": name, "hours": 0.0, "days": 0})
+            w["hours"] += complete_hours or 0
+            w["days"] += completed
+
+    def avg(p):
+        return round(p["hours"] / p["hours_count"], 1) if p["hours_count"] else 0
+
+    result = {}
+    if "daily" in sections:
+        result["daily"] = [{
+            "date": str(day), "staff_count": len(d["users"]),
+            "total_hours": round(d["hours"], 1), "completed": d["completed"],
+            "still_working": d["still_working"]
+        } for day, d in sorted(daily.items(), reverse=True)]
+    if "weekly" in sections:
+        result["weekly"] = [{
+            "week": key, "week_start": str(p["start"]), "week_end": str(p["end"]),
+            "unique_staff": len(p["users"]), "days_worked": p["days"],
+            "total_hours": round(p["hours"], 1), "avg_hours_per_day": avg(p)
+        } for key, p in sorted(weekly.items(), reverse=True)]
+    if "monthly" in sections:
+        result["monthly"] = [{
+            "month": key, "month_name": datetime.strptime(key, '%Y-%m').strftime('%B %Y'),
+            "unique_staff": len(p["users"]), "days_worked": p["days"],
+            "total_hours": round(p["hours"], 1), "avg_hours_per_day": avg(p),
+            "total_break_hours": round(p["breaks"], 1)
+        } for key, p in sorted(monthly.items(), reverse=True)]
+    if "week" in sections:
+        result["week"] = [{
+            "name": w["name"], "total_hours": round(w["hours"], 1), "days_worked": w["days"]
+        } for w in sorted(week.values(), key=lambda w: w["hours"], reverse=True)]
+    return result
+
+@app.get("/api/dashboard")
+async def get_dashboard(include: str = None):
+    """Everything the dashboard loads, over one connection (?include=today,stats,...)."""
+    sections = set(DASHBOARD_SECTIONS)
+    if include:
+        sections = {section.strip() for section in include.split(',') if section.strip()}
+        unknown = sections - set(DASHBOARD_SECTIONS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(sorted(unknown))}")
+
+    pst_now = db.get_current_pst_time()
+    today = pst_now.date()
+    result = {"date": str(today)}
+
+    async with adb.connection() as conn:
+        if "today" in sections:
+            rows = await conn.fetchall(fix_sql(TODAY_SQL), (today,))
+            result["today"] = TODAY_ENCODER.records(rows)
+
+        if "count" in sections:
+            result["count"] = await query_attendance_count(conn, today)
+
+        if sections & {"daily", "weekly", "monthly", "week"}:
+            # One scan of the last year, pre-aggregated per person per day
+            rows = await conn.fetchall(fix_sql('''
+                SELECT a.date, a.user_id, MAX(s.name),
+                       SUM(hours_worked),
+                       COUNT(CASE WHEN status = 'complete' THEN 1 END),
+                       COUNT(CASE WHEN status = 'clocked_in' THEN 1 END),
+                       SUM(CASE WHEN status = 'complete' THEN hours_worked END),
+                       COUNT(CASE WHEN status = 'complete' THEN hours_worked END),
+                       SUM(CASE WHEN status = 'complete' THEN break_duration END)
+                FROM attendance a
+                JOIN staff s ON s.user_id = a.user_id
+                WHERE a.date >= ?
+                GROUP BY a.date, a.user_id
+            '''), ((today - timedelta(days=365)).replace(day=1),))
+            result.update(rollup_summaries(rows, today, sections))
+
+        if "tasks" in sections:
+            rows = await conn.fetchall(fix_sql(TASKS_TODAY_SQL), (today,))
+            result["tasks"] = TASKS_ENCODER.records(rows)
+
+        if "stats" in sections:
+            result["stats"] = await query_stats(conn, today)
+
+    return json_response(result)
+
+def report_filters(table, date_from, date_to, user_id, status):
+    if table not in REPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Unknown report table: {table}")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    if status and table != "attendance":
+        raise HTTPException(status_code=400, detail="'status' only applies to attendance")
+    return build_filters(date_from, date_to, user_id, status)
+
+@app.get("/api/reports/summary")
+async def get_range_summary(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+    status: str = "complete",
+    period: str = "day",
+    format: str = None,
+):
+    """Per-day/week/month totals for any date range."""
+    if period not in PERIOD_EXPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(PERIOD_EXPRESSIONS)}")
+    where, params = report_filters("attendance", date_from, date_to, user_id, status)
+    expression = PERIOD_EXPRESSIONS[period]
+    results = await adb.fetchall(fix_sql(f'''
+        SELECT {expression}, MIN(date), MAX(date),
+               COUNT(DISTINCT user_id), COUNT(DISTINCT date || user_id),
+               SUM(hours_worked), AVG(hours_worked), SUM(break_duration)
+        FROM attendance{where}
+        GROUP BY {expression} ORDER BY 1
+    '''), tuple(params))
+    return json_response(RANGE_SUMMARY_ENCODER.encode(results, columnar=format == "columnar"))
+
+@app.get("/api/reports/{table}")
+async def get_report_rows(
+    table: str,
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+    status: str = None,
+    after: str = None,
+    limit: int = Query(200, ge=1, le=1000),
+    format: str = None,
+):
+    """Raw attendance/task rows for a range, paged by keyset (?after=<next_cursor>)."""
+    where, params = report_filters(table, date_from, date_to, user_id, status)
+    if after:
+        try:
+            after_date, after_id = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        where += (' AND ' if where else ' WHERE ') + '(date > ? OR (date = ? AND id > ?))'
+        params += [after_date, after_date, after_id]
+    columns = REPORT_COLUMNS[table]
+    results = await adb.fetchall(
+        f"SELECT {report_select(table)} FROM {table}{where} ORDER BY date, id LIMIT {limit}",
+        tuple(params))
+    next_cursor = None
+    if len(results) == limit:
+        last = results[-1]
+        next_cursor = encode_cursor(last[columns.index("date")], last[0])
+    return json_response(REPORT_ENCODERS[table].encode(
+        results, columnar=format == "columnar", next_cursor=next_cursor))
+
+@app.get("/api/reports/{table}/export")
+async def export_report(
+    table: str,
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+    status: str = None,
+    format: str = "csv",
+):
+    """Stream every matching row as CSV or NDJSON in constant memory."""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    where, params = report_filters(table, date_from, date_to, user_id, status)
+    columns = REPORT_COLUMNS[table]
+    sql = f"SELECT {report_select(table)} FROM {table}{where} ORDER BY date, id"
+
+    async def stream():
+        header = columns if format == "csv" else None
+        async with adb.connection() as conn:
+            async for rows in conn.stream(sql, tuple(params)):
+                if format == "csv":
+                    yield csv_chunk(rows, header)
+                    header = None
+                else:
+                    yield ndjson_chunk(REPORT_ENCODERS[table], rows)
+        if header:
+            yield csv_chunk([], header)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"{table}.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(stream(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/api/staff/{user_id}/timesheet")
+async def get_staff_timesheet(
+    user_id: str,
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+):
+    """One person's daily rows with weekly/monthly subtotals (defaults to the last 30 days)."""
+    date_to = date_to or db.get_current_pst_time().date()
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+
+    async with adb.connection() as conn:
+        # Keyed on the user's latest outbox record, so other people's writes don't evict it
+        user_version = await conn.fetchval(USER_HEAD_SQL, (user_id,))
+        key = await cache.akey("staff", f"timesheet:{user_id}:{date_from}:{date_to}:{user_version}")
+        body = await cache.aget(key)
+        if body is None:
+            staff = await conn.fetchone('SELECT name, role FROM staff WHERE user_id = ?', (user_id,))
+            rows = await conn.fetchall(TIMESHEET_SQL, (user_id, date_from, date_to))
+            if not rows and not staff:
+                raise HTTPException(status_code=404, detail="Unknown user_id")
+            name, role = staff if staff else (None, None)
+            body = dumps({"user_id": user_id, "name": name, "role": role,
+                          **build_timesheet(rows, date_from, date_to)})
+            await cache.aset(key, body)
+
+    return Response(body, media_type="application/json")
+
+@app.get("/api/attendance/presence")
+async def get_presence(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    weekdays: str = "mon-fri",
+    absent_more_than: int = Query(None, ge=0),
+    include_inactive: bool = False,
+):
+    """Attendance rate, absences and streaks per person from the presence bitmaps (defaults to the last year).
+
+    With absent_more_than, only the people absent on more than that many of the open days.
+    """
+    date_to = date_to or db.get_current_pst_time().date()
+    date_from = date_from or date_to - timedelta(days=364)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    try:
+        days = parse_weekdays(weekdays)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="weekdays must look like 'mon-fri' or 'mon,wed'")
+    async with adb.connection() as conn:
+        index = PresenceIndex.from_rows(await conn.fetchall(PRESENCE_DAYS_SQL), await conn.fetchall(PRESENCE_STAFF_SQL))
+    if absent_more_than is not None:
+        absent = await asyncio.to_thread(index.absent_more_than, absent_more_than, date_from, date_to, days,
+                                         not include_inactive)
+        data = [{"user_id": user_id, "name": name, "absent": count} for user_id, name, count in absent]
+    else:
+        data = await asyncio.to_thread(index.summary, date_from, date_to, days, not include_inactive)
+    return json_response({"from": str(date_from), "to": str(date_to), "weekdays": sorted(days), "data": data})
+
+async def run_analytics(metric, date_from, date_to, user_id, *args):
+    """Apply the common filters and run a vectorized metric off the event loop."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    columns = await analytics.get(adb)
+    mask = select(columns, date_from, date_to, user_id)
+    result = await asyncio.to_thread(metric, columns, mask, *args)
+    return json_response({"from": date_from and str(date_from), "to": date_to and str(date_to),
+                          "user_id": user_id, **result})
+
+@app.get("/api/analytics/arrivals")
+async def get_arrival_analytics(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+    bin: int = Query(15, ge=1, le=240),
+):
+    """Clock-in time histogram and percentiles."""
+    return await run_analytics(arrival_distribution, date_from, date_to, user_id, bin)
+
+@app.get("/api/analytics/heatmap")
+async def get_heatmap_analytics(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+):
+    """Weekday x hour-of-day arrivals, staffed hours and average headcount."""
+    return await run_analytics(weekly_heatmap, date_from, date_to, user_id)
+
+@app.get("/api/analytics/hours")
+async def get_hours_analytics(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+):
+    """Distribution and percentiles of hours worked per completed day."""
+    return await run_analytics(hours_distribution, date_from, date_to, user_id)
+
+@app.get("/api/analytics/breaks")
+async def get_break_analytics(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+):
+    """Break-length distribution (minutes) and how often breaks are taken."""
+    return await run_analytics(break_distribution, date_from, date_to, user_id)
+
+@app.get("/api/analytics/trends")
+async def get_trend_analytics(
+    date_from: date_cls = Query(None, alias="from"),
+    date_to: date_cls = Query(None, alias="to"),
+    user_id: str = None,
+    period: str = "month",
+):
+    """Per-person monthly/yearly totals with a hours-per-period trend slope."""
+    if period not in ("month", "year"):
+        raise HTTPException(status_code=400, detail="period must be month or year")
+    return await run_analytics(person_trends, date_from, date_to, user_id, period)
+
+def parse_event_id(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-Sent Events feed of attendance/task changes (resumes via Last-Event-ID)."""
+    last_event_id = parse_event_id(
+        request.headers.get("last-event-id") or request.query_params.get("last_event_id"))
+    subscriber = await feed.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            async for event in subscriber.events():
+                yield format_sse(event)
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/api/ws/events")
+async def websocket_events(websocket: WebSocket):
+    """Same feed as /api/events over a WebSocket (?last_event_id= to resume)."""
+    await websocket.accept()
+    subscriber = await feed.subscribe(parse_event_id(websocket.query_params.get("last_event_id")))
+    try:
+        async for event in subscriber.events():
+            if event is None:
+                await websocket.send_json({"type": "heartbeat"})
+            elif event is RESYNC:
+                await websocket.send_json({"type": "resync"})
+                await websocket.close()
+                return
+            else:
+                await websocket.send_json({"type": "change", "event": event})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed.unsubscribe(subscriber)
 
 # ✅ NO uvicorn.run() here — Vercel handles this automatically
\ No newline at end of file
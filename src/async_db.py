@@ -0,0 +1,222 @@
+"""
+Async database layer for the API.
+
+Picks the backend the same way src/database.py does (PostgreSQL when
+DATABASE_URL is set, SQLite otherwise) but talks to it through native async
+drivers — asyncpg and aiosqlite — behind a small connection pool, so API
+endpoints can await their queries instead of blocking FastAPI's threadpool.
+
+Queries are written with SQLite-style ? placeholders, like everywhere else in
+the project; they are rewritten to $1, $2, ... for asyncpg. Every fetch and
+connection borrow is reported to src/metrics.py.
+"""
+import asyncio
+import collections
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+from src.database import DATABASE_URL, USE_POSTGRES
+from src.metrics import DB_CONNECTIONS, record_connection, record_statement
+
+if USE_POSTGRES:
+    import asyncpg
+else:
+    import aiosqlite
+
+DEFAULT_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+
+
+def _pg_sql(sql):
+    """Convert ? placeholders to asyncpg's numbered $n placeholders."""
+    counter = iter(range(1, sql.count('?') + 1))
+    return re.sub(r'\?', lambda _: f'${next(counter)}', sql)
+
+
+def _sqlite_params(params):
+    """SQLite stores dates as ISO text, so pass date objects the same way."""
+    return tuple(p.isoformat(' ') if isinstance(p, datetime)
+                 else p.isoformat() if isinstance(p, date)
+                 else p
+                 for p in params)
+
+
+class AsyncConnection:
+    """A pooled connection with the same fetch helpers on both backends."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    async def fetchall(self, sql, params=()):
+        started = time.perf_counter()
+        if USE_POSTGRES:
+            rows = await self.raw.fetch(_pg_sql(sql), *params)
+        else:
+            cursor = await self.raw.execute(sql, _sqlite_params(params))
+            rows = await cursor.fetchall()
+            await cursor.close()
+        record_statement(sql, time.perf_counter() - started, len(rows))
+        return rows
+
+    async def fetchone(self, sql, params=()):
+        started = time.perf_counter()
+        if USE_POSTGRES:
+            row = await self.raw.fetchrow(_pg_sql(sql), *params)
+        else:
+            cursor = await self.raw.execute(sql, _sqlite_params(params))
+            row = await cursor.fetchone()
+            await cursor.close()
+        record_statement(sql, time.perf_counter() - started, row is not None)
+        return row
+
+    async def fetchval(self, sql, params=()):
+        row = await self.fetchone(sql, params)
+        return row[0] if row else None
+
+    async def stream(self, sql, params=(), chunk_size=500):
+        """Yield lists of rows from a server-side cursor, chunk_size at a time.
+
+        Only time spent fetching counts as statement time, not the consumer's
+        time between chunks.
+        """
+        seconds, total = 0.0, 0
+        try:
+            if USE_POSTGRES:
+                # asyncpg cursors only exist inside a transaction
+                async with self.raw.transaction():
+                    started = time.perf_counter()
+                    cursor = await self.raw.cursor(_pg_sql(sql), *params)
+                    while True:
+                        rows = await cursor.fetch(chunk_size)
+                        seconds += time.perf_counter() - started
+                        if not rows:
+                            break
+                        total += len(rows)
+                        yield rows
+                        started = time.perf_counter()
+                return
+            started = time.perf_counter()
+            cursor = await self.raw.execute(sql, _sqlite_params(params))
+            try:
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    seconds += time.perf_counter() - started
+                    if not rows:
+                        break
+                    total += len(rows)
+                    yield rows
+                    started = time.perf_counter()
+            finally:
+                await cursor.close()
+        finally:
+            record_statement(sql, seconds, total)
+
+
+class _SQLitePool:
+    """Minimal pool of aiosqlite connections (each one owns a worker thread).
+
+    Released connections are handed straight to the oldest waiter so a burst of
+    new requests can't starve the ones already queued.
+    """
+
+    def __init__(self, db_file, max_size):
+        self.db_file = db_file
+        self.max_size = max_size
+        self._idle = []
+        self._waiters = collections.deque()
+        self._size = 0
+
+    async def acquire(self):
+        if self._idle:
+            return self._idle.pop()
+        if self._size < self.max_size:
+            self._size += 1
+            try:
+                DB_CONNECTIONS.inc('aiosqlite', 'open')
+                return await aiosqlite.connect(self.db_file)
+            except Exception:
+                self._size -= 1
+                raise
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+            raise
+
+    def release(self, conn):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(conn)
+                return
+        self._idle.append(conn)
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+            self._size -= 1
+
+
+class AsyncDB:
+    def __init__(self, db_url=None, db_file=None, pool_size=DEFAULT_POOL_SIZE):
+        self.db_url = db_url or DATABASE_URL
+        self.db_file = db_file
+        self.pool_size = pool_size
+        self._pool = None
+        self._pool_lock = None
+
+    async def _get_pool(self):
+        if self._pool is not None:
+            return self._pool
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self._pool is None:
+                if USE_POSTGRES:
+                    # statement_cache_size=0 keeps asyncpg compatible with
+                    # Supabase's transaction-mode pooler (pgbouncer).
+                    self._pool = await asyncpg.create_pool(
+                        self.db_url, min_size=1, max_size=self.pool_size,
+                        statement_cache_size=0)
+                else:
+                    self._pool = _SQLitePool(self.db_file, self.pool_size)
+        return self._pool
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow one connection for several queries."""
+        started = time.perf_counter()
+        pool = await self._get_pool()
+        if USE_POSTGRES:
+            async with pool.acquire() as raw:
+                record_connection('asyncpg', 'borrow', time.perf_counter() - started)
+                yield AsyncConnection(raw)
+        else:
+            raw = await pool.acquire()
+            record_connection('aiosqlite', 'borrow', time.perf_counter() - started)
+            try:
+                yield AsyncConnection(raw)
+            finally:
+                pool.release(raw)
+
+    async def fetchall(self, sql, params=()):
+        async with self.connection() as conn:
+            return await conn.fetchall(sql, params)
+
+    async def fetchone(self, sql, params=()):
+        async with self.connection() as conn:
+            return await conn.fetchone(sql, params)
+
+    async def fetchval(self, sql, params=()):
+        async with self.connection() as conn:
+            return await conn.fetchval(sql, params)
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -4,9 +4,13 @@ import os
 from dotenv import load_dotenv
 import re
 import sqlite3
+import typing
 from datetime import datetime
 from src.database import AttendanceDB
-from src.utils import calculate_hours, extract_tasks, extract_urls
+from src.clock import normalize_clock
+from src.utils import (calculate_hours, extract_tasks, extract_urls, load_json_cached,
+                       TIME_IN_PATTERN, TIME_OUT_PATTERN, NAME_PATTERN, BREAK_START_PATTERN,
+                       BREAK_END_PATTERN)
 import json
 from datetime import datetime, timedelta
 import os
@@ -27,19 +31,20 @@ def get_real_name(user_id, discord_username, message_content):
     if name_match:
         return name_match.group(1).strip()
     
-    # Second, check name mapping file
-    try:
-        with open(NAME_MAPPING_FILE, 'r') as f:
-            name_map = json.load(f)
-            if user_id in name_map:
-                return name_map[user_id]
-    except FileNotFoundError:
-        pass
+    # Second, check name mapping file (cached, reloaded when the file changes)
+    name_map = load_json_cached(NAME_MAPPING_FILE, default={})
+    if user_id in name_map:
+        return name_map[user_id]
     
     # Fallback to Discord username
     return discord_username
 
 
+def clean_time(captured):
+    """Canonical '9:05 PM' for a captured time; text that isn't a clock time is kept, tidied."""
+    return normalize_clock(captured) or ' '.join(captured.split()).upper()
+
+
 # Load environment variables
 load_dotenv(os.path.join(os.getcwd(), 'config', '.env'))
 TOKEN = os.getenv('DISCORD_TOKEN')
@@ -54,6 +59,12 @@ CHANNEL_ID = int(raw_channel_id)
 # Initialize database
 db = AttendanceDB()
 
+# Keep the staff table in step with data/staff_registry.json on every deploy
+try:
+    db.sync_staff_registry()
+except FileNotFoundError:
+    print("⚠️  Staff registry not found")
+
 # Create bot with intents
 intents = discord.Intents.default()
 intents.message_content = True
@@ -61,15 +72,6 @@ intents.members = True
 
 bot = commands.Bot(command_prefix='!', intents=intents)
 
-# Regex patterns for parsing
-TIME_IN_PATTERN = r'Time [Ii]n:?\s*(\d{1,2}:\d{2}\s*[AP]M)'
-TIME_OUT_PATTERN = r'Time [Oo]ut:?\s*(\d{1,2}:\d{2}\s*[AP]M)'
-NAME_PATTERN = r'Name:?\s*([A-Za-z\s]+)'
-DATE_PATTERN = r'Date:?\s*(\d{1,2}\s+\w+\s+\d{4})'
-# Add to existing regex patterns (around line 50)
-BREAK_START_PATTERN = r'[Oo]n [Bb]reak:?\s*(\d{1,2}:\d{2}\s*[APap][Mm])'
-BREAK_END_PATTERN = r'[Bb]ack [Ff]rom [Bb]reak:?\s*(\d{1,2}:\d{2}\s*[APap][Mm])'
-
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
@@ -91,17 +93,15 @@ async def on_message(message):
     
     # Get real name from mapping
     name = get_real_name(str(message.author.id), author, content)
-    date = timestamp.strftime('%Y-%m-%d')
+    # message.created_at is UTC; shifts are dated and timed in Manila
+    date = timestamp.astimezone(db.timezone).strftime('%Y-%m-%d')
     
     # Check for BREAK START
     break_start_match = re.search(BREAK_START_PATTERN, content, re.IGNORECASE)
     if break_start_match:
-        break_start = break_start_match.group(1).strip()
-        # Normalize: convert 'pm' to 'PM', 'am' to 'AM'
-        break_start = re.sub(r'\s+', ' ', break_start)  # Remove extra spaces
-        break_start = break_start.upper()  # Convert to uppercase
+        break_start = clean_time(break_start_match.group(1))
         
-        success = db.save_break_start(str(message.author.id), name, date, break_start)
+        success = db.save_break_start(str(message.author.id), name, date, break_start, at=timestamp)
         if success:
             await message.add_reaction('🍽️')
             print(f'🍽️  {name} on break at {break_start}')
@@ -114,12 +114,9 @@ async def on_message(message):
     # Check for BREAK END
     break_end_match = re.search(BREAK_END_PATTERN, content, re.IGNORECASE)
     if break_end_match:
-        break_end = break_end_match.group(1).strip()
-        # Normalize: convert 'pm' to 'PM', 'am' to 'AM'
-        break_end = re.sub(r'\s+', ' ', break_end)
-        break_end = break_end.upper()
+        break_end = clean_time(break_end_match.group(1))
         
-        success = db.save_break_end(str(message.author.id), name, date, break_end)
+        success = db.save_break_end(str(message.author.id), name, date, break_end, at=timestamp)
         if success:
             await message.add_reaction('✅')
         else:
@@ -133,14 +130,10 @@ async def on_message(message):
     
     if time_out_match:
         # ... (your existing time-out code, but don't deduct lunch automatically)
-        time_out = time_out_match.group(1).strip()
+        time_out = clean_time(time_out_match.group(1))
         time_in_match = re.search(TIME_IN_PATTERN, content, re.IGNORECASE)
         
-        time_in = time_in_match.group(1).strip() if time_in_match else None
-        
-        if time_in:
-            time_in = re.sub(r'\s+', ' ', time_in)
-        time_out = re.sub(r'\s+', ' ', time_out)
+        time_in = clean_time(time_in_match.group(1)) if time_in_match else None
         
         # Calculate hours WITHOUT automatic lunch deduction
         hours_worked = 0.0
@@ -149,7 +142,8 @@ async def on_message(message):
             hours_worked = calculate_hours(time_in, time_out, deduct_lunch=False)  # NO auto-deduction
         
         # Save time-out (will deduct break if logged)
-        db.save_time_out(str(message.author.id), name, date, time_in, time_out, hours_worked)
+        db.save_time_out(str(message.author.id), name, date, time_in, time_out, hours_worked,
+                        at=timestamp)
         
         # Extract tasks
         tasks = extract_tasks(content)
@@ -178,10 +172,9 @@ async def on_message(message):
         # Check for TIME IN
         time_in_match = re.search(TIME_IN_PATTERN, content, re.IGNORECASE)
         if time_in_match:
-            time_in = time_in_match.group(1).strip()
-            time_in = re.sub(r'\s+', ' ', time_in)
+            time_in = clean_time(time_in_match.group(1))
             
-            db.save_time_in(str(message.author.id), name, date, time_in)
+            db.save_time_in(str(message.author.id), name, date, time_in, at=timestamp)
             
             print(f'💾 Saved: {name} clocked in at {time_in}')
             await message.add_reaction('✅')
@@ -232,11 +225,22 @@ async def week(ctx):
     days_since_monday = today.weekday()  # 0=Monday, 6=Sunday
     monday = today - timedelta(days=days_since_monday)
     
+    # Reuse the last reply until an attendance/staff write invalidates it
+    cache_key = db.cache.key(('attendance', 'staff'), f'bot:week:{today}')
+    cached = db.cache.get(cache_key)
+    if cached is not None:
+        conn.close()
+        await ctx.send(cached.decode())
+        return
+    
+    # Group by user_id; the name comes from staff, so renames never split anyone
     cursor.execute('''
-        SELECT name, SUM(hours_worked) as total_hours, COUNT(*) as days_worked
-        FROM attendance
-        WHERE date >= ? AND status = 'complete'
-        GROUP BY name
+        SELECT MAX(s.name) as name,
+               SUM(a.hours_worked) as total_hours, COUNT(*) as days_worked
+        FROM attendance a
+        JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date >= ? AND a.status = 'complete'
+        GROUP BY a.user_id
         ORDER BY total_hours DESC
     ''', (monday.strftime('%Y-%m-%d'),))
     
@@ -251,6 +255,54 @@ async def week(ctx):
     for name, total_hours, days in results:
         response += f"👤 {name}: {total_hours:.1f} hrs ({days} days)\n"
     
+    db.cache.set(cache_key, response.encode())
+    await ctx.send(response)
+
+@bot.command()
+async def timesheet(ctx, member: typing.Optional[discord.Member] = None, date_from: str = None, date_to: str = None):
+    """Show one person's timesheet (usage: !timesheet [@user] [YYYY-MM-DD] [YYYY-MM-DD])"""
+    member = member or ctx.author
+    today = db.get_current_pst_time().date()
+    try:
+        end = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else today
+        start = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else end.replace(day=1)
+    except ValueError:
+        await ctx.send("❌ Dates must be in YYYY-MM-DD format.")
+        return
+
+    sheet = db.get_timesheet(str(member.id), start, end)
+    name = sheet['name'] or member.display_name
+
+    if not sheet['days']:
+        await ctx.send(f"📭 No attendance for {name} between {start} and {end}.")
+        return
+
+    response = f"🗓️ **Timesheet - {name}** ({start.strftime('%b %d')} - {end.strftime('%b %d, %Y')})\n\n"
+
+    if (end - start).days <= 31:
+        for day in sheet['days']:
+            day_label = datetime.strptime(day['date'], '%Y-%m-%d').strftime('%a %b %d')
+            if day['status'] == 'complete':
+                response += f"• {day_label}: {day['time_in']} - {day['time_out']} ({day['hours_worked'] or 0:.1f} hrs"
+                response += f", break {day['break_duration']:.1f})\n" if day['break_duration'] else ")\n"
+            else:
+                response += f"• {day_label}: {day['time_in']} (still working)\n"
+        response += "\n"
+
+    if (end - start).days <= 92:
+        for week in sheet['weekly']:
+            week_label = datetime.strptime(week['start'], '%Y-%m-%d').strftime('%b %d')
+            response += f"📅 Week of {week_label}: {week['total_hours']:.1f} hrs ({week['days_worked']} days)\n"
+    else:
+        for month in sheet['monthly']:
+            response += f"📅 {month['month_name']}: {month['total_hours']:.1f} hrs ({month['days_worked']} days)\n"
+
+    totals = sheet['totals']
+    response += (f"\n⏱️ **Total:** {totals['total_hours']:.1f} hrs over {totals['days_worked']} days"
+                 f" (avg {totals['avg_hours_per_day']:.1f}, breaks {totals['break_hours']:.1f} hrs)")
+
+    if len(response) > 2000:
+        response = response[:1990] + "\n…"
     await ctx.send(response)
 
 @bot.command()
@@ -265,10 +317,11 @@ async def tasks(ctx, *, query=None):
         today = pst_now.strftime('%Y-%m-%d')
         
         cursor.execute('''
-            SELECT name, task_description, deliverable_url
-            FROM tasks
-            WHERE date = ?
-            ORDER BY created_at DESC
+            SELECT s.name, t.task_description, t.deliverable_url
+            FROM tasks t
+            JOIN staff s ON s.user_id = t.user_id
+            WHERE t.date = ?
+            ORDER BY t.created_at DESC
         ''', (today,))
         
         results = cursor.fetchall()
@@ -290,9 +343,10 @@ async def tasks(ctx, *, query=None):
     else:
         # Show recent tasks (last 10)
         cursor.execute('''
-            SELECT name, task_description, date, deliverable_url
-            FROM tasks
-            ORDER BY created_at DESC
+            SELECT s.name, t.task_description, t.date, t.deliverable_url
+            FROM tasks t
+            JOIN staff s ON s.user_id = t.user_id
+            ORDER BY t.created_at DESC
             LIMIT 10
         ''', ())
         
@@ -314,6 +368,35 @@ async def tasks(ctx, *, query=None):
     
     conn.close()
 
+@bot.command()
+async def search(ctx, member: typing.Optional[discord.Member] = None, *, query=None):
+    """Search task descriptions (usage: !search [@user] words [from:YYYY-MM-DD] [to:YYYY-MM-DD])"""
+    bounds = dict(re.findall(r'\b(from|to):(\d{4}-\d{2}-\d{2})\b', query or ''))
+    words = re.sub(r'\b(?:from|to):\S+', '', query or '').strip()
+    try:
+        for date_str in bounds.values():
+            datetime.strptime(date_str, '%Y-%m-%d')
+        results = db.search_tasks(words, bounds.get('from'), bounds.get('to'),
+                                  str(member.id) if member else None, limit=10)
+    except ValueError:
+        await ctx.send("❌ Usage: `!search [@user] words [from:YYYY-MM-DD] [to:YYYY-MM-DD]`")
+        return
+
+    if not results:
+        await ctx.send(f"📭 No tasks matching \"{words}\".")
+        return
+
+    response = f"🔍 **Tasks matching \"{words}\":**\n\n"
+    for _, _, name, date, task, url, _ in results:
+        task_line = f"• {name} ({date}): {task}"
+        if url:
+            task_line += f" [🔗]({url})"
+        response += task_line + "\n"
+
+    if len(response) > 2000:
+        response = response[:1990] + "\n…"
+    await ctx.send(response)
+
 @bot.command()
 async def missing(ctx):
     """Show who hasn't clocked out today"""
@@ -324,10 +407,11 @@ async def missing(ctx):
     today = pst_now.strftime('%Y-%m-%d')
     
     cursor.execute('''
-        SELECT name, time_in
-        FROM attendance
-        WHERE date = ? AND status = 'clocked_in'
-        ORDER BY time_in
+        SELECT s.name, a.time_in
+        FROM attendance a
+        JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date = ? AND a.status = 'clocked_in'
+        ORDER BY a.time_in
     ''', (today,))
     
     results = cursor.fetchall()
@@ -346,6 +430,13 @@ async def missing(ctx):
 @bot.command()
 async def stats(ctx):
     """Show overall system statistics"""
+    # Every figure here scans attendance, so reuse the reply until the next write
+    cache_key = db.cache.key(('attendance', 'tasks'), f'bot:stats:{db.get_current_pst_time().date()}')
+    cached = db.cache.get(cache_key)
+    if cached is not None:
+        await ctx.send(cached.decode())
+        return
+    
     conn = sqlite3.connect(db.db_file)
     cursor = conn.cursor()
     
@@ -385,6 +476,7 @@ async def stats(ctx):
     This Week's Hours: {week_hours:.1f} hrs
     """
     
+    db.cache.set(cache_key, response.encode())
     await ctx.send(response)
 
 @bot.command()
@@ -395,9 +487,8 @@ async def whoami(ctx):
     
     # Check if mapped
     try:
-        with open(NAME_MAPPING_FILE, 'r') as f:
-            name_map = json.load(f)
-            real_name = name_map.get(user_id, "❌ Not mapped")
+        name_map = load_json_cached(NAME_MAPPING_FILE, default={})
+        real_name = name_map.get(user_id, "❌ Not mapped")
     except:
         real_name = "❌ Not mapped"
     
@@ -419,10 +510,11 @@ async def status(ctx):
     today = pst_now.strftime('%Y-%m-%d')
     
     cursor.execute('''
-        SELECT name, time_in, status, break_start
-        FROM attendance
-        WHERE date = ?
-        ORDER BY time_in
+        SELECT s.name, a.time_in, a.status, a.break_start
+        FROM attendance a
+        JOIN staff s ON s.user_id = a.user_id
+        WHERE a.date = ?
+        ORDER BY a.time_in
     ''', (today,))
     
     results = cursor.fetchall()
@@ -0,0 +1,409 @@
+"""
+Pluggable cache shared by the API and the bot.
+
+The backend is picked with CACHE_URL:
+
+    memory://?max_entries=1024&ttl=60      in-process LRU with TTL (default)
+    sqlite:///tmp/wibiz-cache.db?ttl=60    memory-mapped SQLite file, shared by
+                                           every process on the same host
+    redis://:password@host:6379/0?ttl=60   any Redis-protocol server
+                                           (scripts/redis_standin.py locally)
+
+Entries live under namespaces ("attendance", "tasks", "staff"). Every
+namespace has a generation counter that is baked into the keys built from
+it, so invalidating a namespace is a single counter bump however many
+entries it holds: old entries stop being addressable and age out through
+TTL/LRU. AttendanceDB bumps the namespaces a write touches right after it
+commits.
+
+Take the key before building a value (`key = cache.key(...)`, then
+`get`/`set` with it) so a write that lands mid-build makes the stored value
+unreachable instead of caching it under the new generation.
+
+Values are bytes. Backend errors never fail the caller: a cache that is down
+behaves like an empty one, and reads/writes skip it for RETRY_AFTER seconds
+after an error instead of paying a connect timeout on every request.
+Invalidations are always attempted.
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1024
+WARN_INTERVAL = 60
+RETRY_AFTER = 5  # seconds reads/writes skip the backend after it errors
+
+
+class Cache:
+    """Namespaced key/value cache. Subclasses implement the _underscore primitives."""
+
+    shared = False  # True when other processes see the same entries and invalidations
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._last_warning = 0.0
+        self._retry_at = 0.0
+
+    # ─── Backend primitives ────────────────────────────────────────────────────
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _generations(self, namespaces):
+        raise NotImplementedError
+
+    def _bump(self, namespace):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    # ─── Public API ────────────────────────────────────────────────────────────
+
+    def _warn(self, action, error):
+        now = time.monotonic()
+        self._retry_at = now + RETRY_AFTER
+        if now - self._last_warning >= WARN_INTERVAL:
+            self._last_warning = now
+            print(f"⚠️  Cache {action} failed ({type(self).__name__}): {error}")
+
+    def key(self, namespaces, key):
+        """Full key for `key` under the current generation of each namespace."""
+        if isinstance(namespaces, str):
+            namespaces = (namespaces,)
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            generations = self._generations(namespaces)
+        except Exception as e:
+            self._warn('lookup', e)
+            return None
+        prefix = ','.join(f'{ns}.{gen}' for ns, gen in zip(namespaces, generations))
+        return f'{prefix}:{key}'
+
+    def get(self, key):
+        if key is None or time.monotonic() < self._retry_at:
+            return None
+        try:
+            return self._get(key)
+        except Exception as e:
+            self._warn('get', e)
+            return None
+
+    def set(self, key, value, ttl=None):
+        if key is None or time.monotonic() < self._retry_at:
+            return
+        try:
+            self._set(key, value, ttl or self.ttl)
+        except Exception as e:
+            self._warn('set', e)
+
+    def invalidate(self, *namespaces):
+        """Drop every entry built under these namespaces."""
+        for namespace in namespaces:
+            try:
+                self._bump(namespace)
+            except Exception as e:
+                self._warn('invalidate', e)
+
+    def clear(self):
+        try:
+            self._clear()
+        except Exception as e:
+            self._warn('clear', e)
+
+    # Shared backends do I/O, so async callers run them off the event loop
+    async def akey(self, namespaces, key):
+        if not self.shared:
+            return self.key(namespaces, key)
+        return await asyncio.to_thread(self.key, namespaces, key)
+
+    async def aget(self, key):
+        if not self.shared:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key, value, ttl=None):
+        if not self.shared:
+            return self.set(key, value, ttl)
+        return await asyncio.to_thread(self.set, key, value, ttl)
+
+
+# ─── In-process LRU ──────────────────────────────────────────────────────────
+
+class MemoryCache(Cache):
+    """LRU bounded by entry count, with a per-entry TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._namespace_generations = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _generations(self, namespaces):
+        return [self._namespace_generations.get(ns, 0) for ns in namespaces]
+
+    def _bump(self, namespace):
+        with self._lock:
+            self._namespace_generations[namespace] = self._namespace_generations.get(namespace, 0) + 1
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# ─── Shared SQLite file ──────────────────────────────────────────────────────
+
+class SQLiteCache(Cache):
+    """Cache table in a memory-mapped WAL SQLite file.
+
+    Every process on the host that opens the same path shares entries and
+    generations; reads are served from the mmap without a syscall per page.
+    Expired rows are purged and the table trimmed to max_entries (soonest
+    expiry first) every PURGE_EVERY writes.
+    """
+
+    shared = True
+    PURGE_EVERY = 64
+    MMAP_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES * 10, ttl=DEFAULT_TTL):
+        super().__init__(ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries (expires_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_generations (
+                namespace TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+        ''')
+
+    def _conn(self):
+        # sqlite3 connections can't hop threads, and aget/aset run in a thread pool
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?',
+            (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                     (key, value, time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM cache_entries WHERE expires_at < ?', (time.time(),))
+            conn.execute('''
+                DELETE FROM cache_entries WHERE key IN (
+                    SELECT key FROM cache_entries ORDER BY expires_at
+                    LIMIT MAX((SELECT COUNT(*) FROM cache_entries) - ?, 0)
+                )
+            ''', (self.max_entries,))
+
+    def _generations(self, namespaces):
+        placeholders = ', '.join('?' for _ in namespaces)
+        rows = self._conn().execute(
+            f'SELECT namespace, generation FROM cache_generations WHERE namespace IN ({placeholders})',
+            tuple(namespaces)).fetchall()
+        found = dict(rows)
+        return [found.get(ns, 0) for ns in namespaces]
+
+    def _bump(self, namespace):
+        self._conn().execute('''
+            INSERT INTO cache_generations (namespace, generation) VALUES (?, 1)
+            ON CONFLICT (namespace) DO UPDATE SET generation = generation + 1
+        ''', (namespace,))
+
+    def _clear(self):
+        self._conn().execute('DELETE FROM cache_entries')
+
+
+# ─── Redis protocol ──────────────────────────────────────────────────────────
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache(Cache):
+    """Minimal RESP2 client (GET/SET PX/MGET/INCR/SCAN/DEL) over one socket.
+
+    Needs no client library, so it runs against Redis, Valkey, Upstash's
+    TCP endpoint or scripts/redis_standin.py alike. Keys are prefixed so the
+    database can be shared with other apps; the socket reconnects on the
+    next call after an error.
+    """
+
+    shared = True
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 ttl=DEFAULT_TTL, timeout=0.5, prefix='wibiz:'):
+        super().__init__(ttl)
+        self.host, self.port, self.db, self.password = host, port, db, password
+        self.timeout = timeout
+        self.prefix = prefix
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile('rb')
+        if self.password:
+            self._send('AUTH', self.password)
+        if self.db:
+            self._send('SELECT', self.db)
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def _send(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError('connection closed')
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode()
+        if kind == b'-':
+            raise RedisError(body.decode())
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f'unexpected reply {line!r}')
+
+    def command(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                raise
+
+    def _get(self, key):
+        return self.command('GET', self.prefix + key)
+
+    def _set(self, key, value, ttl):
+        self.command('SET', self.prefix + key, value, 'PX', int(ttl * 1000))
+
+    def _generations(self, namespaces):
+        values = self.command('MGET', *(f'{self.prefix}gen:{ns}' for ns in namespaces))
+        return [int(value) if value else 0 for value in values]
+
+    def _bump(self, namespace):
+        self.command('INCR', f'{self.prefix}gen:{namespace}')
+
+    def _clear(self):
+        cursor = '0'
+        while True:
+            cursor, keys = self.command('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+            keys = [key for key in keys if not key.startswith(self.prefix.encode() + b'gen:')]
+            if keys:
+                self.command('DEL', *keys)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            if cursor == '0':
+                break
+
+
+# ─── Construction ────────────────────────────────────────────────────────────
+
+def open_cache(url):
+    """Build a cache from a CACHE_URL-style string."""
+    parsed = urlparse(url)
+    options = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+    ttl = float(options.get('ttl', DEFAULT_TTL))
+
+    if parsed.scheme == 'memory':
+        return MemoryCache(max_entries=int(options.get('max_entries', DEFAULT_MAX_ENTRIES)), ttl=ttl)
+    if parsed.scheme == 'sqlite':
+        path = unquote(parsed.path) or os.path.join('/tmp', 'wibiz-cache.db')
+        return SQLiteCache(path, max_entries=int(options.get('max_entries', DEFAULT_MAX_ENTRIES * 10)), ttl=ttl)
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.lstrip('/') or 0)
+        return RedisCache(host=parsed.hostname or 'localhost', port=parsed.port or 6379, db=db,
+                          password=unquote(parsed.password) if parsed.password else None,
+                          ttl=ttl, timeout=float(options.get('timeout', 0.5)),
+                          prefix=options.get('prefix', 'wibiz:'))
+    raise ValueError(f'Unknown cache backend: {url}')
+
+
+_default_cache = None
+
+
+def get_cache():
+    """The process-wide cache configured by CACHE_URL (memory:// if unset)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = open_cache(os.getenv('CACHE_URL', 'memory://'))
+    return _default_cache
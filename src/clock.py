@@ -0,0 +1,87 @@
+"""
+Clock-time parsing through a precomputed lookup table.
+
+Every spelling the bot sees for a minute of the day, "9:05 PM", "09:05 pm",
+"9:05pm", "9:05 Pm" and so on (1-12 with or without a leading zero, with or
+without the space, any letter case), plus 24-hour "21:05" / "21:05:00", is
+a key in CLOCK_MINUTES mapping to minutes since midnight. Parsing is one
+dict lookup. Anything else gets its whitespace collapsed and is looked up
+once more; unknown text parses to None. Unlike strptime there is no locale
+involved: AM/PM are always the English markers the report format uses.
+
+CLOCK_LABELS[minutes] is the canonical spelling ("9:05 PM") that the bot
+stores, so `normalize_clock` replaces the ad hoc re.sub/.upper() clean-up.
+`parse_clocks` is the batch form for re-processing history into arrays.
+"""
+
+from datetime import time
+
+MINUTES_PER_DAY = 1440
+
+CLOCK_LABELS = [f"{(m // 60 % 12) or 12}:{m % 60:02d} {'AM' if m < 720 else 'PM'}"
+                for m in range(MINUTES_PER_DAY)]
+
+
+def _build_table():
+    table = {}
+    for m in range(MINUTES_PER_DAY):
+        hour, minute = divmod(m, 60)
+        hour12 = (hour % 12) or 12
+        for h in {str(hour12), f"{hour12:02d}"}:
+            for marker in (('AM', 'am', 'Am', 'aM') if hour < 12 else ('PM', 'pm', 'Pm', 'pM')):
+                table[f"{h}:{minute:02d} {marker}"] = m
+                table[f"{h}:{minute:02d}{marker}"] = m
+        for h in {str(hour), f"{hour:02d}"}:
+            table[f"{h}:{minute:02d}"] = m
+            table[f"{h}:{minute:02d}:00"] = m
+    return table
+
+
+CLOCK_MINUTES = _build_table()
+
+
+def parse_clock(text):
+    """'9:05 PM' / '09:05pm' / '21:05' -> minutes since midnight; None if not a clock time.
+
+    datetime.time values (Postgres TIME columns) are accepted as well.
+    """
+    minutes = CLOCK_MINUTES.get(text)
+    if minutes is None:
+        if isinstance(text, str):
+            minutes = CLOCK_MINUTES.get(' '.join(text.split()))
+        elif isinstance(text, time):
+            minutes = text.hour * 60 + text.minute
+    return minutes
+
+
+def normalize_clock(text):
+    """Canonical 'h:MM AM' spelling of a captured time, or None if it doesn't parse."""
+    minutes = parse_clock(text)
+    return None if minutes is None else CLOCK_LABELS[minutes]
+
+
+def clock_span(start, end):
+    """Minutes from start to end (both minutes since midnight), across midnight if end is earlier."""
+    return (end - start) % MINUTES_PER_DAY
+
+
+def parse_clocks(values, missing=-1):
+    """Batch form: iterable of spellings -> int16 array of minutes (`missing` where unparseable).
+
+    Each distinct spelling is resolved once, so long histories that repeat a
+    few thousand spellings cost one dict lookup per row.
+    """
+    import numpy as np  # only the batch form needs it; the bot's hot path stays numpy-free
+
+    values = values if isinstance(values, list) else list(values)
+    resolved = {}
+    for value in set(values):
+        minutes = parse_clock(value)
+        resolved[value] = missing if minutes is None else minutes
+    return np.fromiter(map(resolved.__getitem__, values), dtype=np.int16, count=len(values))
+
+
+if __name__ == '__main__':
+    print(f"{len(CLOCK_MINUTES):,} spellings")
+    for text in ("9:05 PM", "09:05pm", "12:00 AM", "12:30 pm", "21:05", " 7:45   am ", "13:05 PM"):
+        print(f"{text!r:>14} -> {parse_clock(text)} ({normalize_clock(text)})")
@@ -1,10 +1,30 @@
 import os
+import json
 import pytz
-from datetime import datetime
+from datetime import datetime, time, timedelta
+
+from src.cache import get_cache
+from src.clock import clock_span, parse_clock
+from src.metrics import TimedSQLiteConnection, record_connection, timed_postgres_cursor
+from src.outbox import (CAPTURED_TABLES, OUTBOX_TABLES_SQL, OUTBOX_USER_INDEX_SQL, POSTGRES_FUNCTION_SQL,
+                        POSTGRES_TRIGGER_SQL, POSTGRES_VERSION_FUNCTION_SQL, POSTGRES_VERSION_TRIGGER_SQL,
+                        SQLITE_NOW, SQLITE_TRIGGERS_SQL, SQLITE_VERSION_TRIGGERS_SQL, VERSIONED_TABLES)
+from src.periods import PERIOD_INDEXES_SQL, backfill_sql, period_keys
+from src.presence import (PRESENCE_DAYS_SQL, PRESENCE_STAFF_SQL, PresenceIndex, presence_table_sql,
+                          to_bytes, to_int)
+from src.search import (POSTGRES_FTS_SQL, SQLITE_FTS_REBUILD_SQL, SQLITE_FTS_SQL, SQLITE_FTS_TRIGGERS,
+                        search_query)
+from src.timesheet import TIMESHEET_SQL, build_timesheet
 
 # Detect if we should use PostgreSQL or SQLite
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAFF_REGISTRY_FILE = os.path.join(PROJECT_ROOT, 'data', 'staff_registry.json')
+
+# An open shift older than this is a forgotten clock-out, not a night shift
+MAX_SHIFT = timedelta(hours=20)
+
 if DATABASE_URL:
     import psycopg2
     import psycopg2.extras
@@ -14,9 +34,25 @@ else:
     USE_POSTGRES = False
 
 
+def connect(target):
+    """Raw connection for worker processes: target is a postgres:// URL or a SQLite path.
+
+    Returns (conn, sql fixer) so `?` placeholders work on both.
+    """
+    if target.startswith(('postgres://', 'postgresql://')):
+        import psycopg2
+        return psycopg2.connect(target), lambda sql: sql.replace('?', '%s')
+    import sqlite3
+    return sqlite3.connect(target), lambda sql: sql
+
+
 class AttendanceDB:
     def __init__(self, db_file='attendance.db'):
         self.timezone = pytz.timezone('Asia/Manila')
+        self.cache = get_cache()
+        self._open_sessions = {}  # user_id -> id of their open attendance row
+        self._known_staff = set()  # user_ids known to have a staff row
+        self._ordinals = {}  # user_id -> presence bitmap ordinal (never changes once assigned)
 
         if USE_POSTGRES:
             self.db_url = DATABASE_URL
@@ -35,9 +71,12 @@ class AttendanceDB:
     # ─── Connection helpers ────────────────────────────────────────────────────
 
     def _get_conn(self):
+        """New connection whose cursors report statement timings to src/metrics.py."""
         if USE_POSTGRES:
-            return psycopg2.connect(self.db_url)
-        return sqlite3.connect(self.db_file)
+            conn = psycopg2.connect(self.db_url, cursor_factory=timed_postgres_cursor())
+            record_connection('psycopg2', 'open')
+            return conn
+        return sqlite3.connect(self.db_file, factory=TimedSQLiteConnection)
 
     def _placeholder(self):
         """Return the correct paramstyle placeholder."""
@@ -51,12 +90,85 @@ class AttendanceDB:
             sql = sql.replace('BOOLEAN', 'BOOLEAN')
         return sql
 
+    def _add_column(self, cursor, table, column, ddl):
+        """ALTER TABLE ... ADD COLUMN unless it exists (SQLite has no IF NOT EXISTS here)."""
+        cursor.execute(f'SELECT * FROM {table} LIMIT 0')
+        if column not in [description[0] for description in cursor.description]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+
+    def _table_exists(self, cursor, table):
+        if USE_POSTGRES:
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', (table,))
+            return cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone()[0] > 0
+
+    def _insert_returning_id(self, cursor, sql, params):
+        if USE_POSTGRES:
+            cursor.execute(self._fix_sql(sql + ' RETURNING id'), params)
+            return cursor.fetchone()[0]
+        cursor.execute(sql, params)
+        return cursor.lastrowid
+
     def _fetchone(self, cursor):
         row = cursor.fetchone()
         if USE_POSTGRES and row and isinstance(row, tuple):
             return row
         return row
 
+    # ─── Change tracking ───────────────────────────────────────────────────────
+
+    def _install_change_capture(self, cursor):
+        """Outbox tables, row_version columns, capture and data_version triggers (see src/outbox.py)."""
+        for table in CAPTURED_TABLES:
+            self._add_column(cursor, table, 'row_version', 'INTEGER NOT NULL DEFAULT 0')
+        for statement in OUTBOX_TABLES_SQL:
+            cursor.execute(self._fix_sql(statement))
+        self._add_column(cursor, 'change_outbox', 'user_id', 'TEXT')
+        self._add_column(cursor, 'change_outbox', 'date', 'DATE')
+        cursor.execute(OUTBOX_USER_INDEX_SQL)
+        if USE_POSTGRES:
+            cursor.execute(POSTGRES_FUNCTION_SQL)
+            cursor.execute(POSTGRES_VERSION_FUNCTION_SQL)
+            for table in CAPTURED_TABLES:
+                cursor.execute(POSTGRES_TRIGGER_SQL.format(table=table))
+            for table in VERSIONED_TABLES:
+                cursor.execute(POSTGRES_VERSION_TRIGGER_SQL.format(table=table))
+        else:
+            for table in CAPTURED_TABLES:
+                cursor.executescript(SQLITE_TRIGGERS_SQL.format(table=table, now=SQLITE_NOW))
+            for table in VERSIONED_TABLES:
+                cursor.executescript(SQLITE_VERSION_TRIGGERS_SQL.format(table=table, now=SQLITE_NOW))
+
+    def _install_task_search(self, cursor):
+        """Full-text index over task descriptions (see src/search.py)."""
+        if USE_POSTGRES:
+            for statement in POSTGRES_FTS_SQL:
+                cursor.execute(statement)
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_tasks_fts_%'")
+        installed = {row[0] for row in cursor.fetchall()}
+        cursor.execute(SQLITE_FTS_SQL)
+        for name, sql in SQLITE_FTS_TRIGGERS.items():
+            if name not in installed:
+                cursor.execute(sql)
+        # New index, or writes happened while a trigger was missing (bulk loads
+        # drop them): re-read every description
+        if len(installed) < len(SQLITE_FTS_TRIGGERS):
+            cursor.execute(SQLITE_FTS_REBUILD_SQL)
+
+    def _invalidate(self, *namespaces):
+        """Drop cached reads of these tables. Call after the write has committed."""
+        self.cache.invalidate(*namespaces)
+
+    def get_data_version(self):
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        cursor.execute('SELECT version, updated_at FROM data_version WHERE id = 1')
+        row = cursor.fetchone()
+        conn.close()
+        return row
+
     # ─── Utilities ─────────────────────────────────────────────────────────────
 
     def get_current_pst_time(self):
@@ -78,11 +190,27 @@ class AttendanceDB:
         conn = self._get_conn()
         cursor = conn.cursor()
 
+        # One row per person; attendance and tasks carry only user_id and get
+        # display names by joining here, so a rename is a single-row update
+        cursor.execute(self._fix_sql('''
+            CREATE TABLE IF NOT EXISTS staff (
+                user_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                role TEXT,
+                active BOOLEAN NOT NULL DEFAULT TRUE,
+                position INTEGER,
+                updated_at TEXT
+            )
+        '''))
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_staff_active ON staff (active, position)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_staff_role ON staff (role)')
+        cursor.execute('SELECT COUNT(*) FROM staff')
+        staff_count = cursor.fetchone()[0]
+
         cursor.execute(self._fix_sql('''
             CREATE TABLE IF NOT EXISTS attendance (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                name TEXT NOT NULL,
+                user_id TEXT NOT NULL REFERENCES staff (user_id),
                 date DATE NOT NULL,
                 time_in TIME,
                 time_out TIME,
@@ -98,8 +226,7 @@ class AttendanceDB:
         cursor.execute(self._fix_sql('''
             CREATE TABLE IF NOT EXISTS tasks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                name TEXT NOT NULL,
+                user_id TEXT NOT NULL REFERENCES staff (user_id),
                 date DATE NOT NULL,
                 task_description TEXT NOT NULL,
                 has_link BOOLEAN DEFAULT FALSE,
@@ -108,55 +235,407 @@ class AttendanceDB:
             )
         '''))
 
+        self._move_names_to_staff(cursor)
+
+        # Shift sessions carry real start/end instants, so a night shift stays one row
+        timestamp_type = 'TIMESTAMPTZ' if USE_POSTGRES else 'TEXT'
+        self._add_column(cursor, 'attendance', 'started_at', timestamp_type)
+        self._add_column(cursor, 'attendance', 'ended_at', timestamp_type)
+
+        # Stored ISO week / month labels for period summaries (see src/periods.py);
+        # filled before the capture triggers exist on a fresh or bulk-loaded table
+        self._add_column(cursor, 'attendance', 'week_key', 'TEXT')
+        self._add_column(cursor, 'attendance', 'month_key', 'TEXT')
+        for statement in PERIOD_INDEXES_SQL:
+            cursor.execute(statement)
+        cursor.execute('SELECT COUNT(*) FROM attendance WHERE week_key IS NULL OR month_key IS NULL')
+        if cursor.fetchone()[0]:
+            cursor.execute(backfill_sql(USE_POSTGRES))
+            print(f"🔧 Backfilled week_key/month_key on {cursor.rowcount} attendance rows")
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date)')
+        # Partial index over open sessions only: clock-out/break lookups stay O(1)
+        # however much history the table holds
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_attendance_open_session
+            ON attendance (user_id, id) WHERE status IN ('clocked_in', 'on_break')
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks (date)')
+        # Covering index for per-person timesheets: holds every TIMESHEET_SQL column in
+        # (user_id, date, time_in) order, so the range scan neither reads the table nor sorts.
+        # Replaces the narrower idx_attendance_user_date, which still needed both.
+        cursor.execute('DROP INDEX IF EXISTS idx_attendance_user_date')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_attendance_timesheet
+            ON attendance (user_id, date, time_in, time_out, break_start, break_end,
+                           break_duration, hours_worked, status, started_at, ended_at)
+        ''')
+
+        # Single-row counter the capture triggers bump on every write; the API derives ETags from it
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute(self._fix_sql('''
+            INSERT INTO data_version (id, version, updated_at)
+            SELECT 1, 0, ?
+            WHERE NOT EXISTS (SELECT 1 FROM data_version WHERE id = 1)
+        '''), (datetime.now(pytz.utc).isoformat(),))
+
+        # The app-written change log, replaced by change_outbox
+        if self._table_exists(cursor, 'change_events'):
+            cursor.execute('DROP TABLE change_events')
+            print("🔧 Dropped change_events (the API reads change_outbox now)")
+
+        self._install_change_capture(cursor)
+        self._install_task_search(cursor)
+
+        # One bitmap of staff ordinals per day (see src/presence.py)
+        self._add_column(cursor, 'staff', 'ordinal', 'INTEGER')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_staff_ordinal ON staff (ordinal)')
+        presence_new = not self._table_exists(cursor, 'presence_days')
+        cursor.execute(presence_table_sql('BYTEA' if USE_POSTGRES else 'BLOB'))
+
         conn.commit()
         conn.close()
+
+        # First run on this database: seed staff from the JSON registry
+        if staff_count == 0 and os.path.exists(STAFF_REGISTRY_FILE):
+            self.sync_staff_registry()
+        if presence_new:
+            self.rebuild_presence()
+
         print("✅ Database initialized")
 
+    def _move_names_to_staff(self, cursor):
+        """One-off migration: per-row name columns become staff rows, then go."""
+        updated_at = datetime.now(pytz.utc).isoformat()
+        for table in ('attendance', 'tasks'):
+            cursor.execute(f'SELECT * FROM {table} LIMIT 0')
+            if 'name' not in [description[0] for description in cursor.description]:
+                continue
+            # Latest name per person; anyone missing from the registry stays inactive
+            cursor.execute(self._fix_sql(f'''
+                INSERT INTO staff (user_id, name, active, updated_at)
+                SELECT t.user_id, t.name, FALSE, ?
+                FROM {table} t
+                JOIN (SELECT user_id, MAX(id) AS id FROM {table} GROUP BY user_id) latest ON latest.id = t.id
+                WHERE TRUE
+                ON CONFLICT (user_id) DO NOTHING
+            '''), (updated_at,))
+            cursor.execute(f'ALTER TABLE {table} DROP COLUMN name')
+            if USE_POSTGRES:
+                cursor.execute(f'ALTER TABLE {table} ADD FOREIGN KEY (user_id) REFERENCES staff (user_id)')
+            print(f"🔧 Moved {table}.name into the staff table")
+
+    # ─── Staff registry ────────────────────────────────────────────────────────
+
+    def sync_staff(self, staff, deactivate_missing=False):
+        """Upsert staff dicts (user_id, name, role, active) into the staff table.
+
+        With deactivate_missing, anyone not in `staff` is marked inactive
+        (rows are never deleted so history keeps resolving). Returns the
+        number of rows upserted and deactivated.
+        """
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        updated_at = datetime.now(pytz.utc).isoformat()
+
+        rows = [(str(s['user_id']), s['name'], s.get('role'), bool(s.get('active', True)), position, updated_at)
+                for position, s in enumerate(staff)]
+        cursor.executemany(self._fix_sql('''
+            INSERT INTO staff (user_id, name, role, active, position, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                name = excluded.name, role = excluded.role, active = excluded.active,
+                position = excluded.position, updated_at = excluded.updated_at
+            WHERE staff.name <> excluded.name OR staff.active <> excluded.active
+               OR COALESCE(staff.role, '') <> COALESCE(excluded.role, '')
+               OR COALESCE(staff.position, -1) <> COALESCE(excluded.position, -1)
+        '''), rows)
+
+        deactivated = 0
+        if deactivate_missing:
+            cursor.execute('SELECT user_id FROM staff WHERE active')
+            keep = {row[0] for row in rows}
+            missing = [row[0] for row in cursor.fetchall() if row[0] not in keep]
+            cursor.executemany(self._fix_sql('''
+                UPDATE staff SET active = FALSE, updated_at = ? WHERE user_id = ?
+            '''), [(updated_at, user_id) for user_id in missing])
+            deactivated = len(missing)
+
+        self._assign_ordinals(cursor)
+        conn.commit()
+        conn.close()
+        self._invalidate('staff')
+        return len(rows), deactivated
+
+    def sync_staff_registry(self, path=STAFF_REGISTRY_FILE, deactivate_missing=False):
+        """Load data/staff_registry.json into the staff table."""
+        with open(path, 'r') as f:
+            staff = json.load(f).get('staff', [])
+        upserted, deactivated = self.sync_staff(staff, deactivate_missing)
+        print(f"👥 Staff registry synced: {upserted} upserted, {deactivated} deactivated")
+        return upserted, deactivated
+
+    def rename_staff(self, names):
+        """Apply {user_id: display name}: one staff row per person, history untouched.
+
+        Unknown user_ids are added as inactive staff. Returns the number of
+        rows whose name actually changed (or were added).
+        """
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        updated_at = datetime.now(pytz.utc).isoformat()
+        cursor.executemany(self._fix_sql('''
+            INSERT INTO staff (user_id, name, active, updated_at)
+            VALUES (?, ?, FALSE, ?)
+            ON CONFLICT (user_id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at
+            WHERE staff.name <> excluded.name
+        '''), [(str(user_id), name, updated_at) for user_id, name in names.items()])
+        changed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        self._known_staff.update(str(user_id) for user_id in names)
+        if changed:
+            self._invalidate('staff')
+        return changed
+
+    def _ensure_staff(self, cursor, user_id, name):
+        """Give a first-time user_id a staff row (attendance and tasks reference it).
+
+        New people get the name they reported with and stay inactive until the
+        registry lists them; an existing name is never overwritten here.
+        """
+        if user_id in self._known_staff:
+            return
+        cursor.execute(self._fix_sql('''
+            INSERT INTO staff (user_id, name, active, updated_at)
+            VALUES (?, ?, FALSE, ?)
+            ON CONFLICT (user_id) DO NOTHING
+        '''), (user_id, name, datetime.now(pytz.utc).isoformat()))
+        self._known_staff.add(user_id)
+
+    # ─── Presence bitmaps ──────────────────────────────────────────────────────
+
+    def _assign_ordinals(self, cursor):
+        """Give staff rows without a presence ordinal the next free ones, in registry order."""
+        cursor.execute('SELECT COALESCE(MAX(ordinal), -1) FROM staff')
+        start = cursor.fetchone()[0] + 1
+        cursor.execute('SELECT user_id FROM staff WHERE ordinal IS NULL ORDER BY position IS NULL, position, user_id')
+        missing = [row[0] for row in cursor.fetchall()]
+        cursor.executemany(self._fix_sql('UPDATE staff SET ordinal = ? WHERE user_id = ?'),
+                           [(start + offset, user_id) for offset, user_id in enumerate(missing)])
+
+    def _staff_ordinal(self, cursor, user_id):
+        ordinal = self._ordinals.get(user_id)
+        if ordinal is None:
+            cursor.execute(self._fix_sql('SELECT ordinal FROM staff WHERE user_id = ?'), (user_id,))
+            ordinal = cursor.fetchone()[0]
+            if ordinal is None:
+                self._assign_ordinals(cursor)
+                cursor.execute(self._fix_sql('SELECT ordinal FROM staff WHERE user_id = ?'), (user_id,))
+                ordinal = cursor.fetchone()[0]
+            self._ordinals[user_id] = ordinal
+        return ordinal
+
+    def _mark_present(self, cursor, user_id, date):
+        """Set the user's bit in the day's presence bitmap. Call inside the clock-in's transaction."""
+        ordinal = self._staff_ordinal(cursor, user_id)
+        day = str(date)[:10]
+        updated_at = datetime.now(pytz.utc).isoformat()
+        # Create the row first, then lock it: concurrent clock-ins can't overwrite each other's bits
+        cursor.execute(self._fix_sql('''
+            INSERT INTO presence_days (date, bits, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (date) DO NOTHING
+        '''), (day, b'', updated_at))
+        cursor.execute(self._fix_sql('SELECT bits FROM presence_days WHERE date = ?'
+                                     + (' FOR UPDATE' if USE_POSTGRES else '')), (day,))
+        bits = to_int(cursor.fetchone()[0])
+        if not bits >> ordinal & 1:
+            cursor.execute(self._fix_sql('UPDATE presence_days SET bits = ?, updated_at = ? WHERE date = ?'),
+                           (to_bytes(bits | 1 << ordinal), updated_at, day))
+
+    def rebuild_presence(self):
+        """Recompute every bitmap from attendance (after bulk loads or deletes). Returns the day count."""
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        self._assign_ordinals(cursor)
+        cursor.execute('''
+            SELECT a.date, s.ordinal
+            FROM attendance a JOIN staff s ON s.user_id = a.user_id
+            GROUP BY a.date, s.ordinal
+        ''')
+        days = {}
+        for day, ordinal in cursor.fetchall():
+            day = str(day)[:10]
+            days[day] = days.get(day, 0) | 1 << ordinal
+        updated_at = datetime.now(pytz.utc).isoformat()
+        cursor.execute('DELETE FROM presence_days')
+        cursor.executemany(self._fix_sql('INSERT INTO presence_days (date, bits, updated_at) VALUES (?, ?, ?)'),
+                           [(day, to_bytes(bits), updated_at) for day, bits in days.items()])
+        conn.commit()
+        conn.close()
+        return len(days)
+
+    def load_presence(self):
+        """Every bitmap and staff ordinal as a PresenceIndex."""
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        cursor.execute(PRESENCE_DAYS_SQL)
+        days = cursor.fetchall()
+        cursor.execute(PRESENCE_STAFF_SQL)
+        staff = cursor.fetchall()
+        conn.close()
+        return PresenceIndex.from_rows(days, staff)
+
+    # ─── Shift sessions ────────────────────────────────────────────────────────
+
+    def _open_session(self, cursor, user_id):
+        """The user's open shift, whatever its date, or None.
+
+        Returns (id, date, status, time_in, break_start, break_duration, started_at).
+        _open_sessions remembers the row id and is checked with a primary-key
+        read; on a miss the partial index idx_attendance_open_session answers.
+        """
+        columns = 'id, date, status, time_in, break_start, break_duration, started_at'
+        session_id = self._open_sessions.get(user_id)
+        if session_id is not None:
+            cursor.execute(self._fix_sql(f'''
+                SELECT {columns} FROM attendance
+                WHERE id = ? AND status IN ('clocked_in', 'on_break')
+            '''), (session_id,))
+            row = cursor.fetchone()
+            if row:
+                return row
+        cursor.execute(self._fix_sql(f'''
+            SELECT {columns} FROM attendance
+            WHERE user_id = ? AND status IN ('clocked_in', 'on_break')
+            ORDER BY id DESC LIMIT 1
+        '''), (user_id,))
+        row = cursor.fetchone()
+        if row:
+            self._open_sessions[user_id] = row[0]
+        else:
+            self._open_sessions.pop(user_id, None)
+        return row
+
+    def _session_expired(self, session, now):
+        """Open longer than MAX_SHIFT (rows without started_at: dated before yesterday)."""
+        started_at = session[6]
+        if started_at:
+            if not isinstance(started_at, datetime):
+                started_at = datetime.fromisoformat(str(started_at))
+            return now - started_at > MAX_SHIFT
+        return str(session[1])[:10] < (now.date() - timedelta(days=1)).isoformat()
+
+    def _expire_session(self, cursor, user_id, name, session):
+        """Close a forgotten shift as 'incomplete' so new events don't attach to it."""
+        cursor.execute(self._fix_sql('''
+            UPDATE attendance SET status = 'incomplete' WHERE id = ?
+        '''), (session[0],))
+        self._open_sessions.pop(user_id, None)
+        print(f"⚠️  {name}'s shift from {session[1]} was never closed; marked incomplete")
+
+    def _event_instant(self, at=None):
+        """When the event happened, in Manila time: the message timestamp (UTC), else now."""
+        if at is None:
+            return self.get_current_pst_time()
+        return (at if at.tzinfo else pytz.utc.localize(at)).astimezone(self.timezone)
+
+    def _shift_instant(self, clock_time, event, before=False):
+        """A reported '9:00 PM' placed on the real timeline next to the event's instant.
+
+        Returns the occurrence nearest to `event` (a report typed a few minutes
+        late, or '11:58 PM' posted just after midnight), or with before=True the
+        latest one not after it (the time-in read off a clock-out report).
+        None if the text doesn't parse.
+        """
+        minutes = parse_clock(clock_time)
+        if minutes is None:
+            return None
+        instant = self.timezone.localize(datetime.combine(event.date(), time(minutes // 60, minutes % 60)))
+        if before:
+            return instant - timedelta(days=1) if instant > event else instant
+        if instant - event > timedelta(hours=12):
+            return instant - timedelta(days=1)
+        if event - instant > timedelta(hours=12):
+            return instant + timedelta(days=1)
+        return instant
+
     # ─── Save time in ──────────────────────────────────────────────────────────
 
-    def save_time_in(self, user_id, name, date, time_in):
+    def save_time_in(self, user_id, name, date, time_in, at=None):
+        """Open a shift. `date` is the Manila date and `at` the message's timestamp."""
         conn = self._get_conn()
         cursor = conn.cursor()
 
         pst_now = self.get_current_pst_time()
         created_at = pst_now.strftime('%Y-%m-%d %I:%M:%S %p')
+        event = self._event_instant(at)
+        started_at = self._shift_instant(time_in, event) or event
 
-        cursor.execute(self._fix_sql('''
-            SELECT id, status FROM attendance
-            WHERE user_id = ? AND date = ?
-        '''), (user_id, date))
-
-        existing = cursor.fetchone()
-
-        if existing:
-            if existing[1] == 'complete':
-                print(f"⚠️  {name} already has a complete record for today. Ignoring time-in.")
-                conn.close()
-                return
+        session = self._open_session(cursor, user_id)
+        if session and self._session_expired(session, event):
+            self._expire_session(cursor, user_id, name, session)
+            session = None
 
+        if session:
+            # Re-posted time-in for the shift in progress
+            date = session[1]
             cursor.execute(self._fix_sql('''
                 UPDATE attendance
-                SET time_in = ?, created_at = ?
+                SET time_in = ?, started_at = ?, created_at = ?
                 WHERE id = ?
-            '''), (time_in, created_at, existing[0]))
+            '''), (time_in, started_at.isoformat(), created_at, session[0]))
+            session_id = session[0]
         else:
             cursor.execute(self._fix_sql('''
-                INSERT INTO attendance (user_id, name, date, time_in, status, created_at)
-                VALUES (?, ?, ?, ?, 'clocked_in', ?)
-            '''), (user_id, name, date, time_in, created_at))
+                SELECT id FROM attendance
+                WHERE user_id = ? AND date = ? AND status = 'complete'
+            '''), (user_id, date))
+            if cursor.fetchone():
+                print(f"⚠️  {name} already has a complete record for today. Ignoring time-in.")
+                conn.commit()
+                conn.close()
+                return
+
+            self._ensure_staff(cursor, user_id, name)
+            session_id = self._insert_returning_id(cursor, '''
+                INSERT INTO attendance (user_id, date, time_in, status, started_at, created_at,
+                                        week_key, month_key)
+                VALUES (?, ?, ?, 'clocked_in', ?, ?, ?, ?)
+            ''', (user_id, date, time_in, started_at.isoformat(), created_at,
+                  *period_keys(date)))
+            self._mark_present(cursor, user_id, date)
 
         conn.commit()
         conn.close()
+        self._open_sessions[user_id] = session_id
+        self._invalidate('attendance')
         print(f'💾 Saved: {name} clocked in at {time_in}')
 
     # ─── Save time out ─────────────────────────────────────────────────────────
 
-    def save_time_out(self, user_id, name, date, time_in, time_out, hours_worked):
+    def save_time_out(self, user_id, name, date, time_in, time_out, hours_worked, at=None):
+        """Close the open shift. `date` is the Manila date and `at` the message's timestamp."""
         conn = self._get_conn()
         cursor = conn.cursor()
 
         pst_now = self.get_current_pst_time()
         created_at = pst_now.strftime('%Y-%m-%d %I:%M:%S %p')
+        event = self._event_instant(at)
+
+        # ✅ STEP 0: Attach to the open shift, even if it started before midnight
+        session = self._open_session(cursor, user_id)
+        if session and self._session_expired(session, event):
+            self._expire_session(cursor, user_id, name, session)
+            session = None
+        if session:
+            date = str(session[1])[:10]
 
         # ✅ STEP 1: Read break_duration BEFORE deleting anything
         cursor.execute(self._fix_sql('''
@@ -169,15 +648,19 @@ class AttendanceDB:
         break_record = cursor.fetchone()
         break_duration = break_record[0] if break_record else 0
 
-        # ✅ STEP 2: NOW safe to delete the clocked_in/on_break record
-        cursor.execute(self._fix_sql('''
-            DELETE FROM attendance
-            WHERE user_id = ? AND date = ? AND status IN ('clocked_in', 'on_break')
-        '''), (user_id, date))
-
-        # ✅ STEP 3: Calculate net hours after deducting break
+        # ✅ STEP 2: Calculate net hours after deducting break
         net_hours = round(hours_worked - break_duration, 2)
 
+        # The shift ends at the reported time-out and started at the last
+        # reported time-in before that; without one, the session's own start
+        ended_at = self._shift_instant(time_out, event) or event
+        started_at = self._shift_instant(time_in, ended_at, before=True) if time_in else None
+        if started_at is None and session and session[6]:
+            started_at = session[6]
+            if not isinstance(started_at, datetime):
+                started_at = datetime.fromisoformat(str(started_at))
+        started_at, ended_at = started_at and started_at.isoformat(), ended_at.isoformat()
+
         # Check for existing complete record
         cursor.execute(self._fix_sql('''
             SELECT id FROM attendance
@@ -185,28 +668,45 @@ class AttendanceDB:
         '''), (user_id, date))
 
         existing_record = cursor.fetchone()
+        # The session row itself becomes the complete record unless one already exists
+        keep_id = session[0] if session and not existing_record else -1
+
+        # ✅ STEP 3: NOW safe to delete the other clocked_in/on_break records
+        cursor.execute(self._fix_sql('''
+            DELETE FROM attendance
+            WHERE user_id = ? AND date = ? AND status IN ('clocked_in', 'on_break') AND id <> ?
+        '''), (user_id, date, keep_id))
 
-        if existing_record:
+        if existing_record or keep_id != -1:
             cursor.execute(self._fix_sql('''
                 UPDATE attendance
-                SET time_in = ?, time_out = ?, hours_worked = ?, break_duration = ?, created_at = ?
+                SET time_in = ?, time_out = ?, hours_worked = ?, break_duration = ?,
+                    status = 'complete', started_at = ?, ended_at = ?, created_at = ?
                 WHERE id = ?
-            '''), (time_in, time_out, net_hours, break_duration, created_at, existing_record[0]))
+            '''), (time_in, time_out, net_hours, break_duration, started_at, ended_at, created_at,
+                  existing_record[0] if existing_record else keep_id))
         else:
+            self._ensure_staff(cursor, user_id, name)
             cursor.execute(self._fix_sql('''
                 INSERT INTO attendance
-                (user_id, name, date, time_in, time_out, hours_worked, break_duration, status, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 'complete', ?)
-            '''), (user_id, name, date, time_in, time_out, net_hours, break_duration, created_at))
+                (user_id, date, time_in, time_out, hours_worked, break_duration, status,
+                 started_at, ended_at, created_at, week_key, month_key)
+                VALUES (?, ?, ?, ?, ?, ?, 'complete', ?, ?, ?, ?, ?)
+            '''), (user_id, date, time_in, time_out, net_hours, break_duration,
+                  started_at, ended_at, created_at, *period_keys(date)))
+            self._mark_present(cursor, user_id, date)
 
         conn.commit()
         conn.close()
+        self._open_sessions.pop(user_id, None)
+        self._invalidate('attendance')
 
         if break_duration > 0:
             print(f'🍽️  Break deducted: {break_duration:.2f} hrs → Net hours: {net_hours:.2f} hrs')
         else:
             print(f'ℹ️  No break recorded for {name}')
 
+
     # ─── Save task ─────────────────────────────────────────────────────────────
 
     def save_task(self, user_id, name, date, task_description, deliverable_url=None):
@@ -218,13 +718,45 @@ class AttendanceDB:
         pst_now = self.get_current_pst_time()
         created_at = pst_now.strftime('%Y-%m-%d %I:%M:%S %p')
 
+        self._ensure_staff(cursor, user_id, name)
         cursor.execute(self._fix_sql('''
-            INSERT INTO tasks (user_id, name, date, task_description, has_link, deliverable_url, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        '''), (user_id, name, date, task_description, has_link, deliverable_url, created_at))
+            INSERT INTO tasks (user_id, date, task_description, has_link, deliverable_url, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        '''), (user_id, date, task_description, has_link, deliverable_url, created_at))
 
         conn.commit()
         conn.close()
+        self._invalidate('tasks')
+
+    # ─── Search tasks ──────────────────────────────────────────────────────────
+
+    def search_tasks(self, text, date_from=None, date_to=None, user_id=None, order='rank', limit=10):
+        """Best-matching tasks as SEARCH_COLUMNS rows; raises ValueError if text has no words."""
+        sql, params = search_query(text, USE_POSTGRES, date_from and str(date_from), date_to and str(date_to),
+                                   user_id, order, limit=limit)
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        cursor.execute(self._fix_sql(sql), params)
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
+    # ─── Get timesheet ─────────────────────────────────────────────────────────
+
+    def get_timesheet(self, user_id, date_from, date_to):
+        """One person's rows + weekly/monthly subtotals (see src/timesheet.py)."""
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        cursor.execute(self._fix_sql(TIMESHEET_SQL), (user_id, str(date_from), str(date_to)))
+        rows = cursor.fetchall()
+        cursor.execute(self._fix_sql('SELECT name, role FROM staff WHERE user_id = ?'), (user_id,))
+        staff = cursor.fetchone()
+        conn.close()
+
+        timesheet = build_timesheet(rows, date_from, date_to)
+        timesheet["user_id"] = user_id
+        timesheet["name"], timesheet["role"] = staff if staff else (None, None)
+        return timesheet
 
     # ─── Get today attendance ──────────────────────────────────────────────────
 
@@ -236,10 +768,11 @@ class AttendanceDB:
         today = pst_now.strftime('%Y-%m-%d')
 
         cursor.execute(self._fix_sql('''
-            SELECT name, time_in, time_out, hours_worked, status
-            FROM attendance
-            WHERE date = ?
-            ORDER BY time_in
+            SELECT s.name, a.time_in, a.time_out, a.hours_worked, a.status
+            FROM attendance a
+            JOIN staff s ON s.user_id = a.user_id
+            WHERE a.date = ?
+            ORDER BY a.time_in
         '''), (today,))
 
         results = cursor.fetchall()
@@ -248,68 +781,60 @@ class AttendanceDB:
 
     # ─── Save break start ──────────────────────────────────────────────────────
 
-    def save_break_start(self, user_id, name, date, break_start):
+    def save_break_start(self, user_id, name, date, break_start, at=None):
         conn = self._get_conn()
         cursor = conn.cursor()
 
         pst_now = self.get_current_pst_time()
         created_at = pst_now.strftime('%Y-%m-%d %I:%M:%S %p')
+        event = self._event_instant(at)
 
-        cursor.execute(self._fix_sql('''
-            SELECT id FROM attendance
-            WHERE user_id = ? AND date = ? AND status = 'clocked_in'
-        '''), (user_id, date))
-
-        record = cursor.fetchone()
+        # The open shift, whatever its date (night shifts break after midnight)
+        session = self._open_session(cursor, user_id)
+        if session and self._session_expired(session, event):
+            session = None
 
-        if not record:
-            print(f"❌ No clocked_in record found for {name} today")
+        if not session or session[2] != 'clocked_in':
+            print(f"❌ No clocked_in record found for {name}")
             conn.close()
             return False
+        record_id, date = session[0], session[1]
 
         cursor.execute(self._fix_sql('''
             UPDATE attendance
             SET break_start = ?, status = 'on_break', created_at = ?
             WHERE id = ?
-        '''), (break_start, created_at, record[0]))
+        '''), (break_start, created_at, record_id))
 
         conn.commit()
         conn.close()
+        self._invalidate('attendance')
         print(f'🍽️  {name} started break at {break_start}')
         return True
 
     # ─── Save break end ────────────────────────────────────────────────────────
 
-    def save_break_end(self, user_id, name, date, break_end):
+    def save_break_end(self, user_id, name, date, break_end, at=None):
         conn = self._get_conn()
         cursor = conn.cursor()
 
         pst_now = self.get_current_pst_time()
         created_at = pst_now.strftime('%Y-%m-%d %I:%M:%S %p')
+        event = self._event_instant(at)
 
-        cursor.execute(self._fix_sql('''
-            SELECT id, break_start FROM attendance
-            WHERE user_id = ? AND date = ? AND status = 'on_break'
-        '''), (user_id, date))
-
-        record = cursor.fetchone()
+        session = self._open_session(cursor, user_id)
+        if session and self._session_expired(session, event):
+            session = None
 
-        if not record:
-            print(f"❌ No on_break record found for {name} today")
+        if not session or session[2] != 'on_break':
+            print(f"❌ No on_break record found for {name}")
             conn.close()
             return False
 
-        record_id, break_start = record
+        record_id, date, break_start = session[0], session[1], session[4]
 
-        try:
-            start = datetime.strptime(break_start, '%I:%M %p')
-            end = datetime.strptime(break_end, '%I:%M %p')
-            if end < start:
-                from datetime import timedelta
-                end = end + timedelta(hours=24)
-            break_duration = (end - start).total_seconds() / 3600
-        except:
-            break_duration = 0
+        start, end = parse_clock(break_start), parse_clock(break_end)
+        break_duration = clock_span(start, end) / 60 if start is not None and end is not None else 0
 
         cursor.execute(self._fix_sql('''
             UPDATE attendance
@@ -319,6 +844,7 @@ class AttendanceDB:
 
         conn.commit()
         conn.close()
+        self._invalidate('attendance')
         print(f'✅ {name} ended break at {break_end} (duration: {break_duration:.2f} hrs)')
         return True
 
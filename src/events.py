@@ -0,0 +1,178 @@
+"""
+Live change feed for the API.
+
+The capture triggers append a record to change_outbox for every attendance
+and task write, in the same transaction (see src/outbox.py). The bot and the
+API are separate processes, so each API process runs ONE background poller.
+It reads new records, joined to the rows they name, and fans them out to
+every connected SSE/WebSocket client. N open dashboards cost one query per
+poll interval instead of N.
+
+An event is the record (id, table, op, pk, version, user_id, date,
+created_at) plus the row's current fields and the person's name. Deleted
+rows carry only the record. The fields are read when the feed sees the
+record, so they can be newer than `op`; `version` tells them apart.
+
+Clients resume with the last event id they saw: recent events are replayed
+from an in-memory ring buffer, older ones from the outbox. A client whose
+position was pruned (`scripts/outbox.py prune`) is sent `resync`. Each
+client has a bounded queue; a client that falls behind is sent a `resync`
+event and disconnected so it can reconnect and replay instead of growing
+memory.
+
+Postgres hands out ids before commit, so the poller stops at a hole in the
+id sequence until it has waited SETTLE_SECONDS (as OutboxConsumer does):
+an event that commits late under a lower id is still delivered.
+"""
+import asyncio
+import json
+from collections import deque
+
+from src.outbox import HEAD_SQL, HoleWatch
+
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+BUFFER_SIZE = 1000
+QUEUE_SIZE = 200
+REPLAY_LIMIT = 5000
+
+FEED_SQL = '''
+    SELECT o.id, o.table_name, o.op, o.pk, o.version, o.user_id, o.date, o.created_at, s.name,
+           a.status, a.time_in, a.time_out, a.break_start, a.break_end, a.break_duration, a.hours_worked,
+           t.task_description, t.deliverable_url
+    FROM change_outbox o
+    LEFT JOIN attendance a ON o.table_name = 'attendance' AND a.id = o.pk
+    LEFT JOIN tasks t ON o.table_name = 'tasks' AND t.id = o.pk
+    LEFT JOIN staff s ON s.user_id = o.user_id
+    WHERE o.id > ?
+'''
+ROW_FIELDS = {
+    'attendance': ('status', 'time_in', 'time_out', 'break_start', 'break_end', 'break_duration',
+                   'hours_worked'),
+    'tasks': ('task', 'url'),
+}
+
+RESYNC = object()
+
+
+class Subscriber:
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.backlog = []
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop what's queued and ask it to replay
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def events(self, heartbeat=HEARTBEAT_INTERVAL):
+        """Yield backlog then live events; None means 'send a heartbeat'."""
+        for event in self.backlog:
+            yield event
+        self.backlog = []
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event is RESYNC:
+                return
+
+
+class ChangeFeed:
+    def __init__(self, adb, poll_interval=POLL_INTERVAL, buffer_size=BUFFER_SIZE,
+                 queue_size=QUEUE_SIZE):
+        self.adb = adb
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.recent = deque(maxlen=buffer_size)
+        self.subscribers = set()
+        self.last_id = 0
+        self._holes = HoleWatch()
+        self._task = None
+
+    @staticmethod
+    def _to_event(row):
+        event_id, table_name, op, pk, version, user_id, day, created_at, name = row[:9]
+        event = {"id": event_id, "table": table_name, "op": op, "pk": pk, "version": version,
+                 "user_id": user_id, "date": day and str(day)[:10], "created_at": created_at, "name": name}
+        if op != 'delete' and table_name in ROW_FIELDS:
+            values = row[9:16] if table_name == 'attendance' else row[16:18]
+            # Postgres TIME values aren't JSON; the bot's clock strings are
+            event.update((field, value if value is None or isinstance(value, (str, int, float)) else str(value))
+                         for field, value in zip(ROW_FIELDS[table_name], values))
+        return event
+
+    async def _fetch_after(self, after_id, upto=None, limit=REPLAY_LIMIT):
+        sql, params = FEED_SQL, [after_id]
+        if upto is not None:
+            sql += ' AND o.id <= ?'
+            params.append(upto)
+        rows = await self.adb.fetchall(sql + f' ORDER BY o.id LIMIT {int(limit)}', tuple(params))
+        return [self._to_event(row) for row in rows]
+
+    async def _start(self):
+        if self._task is not None and not self._task.done():
+            return
+        # Fresh start (first client, or after idling): begin at the current tail
+        self.last_id = await self.adb.fetchval(HEAD_SQL) or 0
+        self.recent.clear()
+        self._task = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        while self.subscribers:
+            try:
+                events = await self._fetch_after(self.last_id, limit=500)
+            except Exception as e:
+                print(f"⚠️  Change feed poll failed: {e}")
+                events = []
+            events = events[:self._holes.readable(self.last_id, [event["id"] for event in events])]
+            for event in events:
+                self.recent.append(event)
+                self.last_id = event["id"]
+                for subscriber in list(self.subscribers):
+                    subscriber.push(event)
+            if len(events) < 500:
+                await asyncio.sleep(self.poll_interval)
+
+    async def subscribe(self, last_event_id=None):
+        await self._start()
+        subscriber = Subscriber(self.queue_size)
+        upto = self.last_id
+        # Register before replaying so nothing published meanwhile is missed
+        self.subscribers.add(subscriber)
+        if last_event_id is not None and last_event_id < upto:
+            if self.recent and self.recent[0]["id"] <= last_event_id + 1:
+                subscriber.backlog = [e for e in self.recent if last_event_id < e["id"] <= upto]
+            elif await self.adb.fetchval('SELECT pruned_through FROM outbox_state WHERE id = 1') > last_event_id:
+                subscriber.backlog = [RESYNC]
+            else:
+                backlog = await self._fetch_after(last_event_id, upto)
+                if len(backlog) >= REPLAY_LIMIT:
+                    backlog.append(RESYNC)
+                subscriber.backlog = backlog
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def close(self):
+        self.subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def format_sse(event):
+    if event is None:
+        return ": heartbeat\n\n"
+    if event is RESYNC:
+        return "event: resync\ndata: {}\n\n"
+    return f"id: {event['id']}\nevent: {event['table']}\ndata: {json.dumps(event)}\n\n"
+
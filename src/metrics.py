@@ -0,0 +1,357 @@
+"""
+Request and query metrics for the API, in Prometheus text format.
+
+MetricsMiddleware wraps the whole ASGI app. Per request it records latency,
+status and in-flight count under the route template ('/api/staff/{user_id}/
+timesheet', not the raw path), and adds a Server-Timing header that browser
+devtools show next to the request:
+
+    Server-Timing: db;dur=41.2;desc="6 statements, 1830 rows", db-pool;dur=0.3, db-conn;desc="2", total;dur=47.9
+
+The database layers report into the same request: AsyncConnection fetches
+(the API's queries) and cursors of AttendanceDB._get_conn connections (the
+bot, scripts and AttendanceDB calls) are timed per statement. A statement is
+labelled by verb, first table and a short hash of its text with numbers and
+placeholder lists folded, e.g. 'SELECT attendance 3fa2c1', so an IN list of
+any length is one label and two SELECTs on the same table stay apart. Schema
+setup (CREATE, ALTER, DROP, PRAGMA) all goes under the one label 'schema'.
+
+GET /metrics renders everything. Counters live in this process. Scrape
+each worker separately, or run a single worker.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+VERB_RE = re.compile(r'\s*(\w+)')
+TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([A-Za-z_]\w*)',
+                      re.IGNORECASE)
+NUMBER_RE = re.compile(r'\b\d+\b')
+# ?, ?, ? / %s, %s / $?, $? (numbered placeholders after NUMBER_RE), then repeated (...) rows
+PLACEHOLDERS_RE = re.compile(r'(\$?\?|%s)(?:\s*,\s*(?:\$?\?|%s))+')
+ROWS_RE = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+SCHEMA_VERBS = {'CREATE', 'ALTER', 'DROP', 'PRAGMA'}
+
+
+# ─── Registry ────────────────────────────────────────────────────────────────
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+def number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def lines(self):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{label_text(self.labels, labels)} {number(value)}"
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def lines(self):
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else number(bound)
+                yield f"{self.name}_bucket{label_text(self.labels, labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{label_text(self.labels, labels)} {number(total)}"
+            yield f"{self.name}_count{label_text(self.labels, labels)} {cumulative}"
+
+
+REGISTRY = []
+
+
+def render():
+    """Every metric in Prometheus text exposition format."""
+    out = []
+    for metric in REGISTRY:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    return '\n'.join(out) + '\n'
+
+
+HTTP_REQUESTS = Counter('http_requests_total', 'Requests by route, method and status.',
+                        ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'Request latency until the last body chunk.',
+                         ('method', 'route'))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being served (open streams included).')
+REQUEST_DB_TIME = Histogram('http_request_db_seconds', 'Database time spent per request.', ('route',))
+REQUEST_STATEMENTS = Histogram('http_request_db_statements', 'Statements run per request.', ('route',),
+                               COUNT_BUCKETS)
+REQUEST_CONNECTIONS = Histogram('http_request_db_connections', 'Connections opened or borrowed per request.',
+                                ('route',), COUNT_BUCKETS)
+DB_LATENCY = Histogram('db_statement_duration_seconds', 'Statement execution time.', ('statement',))
+DB_ROWS = Counter('db_statement_rows_total', 'Rows returned or changed per statement.', ('statement',))
+DB_CONNECTIONS = Counter('db_connections_total', 'Connections opened (open) or taken from the pool (borrow).',
+                         ('driver', 'kind'))
+DB_POOL_WAIT = Histogram('db_pool_wait_seconds', 'Time waiting for a pooled connection.')
+
+
+# ─── Request context ─────────────────────────────────────────────────────────
+
+class RequestTiming:
+    """Database work done on behalf of one request."""
+
+    __slots__ = ('db_seconds', 'statements', 'rows', 'connections', 'pool_seconds')
+
+    def __init__(self):
+        self.db_seconds = self.pool_seconds = 0.0
+        self.statements = self.rows = self.connections = 0
+
+    def server_timing(self, total_seconds):
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} statements, {self.rows} rows", '
+                f'db-pool;dur={self.pool_seconds * 1000:.1f}, db-conn;desc="{self.connections}", '
+                f'total;dur={total_seconds * 1000:.1f}')
+
+
+CURRENT = ContextVar('request_timing', default=None)
+
+
+@lru_cache(maxsize=2048)
+def statement_name(sql):
+    """'SELECT attendance 3fa2c1': verb, first table, hash of the text with numbers and lists folded."""
+    verb = VERB_RE.match(sql)
+    verb = verb.group(1).upper() if verb else '?'
+    if verb in SCHEMA_VERBS:
+        return 'schema'
+    table = TABLE_RE.search(sql)
+    normalized = NUMBER_RE.sub('?', ' '.join(sql.split()))
+    normalized = ROWS_RE.sub(r'\1', PLACEHOLDERS_RE.sub(r'\1, ...', normalized))
+    digest = hashlib.blake2b(normalized.encode(), digest_size=3).hexdigest()
+    return f"{verb} {table.group(1).lower() if table else '-'} {digest}"
+
+
+def record_statement(sql, seconds, rows):
+    name = statement_name(sql)
+    DB_LATENCY.observe(seconds, name)
+    if rows:
+        DB_ROWS.inc(name, amount=rows)
+    timing = CURRENT.get()
+    if timing is not None:
+        timing.db_seconds += seconds
+        timing.statements += 1
+        timing.rows += rows
+
+
+def record_rows(sql, rows):
+    """Rows fetched after the statement was recorded (SQLite reports no rowcount for SELECTs)."""
+    if rows:
+        DB_ROWS.inc(statement_name(sql), amount=rows)
+        timing = CURRENT.get()
+        if timing is not None:
+            timing.rows += rows
+
+
+def record_connection(driver, kind, wait_seconds=None):
+    DB_CONNECTIONS.inc(driver, kind)
+    if wait_seconds is not None:
+        DB_POOL_WAIT.observe(wait_seconds)
+    timing = CURRENT.get()
+    if timing is not None:
+        timing.connections += 1
+        timing.pool_seconds += wait_seconds or 0.0
+
+
+# ─── Synchronous drivers ─────────────────────────────────────────────────────
+
+class TimedSQLiteCursor(sqlite3.Cursor):
+    _sql = ''
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql = sql
+            record_statement(sql, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._sql = sql
+            record_statement(sql, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_statement(sql_script, time.perf_counter() - started, 0)
+
+    def fetchone(self):
+        row = super().fetchone()
+        record_rows(self._sql, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        record_rows(self._sql, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        record_rows(self._sql, len(rows))
+        return rows
+
+
+class TimedSQLiteConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=TimedSQLiteConnection)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        record_connection('sqlite', 'open')
+
+    def cursor(self, factory=TimedSQLiteCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts build a plain cursor without calling cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+@lru_cache(maxsize=1)
+def timed_postgres_cursor():
+    """psycopg2 cursor class for psycopg2.connect(..., cursor_factory=...); psycopg2 is imported only here."""
+    import psycopg2.extensions
+
+    class TimedPostgresCursor(psycopg2.extensions.cursor):
+        def execute(self, sql, params=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(sql, params)
+            finally:
+                record_statement(sql, time.perf_counter() - started, max(self.rowcount, 0))
+
+        def executemany(self, sql, params_seq):
+            started = time.perf_counter()
+            try:
+                return super().executemany(sql, params_seq)
+            finally:
+                record_statement(sql, time.perf_counter() - started, max(self.rowcount, 0))
+
+    return TimedPostgresCursor
+
+
+# ─── ASGI middleware ─────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=4096)
+def _match_route(app, method, path):
+    from starlette.routing import Match
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'root_path': ''}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return 'unmatched'
+
+
+def route_template(scope):
+    """Route path template for the request.
+
+    Routing fills scope['route']; requests answered by middleware before
+    routing (cache hits, 304s) are matched against the app's routes here.
+    """
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    app = scope.get('app')
+    if app is None:
+        return scope['path']
+    return _match_route(app, scope['method'], scope['path'])
+
+
+class MetricsMiddleware:
+    """Records request metrics and adds Server-Timing; add it last so it wraps everything."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        timing = RequestTiming()
+        token = CURRENT.set(timing)
+        started = time.perf_counter()
+        status = 500
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                header = timing.server_timing(time.perf_counter() - started)
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = route_template(scope)
+            HTTP_REQUESTS.inc(scope['method'], route, str(status))
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope['method'], route)
+            REQUEST_DB_TIME.observe(timing.db_seconds, route)
+            REQUEST_STATEMENTS.observe(timing.statements, route)
+            REQUEST_CONNECTIONS.observe(timing.connections, route)
+            CURRENT.reset(token)
@@ -0,0 +1,611 @@
+"""
+Streaming copy of the SQLite database into Postgres, or into another SQLite file for rehearsals.
+
+AttendanceDB picks its backend from DATABASE_URL at import, so both schemas
+are created by AttendanceDB itself in a child process (init_schema): the
+target gets the same tables, indexes and triggers the bot would create. The
+source is upgraded the same way and then read through a read-only
+connection, so the bot can keep running during the copy.
+
+Tables are copied parents first and in key order, in chunks. Each chunk is
+one transaction on the target, and it also saves the table's position in
+migration_progress, so an interrupted run resumes at the last committed
+chunk. How a table is kept in sync depends on its kind:
+
+    captured   attendance, tasks: rows past the saved id are appended; rows
+               the source outbox (src/outbox.py) records as changed since the
+               last pass are re-copied, or deleted if they are gone. If the
+               outbox was pruned past that point, the table is reconciled
+               in full instead.
+    log        change_outbox: append past the saved id; rows pruned at the
+               source are pruned on the target.
+    full       staff, presence_days and the single-row state tables: small,
+               so they are upserted whole every pass.
+
+A second run is therefore an incremental catch-up whose cost is the number
+of changes since the previous pass. Cutover is: copy while the bot runs,
+catch up until the lag is small, stop the bot, run one final catch-up (a few
+seconds), verify, then point DATABASE_URL at the target.
+
+Postgres loads go through COPY FROM STDIN: directly into the table when
+appending, and through a temp staging table plus INSERT ... ON CONFLICT for
+re-copied rows. The session runs with session_replication_role = replica, so
+capture triggers and FK checks stay off while loading. The SQLite sink drops
+the capture and full-text triggers instead, and init_schema puts them back
+(and rebuilds tasks_fts) at the end. Sequences are set to the source's
+sqlite_sequence high-water mark, not to MAX(id): outbox consumers rely on
+ids never being reused.
+
+verify() compares row counts and an order-independent checksum per table.
+Values are normalized by the target column's type, so '3:16 PM' in SQLite
+equals TIME '15:16' in Postgres and a REAL compares at float4 precision.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import pytz
+
+from src.clock import parse_clock
+from src.outbox import CAPTURED_TABLES, HEAD_SQL
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CHUNK = 5000
+KEY_BATCH = 900  # keys per IN (...) list, under SQLite's bound-parameter limit
+
+TableSpec = namedtuple('TableSpec', 'name key kind')
+Progress = namedtuple('Progress', 'last_id copied synced_through updated_at')
+
+# Parents before children
+TABLES = [
+    TableSpec('staff', 'user_id', 'full'),
+    TableSpec('attendance', 'id', 'captured'),
+    TableSpec('tasks', 'id', 'captured'),
+    TableSpec('presence_days', 'date', 'full'),
+    TableSpec('change_outbox', 'id', 'log'),
+    TableSpec('outbox_consumers', 'name', 'full'),
+    TableSpec('outbox_state', 'id', 'full'),
+    TableSpec('data_version', 'id', 'full'),
+]
+
+PROGRESS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS migration_progress (
+        table_name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        copied INTEGER NOT NULL DEFAULT 0,
+        synced_through INTEGER,
+        updated_at TEXT
+    )
+'''
+
+INIT_SCRIPT = 'import sys; from src.database import AttendanceDB; AttendanceDB(db_file=sys.argv[1])'
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def is_postgres(target):
+    return target.startswith(('postgres://', 'postgresql://'))
+
+
+def describe(target):
+    """Target for display, without the password."""
+    if not is_postgres(target):
+        return os.path.abspath(target)
+    parts = urlsplit(target)
+    return f"{parts.scheme}://{parts.username or ''}@{parts.hostname}{parts.path}"
+
+
+def init_schema(target):
+    """Create or upgrade target's schema with AttendanceDB, in a child process pinned to that backend."""
+    env = {name: value for name, value in os.environ.items() if name != 'DATABASE_URL'}
+    db_file = 'attendance.db'
+    if is_postgres(target):
+        env['DATABASE_URL'] = target
+    else:
+        db_file = os.path.abspath(target)
+    subprocess.run([sys.executable, '-c', INIT_SCRIPT, db_file], cwd=PROJECT_ROOT, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+# ─── Value encoding ──────────────────────────────────────────────────────────
+
+def copy_field(value):
+    """One value in COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (bytes, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_buffer(rows):
+    return io.StringIO(''.join('\t'.join(map(copy_field, row)) + '\n' for row in rows))
+
+
+def family(declared):
+    """SQLite declared type or Postgres data_type -> the comparison family verify() normalizes to."""
+    declared = (declared or '').lower()
+    if declared.startswith('bool'):
+        return 'bool'
+    if declared in ('integer', 'int', 'bigint', 'smallint'):
+        return 'int'
+    if declared in ('real', 'double precision', 'float', 'numeric'):
+        return 'float'
+    if declared in ('timestamptz', 'timestamp with time zone'):
+        return 'timestamptz'
+    if declared.startswith('timestamp'):
+        return 'timestamp'
+    if declared.startswith('time'):
+        return 'time'
+    if declared == 'date':
+        return 'date'
+    if declared in ('bytea', 'blob'):
+        return 'bytes'
+    return 'text'
+
+
+def parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    text = str(value)
+    try:
+        return datetime.strptime(text, '%Y-%m-%d %I:%M:%S %p')  # created_at as AttendanceDB writes it
+    except ValueError:
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+
+
+def canonical(value, kind):
+    """Backend-independent text for one value; falls back to str() for anything that doesn't parse."""
+    if value is None:
+        return '\0'
+    try:
+        if kind == 'bool':
+            return '1' if value and str(value).lower() not in ('0', 'f', 'false') else '0'
+        if kind == 'int':
+            return str(int(value))
+        if kind == 'float':
+            return f"{float(value):.6g}"  # Postgres REAL is float4
+        if kind == 'date':
+            return str(value)[:10]
+        if kind == 'time':
+            minutes = parse_clock(value)
+            return str(value) if minutes is None else f"{minutes // 60:02d}:{minutes % 60:02d}"
+        if kind == 'timestamp':
+            return parse_timestamp(value).replace(tzinfo=None).isoformat(sep=' ')
+        if kind == 'timestamptz':
+            moment = parse_timestamp(value)
+            moment = moment if moment.tzinfo else pytz.utc.localize(moment)
+            return moment.astimezone(pytz.utc).isoformat()
+        if kind == 'bytes':
+            return bytes(value).hex()
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def checksum(rows, kinds):
+    """(row count, sum of per-row 64-bit hashes mod 2^64): independent of row order."""
+    count = total = 0
+    for row in rows:
+        text = '\x1f'.join(canonical(value, kind) for value, kind in zip(row, kinds))
+        total += int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+        count += 1
+    return count, total % 2 ** 64
+
+
+# ─── Source ──────────────────────────────────────────────────────────────────
+
+class SQLiteSource:
+    """Read-only connection to the live SQLite database."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True, timeout=30)
+
+    def columns(self, table):
+        return [row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')]
+
+    def rows_after(self, table, columns, key, after, limit):
+        where, params = (f' WHERE {key} > ?', [after]) if after is not None else ('', [])
+        return self.conn.execute(f'SELECT {", ".join(columns)} FROM {table}{where} ORDER BY {key} LIMIT ?',
+                                 params + [limit]).fetchall()
+
+    def rows_with_keys(self, table, columns, key, keys):
+        rows = []
+        for start in range(0, len(keys), KEY_BATCH):
+            batch = keys[start:start + KEY_BATCH]
+            rows += self.conn.execute(f'SELECT {", ".join(columns)} FROM {table} '
+                                      f'WHERE {key} IN ({",".join("?" * len(batch))})', batch).fetchall()
+        return rows
+
+    def scan(self, table, columns):
+        return self.conn.execute(f'SELECT {", ".join(columns)} FROM {table}')
+
+    def min_key(self, table, key):
+        return self.conn.execute(f'SELECT MIN({key}) FROM {table}').fetchone()[0]
+
+    def sequence(self, table):
+        row = self.conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+        return row[0] if row else None
+
+    def outbox_head(self):
+        return self.conn.execute(HEAD_SQL).fetchone()[0] or 0
+
+    def pruned_through(self):
+        return self.conn.execute('SELECT pruned_through FROM outbox_state WHERE id = 1').fetchone()[0]
+
+    def changed_keys(self, table, after, through, up_to_id):
+        """Ids of `table` rows with outbox records in (after, through], among those already copied."""
+        return [row[0] for row in self.conn.execute('''
+            SELECT DISTINCT pk FROM change_outbox
+            WHERE table_name = ? AND id > ? AND id <= ? AND pk <= ?
+            ORDER BY pk
+        ''', (table, after, through, up_to_id))]
+
+    def close(self):
+        self.conn.close()
+
+
+# ─── Sinks ───────────────────────────────────────────────────────────────────
+
+class Sink:
+    """Shared target operations; statements use ? placeholders and go through self.fix."""
+
+    postgres = False
+
+    def fix(self, sql):
+        return sql
+
+    def execute(self, sql, params=()):
+        cursor = self.conn.cursor()
+        cursor.execute(self.fix(sql), params)
+        return cursor
+
+    def prepare(self):
+        self.execute(PROGRESS_TABLE_SQL)
+        self.commit()
+
+    def progress(self):
+        rows = self.execute('SELECT table_name, last_id, copied, synced_through, updated_at FROM migration_progress')
+        return {row[0]: Progress(*row[1:]) for row in rows.fetchall()}
+
+    def save_progress(self, table, state):
+        self.execute('''
+            INSERT INTO migration_progress (table_name, last_id, copied, synced_through, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (table_name) DO UPDATE SET
+                last_id = excluded.last_id, copied = excluded.copied,
+                synced_through = excluded.synced_through, updated_at = excluded.updated_at
+        ''', (table, state.last_id, state.copied, state.synced_through, datetime.now(pytz.utc).isoformat()))
+
+    def row_count(self, table):
+        return self.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def keys_between(self, table, key, after, through):
+        """Keys in (after, through]; either bound may be None for open-ended."""
+        conditions, params = [], []
+        if after is not None:
+            conditions.append(f'{key} > ?')
+            params.append(after)
+        if through is not None:
+            conditions.append(f'{key} <= ?')
+            params.append(through)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return {row[0] for row in self.execute(f'SELECT {key} FROM {table}{where}', params).fetchall()}
+
+    def delete_keys(self, table, key, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), KEY_BATCH):
+            batch = keys[start:start + KEY_BATCH]
+            self.execute(f'DELETE FROM {table} WHERE {key} IN ({",".join("?" * len(batch))})', batch)
+        return len(keys)
+
+    def delete_below(self, table, key, value):
+        return self.execute(f'DELETE FROM {table} WHERE {key} < ?', (value,)).rowcount
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class SQLiteSink(Sink):
+    """Another SQLite file: rehearse a migration, or test this module, without a Postgres server."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+
+    def prepare(self):
+        # Loading must not feed the target's own outbox or FTS index; finish() reinstalls both
+        for name, in self.conn.execute(f'''
+            SELECT name FROM sqlite_master
+            WHERE type = 'trigger' AND tbl_name IN ({",".join("?" * len(CAPTURED_TABLES))})
+        ''', CAPTURED_TABLES).fetchall():
+            self.conn.execute(f'DROP TRIGGER {name}')
+        super().prepare()
+
+    def columns(self, table):
+        return {row[1]: family(row[2]) for row in self.conn.execute(f'PRAGMA table_info({table})')}
+
+    def append(self, table, columns, rows):
+        self.conn.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({",".join("?" * len(columns))})',
+                              rows)
+
+    def upsert(self, table, key, columns, rows):
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != key)
+        self.conn.executemany(f'''
+            INSERT INTO {table} ({", ".join(columns)}) VALUES ({",".join("?" * len(columns))})
+            ON CONFLICT ({key}) DO UPDATE SET {updates}
+        ''', rows)
+
+    def clear(self, tables):
+        for table in reversed(tables):
+            self.conn.execute(f'DELETE FROM {table}')
+        self.conn.execute('DELETE FROM migration_progress')
+
+    def set_sequence(self, table, value):
+        cursor = self.conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (value, table))
+        if not cursor.rowcount:
+            self.conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, value))
+
+    def scan(self, table, columns):
+        return self.conn.execute(f'SELECT {", ".join(columns)} FROM {table}')
+
+    def finish(self):
+        self.conn.close()
+        init_schema(self.path)
+
+
+class PostgresSink(Sink):
+    """Postgres / Supabase, loaded with COPY FROM STDIN."""
+
+    postgres = True
+
+    def __init__(self, url):
+        import psycopg2
+        self.conn = psycopg2.connect(url)
+
+    def fix(self, sql):
+        return sql.replace('?', '%s')
+
+    def prepare(self):
+        # Session-wide: capture triggers and FK checks off for everything this connection loads
+        self.conn.autocommit = True
+        self.conn.cursor().execute('SET session_replication_role = replica')
+        self.conn.autocommit = False
+        super().prepare()
+
+    def columns(self, table):
+        # Generated columns (tasks.search_vector) are computed by Postgres, never copied
+        return {name: family(data_type) for name, data_type in self.execute('''
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ? AND is_generated = 'NEVER'
+            ORDER BY ordinal_position
+        ''', (table,)).fetchall()}
+
+    def append(self, table, columns, rows):
+        self.conn.cursor().copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN', copy_buffer(rows))
+
+    def upsert(self, table, key, columns, rows):
+        if not rows:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS stage_{table} (LIKE {table})')
+        cursor.execute(f'TRUNCATE stage_{table}')
+        cursor.copy_expert(f'COPY stage_{table} ({", ".join(columns)}) FROM STDIN', copy_buffer(rows))
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != key)
+        cursor.execute(f'''
+            INSERT INTO {table} ({", ".join(columns)})
+            SELECT {", ".join(columns)} FROM stage_{table}
+            ON CONFLICT ({key}) DO UPDATE SET {updates}
+        ''')
+
+    def clear(self, tables):
+        self.execute(f'TRUNCATE {", ".join(tables)}, migration_progress')
+
+    def set_sequence(self, table, value):
+        sequence = self.execute("SELECT pg_get_serial_sequence(?, 'id')", (table,)).fetchone()[0]
+        if sequence:
+            self.execute('SELECT setval(?, GREATEST(?, 1), ? > 0)', (sequence, value, value))
+
+    def scan(self, table, columns):
+        cursor = self.conn.cursor(name=f'verify_{table}')  # server-side: streams in itersize batches
+        cursor.itersize = DEFAULT_CHUNK
+        cursor.execute(f'SELECT {", ".join(columns)} FROM {table}')
+        return cursor
+
+    def finish(self):
+        self.conn.rollback()
+        self.conn.autocommit = True
+        self.conn.cursor().execute('ANALYZE')
+        self.conn.close()
+
+
+def open_sink(target):
+    return PostgresSink(target) if is_postgres(target) else SQLiteSink(target)
+
+
+def shared_columns(source, sink, table):
+    """Source columns the target also has (in source order), with the target's type families."""
+    target = sink.columns(table)
+    columns = [column for column in source.columns(table) if column in target]
+    return columns, [target[column] for column in columns]
+
+
+# ─── Copy passes ─────────────────────────────────────────────────────────────
+
+def append_new(source, sink, spec, columns, state, chunk, on_chunk=None):
+    """Copy rows past the saved id, one committed chunk at a time. Returns (state, rows appended)."""
+    key_index = columns.index(spec.key)
+    appended = 0
+    while True:
+        rows = source.rows_after(spec.name, columns, spec.key, state.last_id, chunk)
+        if not rows:
+            return state, appended
+        sink.append(spec.name, columns, rows)
+        appended += len(rows)
+        state = state._replace(last_id=rows[-1][key_index], copied=state.copied + len(rows))
+        sink.save_progress(spec.name, state)
+        sink.commit()
+        if on_chunk:
+            on_chunk(spec.name, state.copied)
+
+
+def apply_changes(source, sink, spec, columns, state, through, chunk):
+    """Re-copy already-copied rows the outbox records as changed up to `through`. Returns (upserted, deleted)."""
+    key_index = columns.index(spec.key)
+    keys = source.changed_keys(spec.name, state.synced_through, through, state.last_id)
+    upserted = deleted = 0
+    for start in range(0, len(keys), chunk):
+        batch = keys[start:start + chunk]
+        rows = source.rows_with_keys(spec.name, columns, spec.key, batch)
+        sink.upsert(spec.name, spec.key, columns, rows)
+        deleted += sink.delete_keys(spec.name, spec.key, set(batch) - {row[key_index] for row in rows})
+        upserted += len(rows)
+        sink.commit()
+    return upserted, deleted
+
+
+def reconcile(source, sink, spec, columns, chunk, on_chunk=None):
+    """Upsert every source row and delete target rows the source no longer has. Returns (last key, upserted, deleted)."""
+    key_index = columns.index(spec.key)
+    after, upserted, deleted = None, 0, 0
+    while True:
+        rows = source.rows_after(spec.name, columns, spec.key, after, chunk)
+        through = rows[-1][key_index] if rows else None
+        existing = sink.keys_between(spec.name, spec.key, after, through)
+        sink.upsert(spec.name, spec.key, columns, rows)
+        # Compared as text: a Postgres DATE key comes back as a date, SQLite's as a string
+        kept = {str(row[key_index]) for row in rows}
+        deleted += sink.delete_keys(spec.name, spec.key, [key for key in existing if str(key) not in kept])
+        upserted += len(rows)
+        sink.commit()
+        if not rows:
+            return after, upserted, deleted
+        if on_chunk:
+            on_chunk(spec.name, upserted)
+        after = through
+
+
+def sync_table(source, sink, spec, state, chunk, on_chunk=None):
+    """Bring one table up to date; returns its stats dict and saves its progress."""
+    started = time.perf_counter()
+    columns, _ = shared_columns(source, sink, spec.name)
+    stats = {'table': spec.name, 'appended': 0, 'upserted': 0, 'deleted': 0, 'reconciled': False}
+
+    if spec.kind == 'full':
+        _, stats['upserted'], stats['deleted'] = reconcile(source, sink, spec, columns, chunk)
+        state = state._replace(copied=sink.row_count(spec.name))
+
+    elif spec.kind == 'log':
+        floor = source.min_key(spec.name, spec.key)
+        stats['deleted'] = sink.delete_below(spec.name, spec.key, state.last_id + 1 if floor is None else floor)
+        state = state._replace(copied=state.copied - stats['deleted'])
+        state, stats['appended'] = append_new(source, sink, spec, columns, state, chunk, on_chunk)
+
+    else:
+        head = source.outbox_head()
+        if state.synced_through is None:
+            # First pass: every row is read after this point, so the copy already
+            # reflects all outbox records up to head
+            state = state._replace(synced_through=head)
+            sink.save_progress(spec.name, state)
+            sink.commit()
+        if source.pruned_through() > state.synced_through:
+            # Changes we never saw were pruned from the outbox: compare the whole table
+            last_id, stats['upserted'], stats['deleted'] = reconcile(source, sink, spec, columns, chunk, on_chunk)
+            state = state._replace(last_id=last_id or 0, copied=sink.row_count(spec.name))
+            stats['reconciled'] = True
+        else:
+            # Rows appended now are read after head: only the ones copied before need the outbox
+            stats['upserted'], stats['deleted'] = apply_changes(source, sink, spec, columns, state, head, chunk)
+            state = state._replace(copied=state.copied - stats['deleted'])
+            state, stats['appended'] = append_new(source, sink, spec, columns, state, chunk, on_chunk)
+        state = state._replace(synced_through=head)
+
+    sink.save_progress(spec.name, state)
+    sink.commit()
+    stats['rows'] = state.copied
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def migrate(source_path, target, chunk=DEFAULT_CHUNK, restart=False, on_chunk=None):
+    """Copy source_path into target, or catch up with the changes since the last run.
+
+    Returns per-table stats. Raises ValueError when the target already holds
+    attendance data that no earlier run copied (unless restart, which
+    empties the target's copied tables first).
+    """
+    init_schema(source_path)
+    init_schema(target)
+    source, sink = SQLiteSource(source_path), open_sink(target)
+    try:
+        sink.prepare()
+        progress = sink.progress()
+        if restart or not progress:
+            if not restart and sink.row_count('attendance') + sink.row_count('tasks'):
+                raise ValueError(f"{describe(target)} already has attendance/tasks rows that no migration "
+                                 f"copied; pass restart=True to overwrite them")
+            # Only what AttendanceDB seeded (registry staff, state rows) is here: start from empty
+            sink.clear([spec.name for spec in TABLES])
+            sink.commit()
+            progress = {}
+        stats = [sync_table(source, sink, spec, progress.get(spec.name, Progress(0, 0, None, None)),
+                            chunk, on_chunk) for spec in TABLES]
+        for spec in TABLES:
+            sequence = source.sequence(spec.name) if spec.key == 'id' else None
+            if sequence is not None:
+                sink.set_sequence(spec.name, sequence)
+        sink.commit()
+        return stats
+    finally:
+        source.close()
+        sink.finish()
+
+
+def verify(source_path, target):
+    """Row counts and checksums per table on both sides: [{table, source_rows, target_rows, match, ...}]."""
+    source, sink = SQLiteSource(source_path), open_sink(target)
+    try:
+        results = []
+        for spec in TABLES:
+            started = time.perf_counter()
+            columns, kinds = shared_columns(source, sink, spec.name)
+            source_rows, source_sum = checksum(source.scan(spec.name, columns), kinds)
+            target_rows, target_sum = checksum(sink.scan(spec.name, columns), kinds)
+            results.append({'table': spec.name, 'source_rows': source_rows, 'target_rows': target_rows,
+                            'source_checksum': f"{source_sum:016x}", 'target_checksum': f"{target_sum:016x}",
+                            'match': source_rows == target_rows and source_sum == target_sum,
+                            'seconds': round(time.perf_counter() - started, 3)})
+        return results
+    finally:
+        source.close()
+        sink.close()
+
+
+def status(source_path, target):
+    """Saved progress per table plus how far the target's captured tables trail the source outbox."""
+    source, sink = SQLiteSource(source_path), open_sink(target)
+    try:
+        sink.execute(PROGRESS_TABLE_SQL)
+        progress = sink.progress()
+        head = source.outbox_head()
+        return [{'table': spec.name, 'kind': spec.kind, **(progress[spec.name]._asdict() if spec.name in progress else {}),
+                 'lag': head - progress[spec.name].synced_through
+                 if spec.name in progress and progress[spec.name].synced_through is not None else None}
+                for spec in TABLES]
+    finally:
+        source.close()
+        sink.close()
@@ -0,0 +1,431 @@
+"""
+Change data capture for attendance and tasks: trigger-fed outbox + consumers.
+
+Triggers installed by AttendanceDB.init_database (from the SQL below) append one compact record
+per row change to change_outbox, in the same transaction as the change, so
+writes that bypass AttendanceDB (seeders, clear_db.py, manual SQL) are
+captured too:
+
+    id          outbox sequence, the consumers' checkpoint position
+    table_name  'attendance' | 'tasks'
+    op          'insert' | 'update' | 'delete'
+    pk          the row's id
+    version     the row's row_version after the change (deletes: +1)
+    created_at  UTC ISO timestamp
+    user_id     the row's user_id, and
+    date        its date, so readers can place a change (even a delete)
+                without joining back to the row
+
+Every update bumps the row's row_version, so a consumer that sees a record
+twice (delivery is at-least-once) can tell stale from current. On Postgres
+the trigger also sends NOTIFY change_outbox, '<table>:<id>' so consumers
+wake up at commit instead of polling.
+
+This is the only change log. The API's live feed (src/events.py), the
+analytics refresh and the timesheet cache key all read it. data_version
+stays as a single-row counter for the API's ETags. On Postgres, outbox ids
+are handed out before commit, so MAX(id) can stay put while a lower id
+commits late, and an ETag built on it would go stale. A row-locked counter
+only moves forward in commit order. The same triggers bump it, together
+with triggers on staff, whose renames change what the API serves. No
+application code writes either table.
+
+OutboxConsumer reads records past its checkpoint (kept per consumer name in
+outbox_consumers), hands them to a handler and only then acks. prune()
+deletes records every registered consumer has acked, optionally also ones
+older than a retention window; a consumer whose unread records were pruned
+gets OutboxGap and must resync from the tables.
+"""
+import select
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pytz
+
+CAPTURED_TABLES = ('attendance', 'tasks')
+NOTIFY_CHANNEL = 'change_outbox'
+# Postgres hands out ids before commit, so a lower id can become visible after
+# a higher one. A hole in the sequence is waited on this long before it is
+# taken to be a rolled-back transaction.
+SETTLE_SECONDS = 5.0
+
+# Newest id ever written: ids are never reused, but pruning can empty the table
+HEAD_SQL = '''
+    SELECT MAX(head) FROM (
+        SELECT COALESCE(MAX(id), 0) AS head FROM change_outbox
+        UNION ALL SELECT pruned_through FROM outbox_state WHERE id = 1
+    ) heads
+'''
+
+# Newest change to one person's rows; counts the pruned range too, so it never goes back
+USER_HEAD_SQL = '''
+    SELECT MAX(head) FROM (
+        SELECT COALESCE(MAX(id), 0) AS head FROM change_outbox WHERE user_id = ?
+        UNION ALL SELECT pruned_through FROM outbox_state WHERE id = 1
+    ) heads
+'''
+
+ChangeRecord = namedtuple('ChangeRecord', 'id table_name op pk version created_at user_id date')
+
+OUTBOX_TABLES_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS change_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        op TEXT NOT NULL,
+        pk INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        user_id TEXT,
+        date DATE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS outbox_consumers (
+        name TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''',
+    # Single row: highest outbox id ever pruned, for gap detection
+    '''
+    CREATE TABLE IF NOT EXISTS outbox_state (
+        id INTEGER PRIMARY KEY,
+        pruned_through INTEGER NOT NULL
+    )
+    ''',
+    'INSERT INTO outbox_state (id, pruned_through) SELECT 1, 0 WHERE NOT EXISTS (SELECT 1 FROM outbox_state WHERE id = 1)',
+]
+
+# Created after the columns exist: databases from before them get user_id/date added first
+OUTBOX_USER_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS idx_change_outbox_user ON change_outbox (user_id, id)'
+
+# Writes to these change what the API serves, so they bump data_version
+VERSIONED_TABLES = CAPTURED_TABLES + ('staff',)
+
+SQLITE_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+# Dropped and recreated on every start, so older trigger bodies get replaced
+SQLITE_TRIGGERS_SQL = '''
+    DROP TRIGGER IF EXISTS trg_{table}_outbox_insert;
+    CREATE TRIGGER trg_{table}_outbox_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO change_outbox (table_name, op, pk, version, created_at, user_id, date)
+        VALUES ('{table}', 'insert', NEW.id, NEW.row_version, {now}, NEW.user_id, NEW.date);
+    END;
+    DROP TRIGGER IF EXISTS trg_{table}_outbox_update;
+    CREATE TRIGGER trg_{table}_outbox_update AFTER UPDATE ON {table}
+    WHEN NEW.row_version = OLD.row_version
+    BEGIN
+        UPDATE {table} SET row_version = OLD.row_version + 1 WHERE id = NEW.id;
+        INSERT INTO change_outbox (table_name, op, pk, version, created_at, user_id, date)
+        VALUES ('{table}', 'update', NEW.id, OLD.row_version + 1, {now}, NEW.user_id, NEW.date);
+    END;
+    DROP TRIGGER IF EXISTS trg_{table}_outbox_delete;
+    CREATE TRIGGER trg_{table}_outbox_delete AFTER DELETE ON {table}
+    BEGIN
+        INSERT INTO change_outbox (table_name, op, pk, version, created_at, user_id, date)
+        VALUES ('{table}', 'delete', OLD.id, OLD.row_version + 1, {now}, OLD.user_id, OLD.date);
+    END;
+'''
+
+# SQLite has no statement-level triggers: one bump per changed row
+SQLITE_VERSION_TRIGGERS_SQL = '''
+    DROP TRIGGER IF EXISTS trg_{table}_version_insert;
+    CREATE TRIGGER trg_{table}_version_insert AFTER INSERT ON {table}
+    BEGIN
+        UPDATE data_version SET version = version + 1, updated_at = {now} WHERE id = 1;
+    END;
+    DROP TRIGGER IF EXISTS trg_{table}_version_update;
+    CREATE TRIGGER trg_{table}_version_update AFTER UPDATE ON {table}
+    BEGIN
+        UPDATE data_version SET version = version + 1, updated_at = {now} WHERE id = 1;
+    END;
+    DROP TRIGGER IF EXISTS trg_{table}_version_delete;
+    CREATE TRIGGER trg_{table}_version_delete AFTER DELETE ON {table}
+    BEGIN
+        UPDATE data_version SET version = version + 1, updated_at = {now} WHERE id = 1;
+    END;
+'''
+
+POSTGRES_FUNCTION_SQL = f'''
+    CREATE OR REPLACE FUNCTION capture_change() RETURNS trigger AS $$
+    DECLARE
+        record_id BIGINT;
+        record_version INTEGER;
+        record_user TEXT;
+        record_date DATE;
+        outbox_id BIGINT;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            record_id := OLD.id;
+            record_version := OLD.row_version + 1;
+            record_user := OLD.user_id;
+            record_date := OLD.date;
+        ELSE
+            IF TG_OP = 'UPDATE' THEN
+                NEW.row_version := OLD.row_version + 1;
+            END IF;
+            record_id := NEW.id;
+            record_version := NEW.row_version;
+            record_user := NEW.user_id;
+            record_date := NEW.date;
+        END IF;
+        INSERT INTO change_outbox (table_name, op, pk, version, created_at, user_id, date)
+        VALUES (TG_TABLE_NAME, lower(TG_OP), record_id, record_version,
+                to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"'),
+                record_user, record_date)
+        RETURNING id INTO outbox_id;
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', TG_TABLE_NAME || ':' || outbox_id);
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+'''
+
+POSTGRES_TRIGGER_SQL = '''
+    DROP TRIGGER IF EXISTS trg_{table}_outbox ON {table};
+    CREATE TRIGGER trg_{table}_outbox BEFORE INSERT OR UPDATE OR DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION capture_change()
+'''
+
+POSTGRES_VERSION_FUNCTION_SQL = '''
+    CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_version
+        SET version = version + 1,
+            updated_at = to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"')
+        WHERE id = 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+'''
+
+# Once per statement, so a bulk load bumps the counter once
+POSTGRES_VERSION_TRIGGER_SQL = '''
+    DROP TRIGGER IF EXISTS trg_{table}_version ON {table};
+    CREATE TRIGGER trg_{table}_version AFTER INSERT OR UPDATE OR DELETE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+'''
+
+
+def utc_stamp(moment=None):
+    """Same format the triggers write, so created_at compares as text."""
+    moment = moment or datetime.now(pytz.utc)
+    return moment.astimezone(pytz.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class HoleWatch:
+    """Waits out gaps in the outbox id sequence (see SETTLE_SECONDS)."""
+
+    def __init__(self):
+        self.hole = None  # (id, first seen) of the hole being waited on
+
+    def settled(self, missing_id):
+        now = time.monotonic()
+        if self.hole is None or self.hole[0] != missing_id:
+            self.hole = (missing_id, now)
+        return now - self.hole[1] >= SETTLE_SECONDS
+
+    def readable(self, after, ids):
+        """How many of `ids` (ascending, all past `after`) come before the first unsettled hole."""
+        expected = after + 1
+        for index, record_id in enumerate(ids):
+            if record_id != expected and not self.settled(expected):
+                return index
+            expected = record_id + 1
+        return len(ids)
+
+
+class OutboxGap(Exception):
+    """Records this consumer had not read were pruned; resync, then reset()."""
+
+
+class OutboxConsumer:
+    """
+    At-least-once reader of change_outbox with a named, persisted checkpoint.
+
+        consumer = OutboxConsumer(db, 'sheets')
+        consumer.run(handle)            # handle(records) is called, then acked
+
+    A new consumer starts at `start`: 'earliest' (replay what the outbox
+    still holds) or 'latest' (only changes from now on).
+    """
+
+    def __init__(self, db, name, tables=CAPTURED_TABLES, batch_size=1000, start='earliest'):
+        self.db = db
+        self.name = name
+        self.tables = tuple(tables)
+        self.batch_size = batch_size
+        self._holes = HoleWatch()
+        self._listener = None
+        self.position = self._register(start)
+        self.read_through = self.position   # last id poll() got past
+
+    # ─── Checkpoints ───────────────────────────────────────────────────────────
+
+    def _register(self, start):
+        conn = self.db._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.db._fix_sql('SELECT position FROM outbox_consumers WHERE name = ?'), (self.name,))
+            row = cursor.fetchone()
+            if row:
+                return row[0]
+            position = 0
+            if start == 'latest':
+                cursor.execute(HEAD_SQL)
+                position = cursor.fetchone()[0]
+            cursor.execute(self.db._fix_sql('''
+                INSERT INTO outbox_consumers (name, position, updated_at) VALUES (?, ?, ?)
+            '''), (self.name, position, utc_stamp()))
+            conn.commit()
+            return position
+        finally:
+            conn.close()
+
+    def ack(self, position):
+        """Persist the checkpoint: everything up to `position` has been handled."""
+        conn = self.db._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.db._fix_sql('''
+                UPDATE outbox_consumers SET position = ?, updated_at = ? WHERE name = ?
+            '''), (position, utc_stamp(), self.name))
+            conn.commit()
+        finally:
+            conn.close()
+        self.position = position
+
+    def reset(self, position=None):
+        """Move the checkpoint (default: the newest record), e.g. after a full resync."""
+        if position is None:
+            position = self.head()
+        self._holes = HoleWatch()
+        self.ack(position)
+
+    def head(self):
+        """Newest outbox id (0 when empty)."""
+        conn = self.db._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(HEAD_SQL)
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    # ─── Reading ───────────────────────────────────────────────────────────────
+
+    def poll(self, after=None):
+        """
+        Records past `after` (default: the checkpoint), oldest first, at most
+        batch_size. Stops short of a sequence hole until it has settled.
+        Raises OutboxGap if unread records were pruned.
+        """
+        after = self.position if after is None else after
+        placeholders = ', '.join('?' for _ in self.tables)
+        conn = self.db._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT pruned_through FROM outbox_state WHERE id = 1')
+            if cursor.fetchone()[0] > after:
+                raise OutboxGap(f"outbox records after {after} were pruned before consumer {self.name!r} read them")
+            # Filter tables in Python: the sequence check needs every id
+            cursor.execute(self.db._fix_sql('''
+                SELECT id, table_name, op, pk, version, created_at, user_id, date FROM change_outbox
+                WHERE id > ? ORDER BY id LIMIT ?
+            '''), (after, self.batch_size))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        rows = rows[:self._holes.readable(after, [row[0] for row in rows])]
+        # Everything read is skippable even if no record was for our tables
+        self.read_through = rows[-1][0] if rows else after
+        return [ChangeRecord(*row) for row in rows if row[1] in self.tables]
+
+    def wait(self, timeout):
+        """Block until a NOTIFY arrives (Postgres) or `timeout` seconds pass."""
+        if not getattr(self.db, 'db_url', None):
+            time.sleep(timeout)
+            return
+        if self._listener is None:
+            self._listener = self.db._get_conn()
+            self._listener.autocommit = True
+            self._listener.cursor().execute(f'LISTEN {NOTIFY_CHANNEL}')
+        if select.select([self._listener], [], [], timeout)[0]:
+            self._listener.poll()
+            self._listener.notifies.clear()
+
+    def run(self, handler, interval=10, once=False):
+        """Deliver batches to handler(records), acking each after it returns."""
+        while True:
+            records = self.poll()
+            if records:
+                handler(records)
+            if self.read_through > self.position:
+                self.ack(self.read_through)
+                continue  # drain the backlog before waiting
+            if once:
+                return
+            self.wait(interval)
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    @staticmethod
+    def latest(records):
+        """Collapse a batch to the newest record per (table, pk): the work actually left to do."""
+        return {(record.table_name, record.pk): record for record in records}
+
+
+# ─── Pruning ─────────────────────────────────────────────────────────────────
+
+def prune(db, max_age=None):
+    """
+    Delete outbox records every registered consumer has acked; with max_age
+    (a timedelta) also records older than that, acked or not. Returns the
+    number of records deleted.
+    """
+    conn = db._get_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MIN(position) FROM outbox_consumers')
+        through = cursor.fetchone()[0]
+        if through is None:  # no consumers: nobody needs anything
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM change_outbox')
+            through = cursor.fetchone()[0]
+        if max_age is not None:
+            cursor.execute(db._fix_sql('SELECT MAX(id) FROM change_outbox WHERE created_at < ?'),
+                           (utc_stamp(datetime.now(pytz.utc) - max_age),))
+            through = max(through, cursor.fetchone()[0] or 0)
+        cursor.execute(db._fix_sql('DELETE FROM change_outbox WHERE id <= ?'), (through,))
+        deleted = cursor.rowcount
+        cursor.execute(db._fix_sql('''
+            UPDATE outbox_state SET pruned_through = ? WHERE id = 1 AND pruned_through < ?
+        '''), (through, through))
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
+
+
+def consumer_status(db):
+    """[(name, position, lag, updated_at)] plus the outbox's (oldest, newest) ids."""
+    conn = db._get_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM change_outbox')
+        oldest, newest = cursor.fetchone()
+        cursor.execute(HEAD_SQL)
+        head = cursor.fetchone()[0]
+        cursor.execute('SELECT name, position, updated_at FROM outbox_consumers ORDER BY name')
+        consumers = [(name, position, head - position, updated_at) for name, position, updated_at in cursor.fetchall()]
+        return consumers, (oldest, newest)
+    finally:
+        conn.close()
@@ -0,0 +1,240 @@
+"""
+Pay-period computation: regular, overtime and night-differential hours.
+
+For each employee the complete attendance rows in the period are streamed
+off the (user_id, date) index one person at a time, so memory stays flat no
+matter how long the period is. Employees are split into partitions and the
+partitions are worked on by a process pool; every worker opens its own
+connection. Shifts are read from the local clock columns (time_in/time_out,
+break_start/break_end), with a time_out before time_in meaning the shift ran
+past midnight.
+
+Per shift:
+    worked     hours_worked (already net of breaks)
+    night      minutes inside the night window, minus any break inside it,
+               capped at worked
+    overtime   worked beyond `daily_overtime_after` per calendar date, then
+               regular hours beyond `weekly_overtime_after` per ISO week
+
+Night hours are a premium on top of the regular/overtime split, not a third
+bucket: gross = regular*rate + overtime*rate*overtime_multiplier
+              + night*rate*night_differential.
+"""
+import csv
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from src.analytics import to_minutes
+from src.database import connect
+
+# Defaults follow the usual Philippine rules: OT after 8 h/day at +25%,
+# +10% night differential between 10 PM and 6 AM
+DEFAULT_RULES = {
+    "base_rate": 0.0,                # hourly rate when user_id has no entry in rates
+    "rates": {},                     # user_id -> hourly rate
+    "daily_overtime_after": 8.0,
+    "weekly_overtime_after": None,   # e.g. 40.0; None disables the weekly rule
+    "overtime_multiplier": 1.25,
+    "night_start": "22:00",
+    "night_end": "06:00",
+    "night_differential": 0.10,
+}
+
+PAYROLL_COLUMNS = ["user_id", "name", "days_worked", "shifts", "worked_hours", "regular_hours",
+                   "overtime_hours", "night_hours", "break_hours", "rate", "regular_pay",
+                   "overtime_pay", "night_pay", "gross_pay"]
+
+SHIFTS_SQL = '''
+    SELECT date, time_in, time_out, break_start, break_end, break_duration, hours_worked
+    FROM attendance
+    WHERE user_id = ? AND date >= ? AND date <= ? AND status = 'complete'
+    ORDER BY date, time_in
+'''
+
+EMPLOYEES_SQL = '''
+    SELECT DISTINCT user_id FROM attendance
+    WHERE date >= ? AND date <= ? AND status = 'complete'
+'''
+
+PARTITIONS_PER_WORKER = 4  # smaller partitions even out uneven row counts
+
+
+def load_rules(path=None):
+    """DEFAULT_RULES overlaid with a JSON file's keys."""
+    rules = dict(DEFAULT_RULES)
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_RULES)
+        if unknown:
+            raise ValueError(f"Unknown payroll rule(s): {', '.join(sorted(unknown))}")
+        rules.update(overrides)
+    return rules
+
+
+def semi_monthly_period(day):
+    """The 1st-15th or 16th-end-of-month period containing day."""
+    if day.day <= 15:
+        return day.replace(day=1), day.replace(day=15)
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day.replace(day=16), next_month - timedelta(days=1)
+
+
+# ─── Per-shift arithmetic ────────────────────────────────────────────────────
+
+def night_windows(rules):
+    """Night windows as minute ranges from the shift date's midnight, day before to two days after."""
+    start, end = to_minutes(rules["night_start"]), to_minutes(rules["night_end"])
+    if start < 0 or end < 0:
+        raise ValueError("night_start / night_end must look like '22:00'")
+    length = (end - start) % 1440
+    return [(k * 1440 + start, k * 1440 + start + length) for k in range(-1, 3)]
+
+
+def overlap(start, end, windows):
+    return sum(max(0, min(end, w_end) - max(start, w_start)) for w_start, w_end in windows)
+
+
+def span(start, end):
+    """Minute range for clock times, rolling end past midnight when it is earlier."""
+    return start, end + 1440 if end < start else end
+
+
+def night_hours(time_in, time_out, break_start, break_end, windows):
+    t_in, t_out = to_minutes(time_in), to_minutes(time_out)
+    if t_in < 0 or t_out < 0:
+        return 0.0
+    start, end = span(t_in, t_out)
+    minutes = overlap(start, end, windows)
+    b_start, b_end = to_minutes(break_start), to_minutes(break_end)
+    if minutes and b_start >= 0 and b_end >= 0:
+        if b_start < t_in:
+            b_start += 1440  # break taken after midnight
+        minutes -= overlap(*span(b_start, b_end), windows)
+    return max(minutes, 0) / 60
+
+
+def summarize(user_id, shifts, rules, windows):
+    """Hours and pay for one employee from their (date, time_in, ...) rows in date order."""
+    per_day, weeks = {}, {}
+    total_night = total_breaks = 0.0
+    n_shifts = 0
+    for day, time_in, time_out, break_start, break_end, break_duration, hours_worked in shifts:
+        worked = hours_worked or 0.0
+        n_shifts += 1
+        total_breaks += break_duration or 0.0
+        total_night += min(night_hours(time_in, time_out, break_start, break_end, windows), worked)
+        per_day[str(day)[:10]] = per_day.get(str(day)[:10], 0.0) + worked
+
+    regular = overtime = 0.0
+    daily_limit, weekly_limit = rules["daily_overtime_after"], rules["weekly_overtime_after"]
+    for day, worked in per_day.items():
+        day_regular = min(worked, daily_limit) if daily_limit is not None else worked
+        overtime += worked - day_regular
+        if weekly_limit is not None:
+            week = date.fromisoformat(day).isocalendar()[:2]
+            room = max(weekly_limit - weeks.get(week, 0.0), 0.0)
+            weeks[week] = weeks.get(week, 0.0) + day_regular
+            overtime += max(day_regular - room, 0.0)
+            day_regular = min(day_regular, room)
+        regular += day_regular
+
+    rate = rules["rates"].get(user_id, rules["base_rate"])
+    pay = {
+        "regular_pay": regular * rate,
+        "overtime_pay": overtime * rate * rules["overtime_multiplier"],
+        "night_pay": total_night * rate * rules["night_differential"],
+    }
+    result = {
+        "user_id": user_id,
+        "days_worked": len(per_day),
+        "shifts": n_shifts,
+        "worked_hours": regular + overtime,
+        "regular_hours": regular,
+        "overtime_hours": overtime,
+        "night_hours": total_night,
+        "break_hours": total_breaks,
+        "rate": rate,
+        **pay,
+        "gross_pay": sum(pay.values()),
+    }
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in result.items()}
+
+
+# ─── Partitioned run ─────────────────────────────────────────────────────────
+
+def compute_partition(target, user_ids, date_from, date_to, rules):
+    """Worker entry point: summaries for a list of employees, one index range scan each."""
+    conn, fix_sql = connect(target)
+    windows = night_windows(rules)
+    sql = fix_sql(SHIFTS_SQL)
+    try:
+        results = []
+        cursor = conn.cursor()
+        for user_id in user_ids:
+            cursor.execute(sql, (user_id, str(date_from), str(date_to)))
+            results.append(summarize(user_id, cursor, rules, windows))
+        return results
+    finally:
+        conn.close()
+
+
+def partition(user_ids, n_parts):
+    size = max(1, math.ceil(len(user_ids) / max(n_parts, 1)))
+    return [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+
+
+def run_payroll(target, date_from, date_to, rules=None, workers=None):
+    """Per-employee payroll for [date_from, date_to], sorted by name.
+
+    workers=1 computes in this process; otherwise partitions go to a process
+    pool of that many workers (None: one per CPU).
+    """
+    rules = rules or dict(DEFAULT_RULES)
+    night_windows(rules)  # fail on bad rules before forking
+    conn, fix_sql = connect(target)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(fix_sql(EMPLOYEES_SQL), (str(date_from), str(date_to)))
+        user_ids = sorted(row[0] for row in cursor.fetchall())
+        cursor.execute('SELECT user_id, name FROM staff')
+        names = dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(user_ids) <= 1:
+        summaries = compute_partition(target, user_ids, date_from, date_to, rules)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(compute_partition, target, part, date_from, date_to, rules)
+                       for part in partition(user_ids, workers * PARTITIONS_PER_WORKER)]
+            summaries = [summary for future in futures for summary in future.result()]
+
+    for summary in summaries:
+        summary["name"] = names.get(summary["user_id"], summary["user_id"])
+    return sorted(summaries, key=lambda summary: (summary["name"], summary["user_id"]))
+
+
+def totals(summaries):
+    keys = [column for column in PAYROLL_COLUMNS if column.endswith(("_hours", "_pay"))]
+    return {key: round(sum(summary[key] for summary in summaries), 2) for key in keys}
+
+
+def write_csv(summaries, f):
+    writer = csv.DictWriter(f, fieldnames=PAYROLL_COLUMNS)
+    writer.writeheader()
+    writer.writerows(summaries)
+
+
+def write_json(summaries, f, date_from, date_to, rules):
+    json.dump({
+        "from": str(date_from),
+        "to": str(date_to),
+        "rules": rules,
+        "employees": summaries,
+        "totals": totals(summaries),
+    }, f, indent=2)
@@ -0,0 +1,71 @@
+"""
+Stored period keys for attendance rows.
+
+Each attendance row carries week_key ('2026-W42', ISO 8601 week) and
+month_key ('2026-10'). AttendanceDB writes them at clock-in from Python. On
+start-up it fills any row still missing them, such as rows from bulk loads
+or from before the columns existed, using the SQL below. Every backend
+therefore produces byte-identical labels. strftime('%Y-W%W') numbered
+weeks from the first Monday, splitting the turn of the year into two
+partial weeks, while to_char(..., 'IYYY-IW') on Postgres used ISO weeks.
+
+The keys sort chronologically as text, so summaries filter and group on
+them directly. The covering indexes below make a weekly or monthly summary
+an index-ordered range scan with no per-row date arithmetic.
+"""
+from datetime import date
+
+# ISO week of a SQLite date: the week belongs to the year of its Thursday
+_SQLITE_THURSDAY = "date({column}, '-' || ((CAST(strftime('%w', {column}) AS INTEGER) + 6) % 7) || ' days', '+3 days')"
+
+SQLITE_KEY_SQL = {
+    'week_key': ("strftime('%Y', {thursday}) || '-W' || "
+                 "printf('%02d', (CAST(strftime('%j', {thursday}) AS INTEGER) - 1) / 7 + 1)"
+                 ).format(thursday=_SQLITE_THURSDAY.format(column='date')),
+    'month_key': "strftime('%Y-%m', date)",
+}
+
+POSTGRES_KEY_SQL = {
+    'week_key': "to_char(date, 'IYYY-\"W\"IW')",
+    'month_key': "to_char(date, 'YYYY-MM')",
+}
+
+PERIOD_INDEXES_SQL = [
+    # Summaries read complete rows per period: keep them index-only
+    '''
+    CREATE INDEX IF NOT EXISTS idx_attendance_week
+    ON attendance (status, week_key, date, user_id, hours_worked)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_attendance_month
+    ON attendance (status, month_key, date, user_id, hours_worked, break_duration)
+    ''',
+    # Rows still waiting for keys; empty once backfilled, so the start-up check is free
+    '''
+    CREATE INDEX IF NOT EXISTS idx_attendance_unkeyed
+    ON attendance (id) WHERE week_key IS NULL OR month_key IS NULL
+    ''',
+]
+
+
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(day):
+    return f"{day.year}-{day.month:02d}"
+
+
+def period_keys(day):
+    """(week_key, month_key) for a date or 'YYYY-MM-DD' string."""
+    day = day if isinstance(day, date) else date.fromisoformat(str(day)[:10])
+    return week_key(day), month_key(day)
+
+
+def backfill_sql(postgres):
+    expressions = POSTGRES_KEY_SQL if postgres else SQLITE_KEY_SQL
+    return f'''
+        UPDATE attendance SET week_key = {expressions['week_key']}, month_key = {expressions['month_key']}
+        WHERE week_key IS NULL OR month_key IS NULL
+    '''
@@ -0,0 +1,214 @@
+"""
+Compact per-day presence bitmaps.
+
+Every staff row gets a permanent ordinal. Ordinals are assigned in registry
+order as people are synced, and to newcomers as they first clock in, and
+are never reused. presence_days holds one bitmap per calendar day, with bit
+<ordinal> set when that person clocked in that day (a night shift counts on
+the day it started). AttendanceDB sets the bit in the same transaction as
+the clock-in. A day for 1,000 people is 125 bytes, so five years fit in
+about 230 KB and load in one query.
+
+Absence is what the raw table can't express, because absent people have no
+rows. Here it is defined as:
+
+    open days   days in the range, on the chosen weekdays, on which anyone
+                clocked in (a day nobody worked is a holiday, not 1,000 absences)
+    expected    people who are active now and had clocked in at least once
+                on or before that day (nobody is absent before they joined)
+    absent      expected & ~present
+
+Every count, rate and streak is then computed with bitwise ops over whole
+days. SlicedCounter keeps one counter per ordinal as bit planes. Adding a
+day's bitmap is a ripple-carry add across the planes: about log2(days)
+big-int ops for all 1,000 people at once instead of 1,000 increments.
+"""
+from datetime import date
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+WORKDAYS = frozenset(range(5))
+
+PRESENCE_DAYS_SQL = 'SELECT date, bits FROM presence_days'
+PRESENCE_STAFF_SQL = 'SELECT user_id, name, ordinal, active FROM staff'
+
+
+def presence_table_sql(blob_type):
+    return f'''
+        CREATE TABLE IF NOT EXISTS presence_days (
+            date DATE PRIMARY KEY,
+            bits {blob_type} NOT NULL,
+            updated_at TEXT
+        )
+    '''
+
+
+def to_int(bits):
+    """Stored bitmap (bytes / memoryview, little-endian) -> int."""
+    return int.from_bytes(bytes(bits or b''), 'little')
+
+
+def to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def ordinals_of(mask):
+    """Set bit positions of an int, lowest first."""
+    ordinals = []
+    while mask:
+        low = mask & -mask
+        ordinals.append(low.bit_length() - 1)
+        mask ^= low
+    return ordinals
+
+
+def parse_weekdays(text):
+    """'mon,wed' / 'mon-fri' / 'all' -> set of weekday numbers (Monday = 0)."""
+    if not text or text == 'all':
+        return frozenset(range(7))
+    days = set()
+    for part in text.lower().split(','):
+        first, _, last = part.strip().partition('-')
+        start = WEEKDAY_NAMES.index(first[:3])
+        end = WEEKDAY_NAMES.index(last[:3]) if last else start
+        days.update(range(start, end + 1))
+    return frozenset(days)
+
+
+class SlicedCounter:
+    """One small counter per ordinal, stored as bit planes.
+
+    Bit n of planes[i] is bit i of counter n, so incrementing every counter
+    in a mask, zeroing counters, or comparing two counter sets touches each
+    plane once regardless of how many people there are.
+    """
+
+    def __init__(self, planes=None):
+        self.planes = list(planes or [])
+
+    def add(self, mask):
+        """Increment the counters whose bit is set in mask."""
+        carry = mask
+        for i, plane in enumerate(self.planes):
+            if not carry:
+                return
+            self.planes[i] = plane ^ carry
+            carry &= plane
+        if carry:
+            self.planes.append(carry)
+
+    def keep(self, mask):
+        """Zero every counter outside mask."""
+        self.planes = [plane & mask for plane in self.planes]
+
+    def greater(self, other):
+        """Mask of ordinals whose counter here is greater than in other."""
+        width = max(len(self.planes), len(other.planes))
+        mine = self.planes + [0] * (width - len(self.planes))
+        theirs = other.planes + [0] * (width - len(other.planes))
+        greater, undecided = 0, -1
+        for a, b in zip(reversed(mine), reversed(theirs)):
+            greater |= undecided & a & ~b
+            undecided &= ~(a ^ b)
+        return greater
+
+    def above(self, threshold):
+        """Mask of ordinals whose counter exceeds threshold."""
+        constant = SlicedCounter([-1 if threshold >> i & 1 else 0 for i in range(threshold.bit_length())])
+        return self.greater(constant)
+
+    def maximum(self, other):
+        """Per-ordinal max of this and other, as a new counter."""
+        take = self.greater(other)
+        width = max(len(self.planes), len(other.planes))
+        mine = self.planes + [0] * (width - len(self.planes))
+        theirs = other.planes + [0] * (width - len(other.planes))
+        return SlicedCounter([(a & take) | (b & ~take) for a, b in zip(mine, theirs)])
+
+    def value(self, ordinal):
+        return sum(1 << i for i, plane in enumerate(self.planes) if plane >> ordinal & 1)
+
+
+class PresenceIndex:
+    """Presence bitmaps plus the staff ordinals, answering range questions in memory.
+
+    days: {date: int bitmap}; staff: [(user_id, name, ordinal, active)].
+    """
+
+    def __init__(self, days, staff):
+        self.days = dict(sorted(days.items()))
+        self.staff = {ordinal: (user_id, name) for user_id, name, ordinal, _ in staff if ordinal is not None}
+        self.active = 0
+        for _, _, ordinal, active in staff:
+            if ordinal is not None and active:
+                self.active |= 1 << ordinal
+
+    @classmethod
+    def from_rows(cls, day_rows, staff):
+        """Build from presence_days (date, bits) rows as the drivers return them."""
+        return cls({as_date(day): to_int(bits) for day, bits in day_rows}, staff)
+
+    def walk(self, date_from, date_to, weekdays=WORKDAYS, active_only=True):
+        """Yield (day, expected, present) for each open day in the range."""
+        scope = self.active if active_only else -1
+        seen = 0
+        for day, bits in self.days.items():
+            if day > date_to:
+                break
+            seen |= bits
+            if day >= date_from and bits and day.weekday() in weekdays:
+                yield day, seen & scope, bits & scope
+
+    def counters(self, date_from, date_to, weekdays=WORKDAYS, active_only=True):
+        """SlicedCounters for present, absent, current streak and longest streak, plus the expected mask."""
+        present, absent = SlicedCounter(), SlicedCounter()
+        streak, longest = SlicedCounter(), SlicedCounter()
+        expected = 0
+        for _, day_expected, day_present in self.walk(date_from, date_to, weekdays, active_only):
+            expected |= day_expected
+            present.add(day_present)
+            absent.add(day_expected & ~day_present)
+            streak.add(day_present)
+            streak.keep(day_present | ~day_expected)  # absence resets; not-yet-joined stays 0
+            longest = longest.maximum(streak)
+        return present, absent, streak, longest, expected
+
+    def summary(self, date_from, date_to, weekdays=WORKDAYS, active_only=True):
+        """Per-person present/absent days, attendance rate and streaks over open days."""
+        present, absent, streak, longest, expected = self.counters(date_from, date_to, weekdays, active_only)
+        rows = []
+        for ordinal in ordinals_of(expected):
+            user_id, name = self.staff.get(ordinal, (None, None))
+            days_present, days_absent = present.value(ordinal), absent.value(ordinal)
+            rows.append({
+                "user_id": user_id, "name": name,
+                "present": days_present, "absent": days_absent,
+                "rate": round(days_present / (days_present + days_absent), 4) if days_present + days_absent else None,
+                "current_streak": streak.value(ordinal),
+                "longest_streak": longest.value(ordinal),
+            })
+        return rows
+
+    def absent_more_than(self, threshold, date_from, date_to, weekdays=WORKDAYS, active_only=True):
+        """[(user_id, name, absences)] for people absent on more than `threshold` open days."""
+        absent = SlicedCounter()
+        for _, expected, present in self.walk(date_from, date_to, weekdays, active_only):
+            absent.add(expected & ~present)
+        return [(*self.staff.get(ordinal, (None, None)), absent.value(ordinal))
+                for ordinal in ordinals_of(absent.above(threshold))]
+
+    def on(self, day):
+        """(present, absent) [(user_id, name)] for one day; absent is empty on days nobody worked."""
+        bits = self.days.get(day, 0)
+        expected = 0
+        if bits:
+            for other, other_bits in self.days.items():
+                if other > day:
+                    break
+                expected |= other_bits
+        expected &= self.active
+        return ([self.staff.get(o, (None, None)) for o in ordinals_of(bits)],
+                [self.staff.get(o, (None, None)) for o in ordinals_of(expected & ~bits)])
+
+
+def as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
@@ -0,0 +1,246 @@
+"""
+Bulk recomputation of the derived attendance columns.
+
+hours_worked and break_duration are computed once at ingest (save_break_end,
+save_time_out). `derive` re-applies the same rules from the stored clock
+columns through the same helpers (calculate_hours, src/clock.py), so after
+a rule change a recompute brings history in line with what ingest now
+produces.
+
+A run covers a date range of complete rows. The rows' id span is split into
+partitions, and each partition is walked in id order in chunks by its own
+worker process:
+
+    read chunk -> derive in Python -> UPDATE only the rows that differ
+    (guarded by row_version, so a row the bot touched since the read is
+    skipped as a conflict; the capture triggers record each updated row in
+    change_outbox and bump data_version) -> save the partition's position
+    -> commit
+
+Every chunk is its own short transaction, and after it the worker sleeps
+long enough that it holds the write lock at most `duty` of the time. The
+bot's writes queue behind at most one chunk. Positions live in
+recompute_progress, so an interrupted run resumes where each partition
+stopped. A dry run writes nothing and returns the differences instead.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pytz
+
+from src.clock import CLOCK_LABELS, clock_span, parse_clock
+from src.database import connect
+from src.utils import calculate_hours
+
+DEFAULT_CHUNK = 500
+DEFAULT_DUTY = 0.25      # max share of wall time a worker spends inside write transactions
+BUSY_TIMEOUT_MS = 10000  # SQLite: wait this long for the bot's write lock before erroring
+TOLERANCE = 0.001        # hours; closer values count as unchanged (seeders store 4 decimals)
+
+RECOMPUTE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS recompute_progress (
+        run TEXT NOT NULL,
+        part INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        end_id INTEGER NOT NULL,
+        scanned INTEGER NOT NULL DEFAULT 0,
+        changed INTEGER NOT NULL DEFAULT 0,
+        conflicts INTEGER NOT NULL DEFAULT 0,
+        done BOOLEAN NOT NULL DEFAULT FALSE,
+        updated_at TEXT,
+        PRIMARY KEY (run, part)
+    )
+'''
+
+BOUNDS_SQL = '''
+    SELECT MIN(id), MAX(id) FROM attendance
+    WHERE date >= ? AND date <= ? AND status = 'complete'
+'''
+
+CHUNK_SQL = '''
+    SELECT id, user_id, date, time_in, time_out, break_start, break_end,
+           break_duration, hours_worked, row_version
+    FROM attendance
+    WHERE id > ? AND id <= ? AND date >= ? AND date <= ? AND status = 'complete'
+    ORDER BY id
+    LIMIT ?
+'''
+
+UPDATE_SQL = '''
+    UPDATE attendance SET hours_worked = ?, break_duration = ?
+    WHERE id = ? AND row_version = ? AND status = 'complete'
+'''
+
+Change = namedtuple('Change', 'id user_id date old_hours new_hours old_break new_break')
+
+
+def derive(time_in, time_out, break_start, break_end, break_duration):
+    """(hours_worked, break_duration) under the current ingest rules; None if the clock times don't parse."""
+    start, end = parse_clock(break_start), parse_clock(break_end)
+    if start is not None and end is not None:
+        break_duration = clock_span(start, end) / 60   # save_break_end
+    break_duration = break_duration or 0
+    t_in, t_out = parse_clock(time_in), parse_clock(time_out)
+    if t_in is None or t_out is None:
+        return None
+    # save_time_out: the bot's calculate_hours, minus the recorded break
+    return round(calculate_hours(CLOCK_LABELS[t_in], CLOCK_LABELS[t_out]) - break_duration, 2), break_duration
+
+
+def differs(old, new):
+    return old is None or abs(old - new) > TOLERANCE
+
+
+def diff_chunk(rows):
+    """Changes for the rows of one chunk whose stored values differ from derive()."""
+    changes = []
+    for row_id, user_id, day, time_in, time_out, break_start, break_end, old_break, old_hours, _ in rows:
+        derived = derive(time_in, time_out, break_start, break_end, old_break)
+        if derived is None:
+            continue
+        new_hours, new_break = derived
+        if differs(old_hours, new_hours) or differs(old_break, new_break):
+            changes.append(Change(row_id, user_id, str(day)[:10], old_hours, new_hours, old_break, new_break))
+    return changes
+
+
+# ─── Runs and partitions ─────────────────────────────────────────────────────
+
+def plan_run(target, run, date_from, date_to, parts, restart=False):
+    """Create (or find) the run's partitions. Returns [(part, last_id, end_id)] still to do."""
+    conn, fix_sql = connect(target)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(RECOMPUTE_TABLE_SQL)
+        if restart:
+            cursor.execute(fix_sql('DELETE FROM recompute_progress WHERE run = ?'), (run,))
+        cursor.execute(fix_sql('SELECT COUNT(*) FROM recompute_progress WHERE run = ?'), (run,))
+        if not cursor.fetchone()[0]:
+            for part, last_id, end_id in split(cursor, fix_sql, date_from, date_to, parts):
+                cursor.execute(fix_sql('''
+                    INSERT INTO recompute_progress (run, part, last_id, end_id, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                '''), (run, part, last_id, end_id, datetime.now(pytz.utc).isoformat()))
+        conn.commit()
+        cursor.execute(fix_sql('''
+            SELECT part, last_id, end_id FROM recompute_progress
+            WHERE run = ? AND NOT done ORDER BY part
+        '''), (run,))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def split(cursor, fix_sql, date_from, date_to, parts):
+    """Equal id ranges (exclusive start, inclusive end) covering the date range's rows."""
+    cursor.execute(fix_sql(BOUNDS_SQL), (str(date_from), str(date_to)))
+    low, high = cursor.fetchone()
+    if low is None:
+        return []
+    step = max(1, -(-(high - low + 1) // parts))
+    return [(part, low - 1 + part * step, min(low - 1 + (part + 1) * step, high))
+            for part in range(parts) if low - 1 + part * step < high]
+
+
+def run_status(target, run=None):
+    """Progress rows, newest runs first: (run, part, last_id, end_id, scanned, changed, conflicts, done, updated_at)."""
+    conn, fix_sql = connect(target)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(RECOMPUTE_TABLE_SQL)
+        conn.commit()
+        sql = 'SELECT run, part, last_id, end_id, scanned, changed, conflicts, done, updated_at FROM recompute_progress'
+        if run:
+            cursor.execute(fix_sql(sql + ' WHERE run = ? ORDER BY part'), (run,))
+        else:
+            cursor.execute(sql + ' ORDER BY updated_at DESC, run, part')
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def recompute_partition(target, run, part, last_id, end_id, date_from, date_to,
+                        chunk=DEFAULT_CHUNK, duty=DEFAULT_DUTY, dry_run=False):
+    """Worker entry point: walk one id range. Returns (stats dict, changes if dry_run else [])."""
+    conn, fix_sql = connect(target)
+    if fix_sql('?') == '?':
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    stats = {'part': part, 'scanned': 0, 'changed': 0, 'conflicts': 0, 'write_seconds': 0.0}
+    found = []
+    select_sql, update_sql = fix_sql(CHUNK_SQL), fix_sql(UPDATE_SQL)
+    try:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute(select_sql, (last_id, end_id, str(date_from), str(date_to), chunk))
+            rows = cursor.fetchall()
+            conn.commit()  # end the read transaction; the write below is its own short one
+            if not rows:
+                break
+            changes = diff_chunk(rows)
+            versions = {row[0]: row[9] for row in rows}
+            last_id = rows[-1][0]
+            stats['scanned'] += len(rows)
+            if dry_run:
+                found.extend(changes)
+                stats['changed'] += len(changes)
+                continue
+
+            started = time.perf_counter()
+            applied = 0
+            now = datetime.now(pytz.utc).isoformat()
+            for change in changes:
+                cursor.execute(update_sql, (change.new_hours, change.new_break, change.id, versions[change.id]))
+                if cursor.rowcount:
+                    applied += 1
+            stats['changed'] += applied
+            stats['conflicts'] += len(changes) - applied
+            cursor.execute(fix_sql('''
+                UPDATE recompute_progress
+                SET last_id = ?, scanned = scanned + ?, changed = changed + ?,
+                    conflicts = conflicts + ?, updated_at = ?
+                WHERE run = ? AND part = ?
+            '''), (last_id, len(rows), applied, len(changes) - applied, now, run, part))
+            conn.commit()
+            held = time.perf_counter() - started
+            stats['write_seconds'] += held
+            # Duty-cycle throttle: leave the lock free for (1 - duty) of the time
+            time.sleep(held * (1 - duty) / duty)
+
+        if not dry_run:
+            cursor.execute(fix_sql('''
+                UPDATE recompute_progress SET last_id = ?, done = TRUE, updated_at = ?
+                WHERE run = ? AND part = ?
+            '''), (end_id, datetime.now(pytz.utc).isoformat(), run, part))
+            conn.commit()
+        return stats, found
+    finally:
+        conn.close()
+
+
+def recompute(target, date_from, date_to, run=None, workers=1, chunk=DEFAULT_CHUNK,
+              duty=DEFAULT_DUTY, dry_run=False, restart=False):
+    """Recompute [date_from, date_to]. Returns (per-partition stats, changes found by a dry run).
+
+    A dry run ignores saved progress and scans the whole range; otherwise the
+    run named `run` (default: the date range) resumes unfinished partitions.
+    """
+    run = run or f"{date_from}..{date_to}"
+    if dry_run:
+        conn, fix_sql = connect(target)
+        try:
+            partitions = split(conn.cursor(), fix_sql, date_from, date_to, max(workers, 1))
+        finally:
+            conn.close()
+    else:
+        partitions = plan_run(target, run, date_from, date_to, max(workers, 1), restart)
+
+    jobs = [(target, run, part, last_id, end_id, date_from, date_to, chunk, duty, dry_run)
+            for part, last_id, end_id in partitions]
+    if workers <= 1 or len(jobs) <= 1:
+        outcomes = [recompute_partition(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = [future.result() for future in [pool.submit(recompute_partition, *job) for job in jobs]]
+    return [stats for stats, _ in outcomes], [change for _, found in outcomes for change in found]
@@ -0,0 +1,85 @@
+"""
+Query building and row encoding for the date-range report endpoints.
+
+Reports page with a keyset cursor on (date, id) rather than OFFSET, so every
+page is an index range scan no matter how deep into history it is, and
+exports stream rows out of a server-side cursor in fixed-size chunks.
+"""
+import csv
+import io
+from datetime import date, datetime, time
+
+from src.serialization import dumps
+
+REPORT_COLUMNS = {
+    "attendance": ["id", "user_id", "name", "date", "time_in", "time_out", "break_start",
+                   "break_end", "break_duration", "hours_worked", "status", "created_at"],
+    "tasks": ["id", "user_id", "name", "date", "task_description", "has_link",
+              "deliverable_url", "created_at"],
+}
+
+# Rows carry only user_id; the name is looked up in staff by primary key per
+# row, which keeps the unqualified filter columns above unambiguous
+STAFF_NAME_SQL = "(SELECT s.name FROM staff s WHERE s.user_id = {table}.user_id)"
+
+
+def report_select(table):
+    """SELECT list for REPORT_COLUMNS[table], resolving name through staff."""
+    return ', '.join(STAFF_NAME_SQL.format(table=table) if column == "name" else column
+                     for column in REPORT_COLUMNS[table])
+
+
+# Grouping column per summary period (stored keys, see src/periods.py)
+PERIOD_EXPRESSIONS = {
+    "day": "date",
+    "week": "week_key",
+    "month": "month_key",
+}
+
+
+def build_filters(date_from=None, date_to=None, user_id=None, status=None):
+    """Return (' WHERE ...', params) for the common report filters."""
+    clauses, params = [], []
+    if date_from is not None:
+        clauses.append('date >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append('date <= ?')
+        params.append(date_to)
+    if user_id:
+        clauses.append('user_id = ?')
+        params.append(user_id)
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    where = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+    return where, params
+
+
+def encode_cursor(row_date, row_id):
+    return f"{row_date}:{row_id}"
+
+
+def decode_cursor(cursor):
+    """'YYYY-MM-DD:id' -> (date, id); raises ValueError on garbage."""
+    day, _, row_id = cursor.partition(':')
+    return date.fromisoformat(day), int(row_id)
+
+
+def to_json_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return str(value)
+    return value
+
+
+def csv_chunk(rows, header=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows([to_json_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def ndjson_chunk(encoder, rows):
+    return b''.join(dumps(record) + b'\n' for record in encoder.records(rows))
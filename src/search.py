@@ -0,0 +1,165 @@
+"""
+Full-text search over task descriptions.
+
+SQLite keeps an external-content FTS5 index, tasks_fts, over
+tasks.task_description. Triggers update it in the same transaction as every
+insert, delete and description edit. It stores only the index and reads the
+text back from tasks. Postgres stores a generated tsvector column,
+tasks.search_vector, with a GIN index on it. Both stem English words
+(porter / 'english'), so "deploying" finds "deployed".
+
+Search text is reduced to plain terms before it reaches either engine, so
+users can't hit MATCH / to_tsquery syntax errors:
+
+    word       a stemmed word
+    word*      a prefix
+    "a b c"    a phrase (adjacent words); punctuated words like api-gateway
+               become phrases too
+
+All terms must match. Hits are ranked by bm25 (SQLite) or ts_rank_cd
+(Postgres), with `score` negated on Postgres so that lower is better on both.
+Pages are keyset-paginated on (score, id), or on (date, id) newest first for
+order='recent', so deep pages cost the same as the first.
+"""
+import re
+
+from src.reports import STAFF_NAME_SQL, build_filters, decode_cursor, encode_cursor
+
+SEARCH_COLUMNS = ["id", "user_id", "name", "date", "task_description", "deliverable_url", "score"]
+SEARCH_ORDERS = ("rank", "recent")
+
+TERM_RE = re.compile(r'"([^"]*)"?|(\S+)')
+WORD_RE = re.compile(r'\w+')
+
+SQLITE_FTS_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        task_description,
+        content = 'tasks', content_rowid = 'id',
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+'''
+
+SQLITE_FTS_TRIGGERS = {
+    'trg_tasks_fts_insert': '''
+        CREATE TRIGGER trg_tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, task_description) VALUES (NEW.id, NEW.task_description);
+        END
+    ''',
+    'trg_tasks_fts_delete': '''
+        CREATE TRIGGER trg_tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, task_description)
+            VALUES ('delete', OLD.id, OLD.task_description);
+        END
+    ''',
+    # OF task_description: the outbox trigger's row_version bump doesn't reindex
+    'trg_tasks_fts_update': '''
+        CREATE TRIGGER trg_tasks_fts_update AFTER UPDATE OF task_description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, task_description)
+            VALUES ('delete', OLD.id, OLD.task_description);
+            INSERT INTO tasks_fts (rowid, task_description) VALUES (NEW.id, NEW.task_description);
+        END
+    ''',
+}
+
+SQLITE_FTS_REBUILD_SQL = "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"
+
+POSTGRES_FTS_SQL = [
+    '''
+    ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', task_description)) STORED
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_tasks_search ON tasks USING GIN (search_vector)',
+]
+
+SQLITE_HITS_SQL = '''
+    SELECT t.id, t.user_id, t.date, t.task_description, t.deliverable_url, bm25(tasks_fts) AS score
+    FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+    WHERE tasks_fts MATCH ?{filters}
+'''
+
+POSTGRES_HITS_SQL = '''
+    SELECT t.id, t.user_id, t.date, t.task_description, t.deliverable_url,
+           -ts_rank_cd(t.search_vector, query) AS score
+    FROM tasks t, to_tsquery('english', ?) query
+    WHERE t.search_vector @@ query{filters}
+'''
+
+
+def parse_terms(text):
+    """Search text -> [(words, prefix)]; empty if there is nothing searchable."""
+    terms = []
+    for phrase, token in TERM_RE.findall(text or ''):
+        words = WORD_RE.findall(phrase or token)
+        if words:
+            terms.append((words, bool(token) and token.endswith('*')))
+    return terms
+
+
+def sqlite_match(terms):
+    return ' '.join(f'''"{' '.join(words)}"{'*' if prefix else ''}''' for words, prefix in terms)
+
+
+def postgres_tsquery(terms):
+    return ' & '.join(f"({' <-> '.join(words)}{':*' if prefix else ''})" for words, prefix in terms)
+
+
+def encode_rank_cursor(score, row_id):
+    return f"{score!r}:{row_id}"
+
+
+def decode_rank_cursor(cursor):
+    """'score:id' -> (score, id); raises ValueError on garbage."""
+    score, _, row_id = cursor.rpartition(':')
+    return float(score), int(row_id)
+
+
+def search_query(text, postgres, date_from=None, date_to=None, user_id=None,
+                 order="rank", after=None, limit=20):
+    """(sql, params) for one page of hits with SEARCH_COLUMNS.
+
+    Raises ValueError for text with no searchable words or a cursor that
+    doesn't belong to `order`.
+    """
+    terms = parse_terms(text)
+    if not terms:
+        raise ValueError("Nothing to search for")
+    where, params = build_filters(date_from, date_to, user_id)
+    filters = where.replace(' WHERE ', ' AND ', 1)
+    hits = (POSTGRES_HITS_SQL if postgres else SQLITE_HITS_SQL).format(filters=filters)
+    params = [postgres_tsquery(terms) if postgres else sqlite_match(terms)] + params
+
+    keyset = ''
+    if order == "rank":
+        order_by = 'score, id'
+        if after:
+            score, after_id = decode_rank_cursor(after)
+            keyset = ' WHERE (score > CAST(? AS REAL) OR (score = CAST(? AS REAL) AND id > ?))'
+            params += [score, score, after_id]
+    else:
+        order_by = 'date DESC, id DESC'
+        if after:
+            after_date, after_id = decode_cursor(after)
+            keyset = ' WHERE (date < ? OR (date = ? AND id < ?))'
+            params += [after_date, after_date, after_id]
+
+    sql = f'''
+        SELECT id, user_id, {STAFF_NAME_SQL.format(table='hits')}, date, task_description,
+               deliverable_url, score
+        FROM ({hits}) hits{keyset}
+        ORDER BY {order_by}
+        LIMIT {int(limit)}
+    '''
+    return sql, params
+
+
+def next_cursor(rows, order, limit):
+    """Cursor for the page after `rows`, or None if this was the last page."""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    if order == "rank":
+        return encode_rank_cursor(last[SEARCH_COLUMNS.index("score")], last[0])
+    return encode_cursor(last[SEARCH_COLUMNS.index("date")], last[0])
@@ -0,0 +1,89 @@
+"""
+Fast JSON encoding for API responses.
+
+Endpoints describe their output once as a RowEncoder — one (key, converter)
+pair per cursor column — and encode rows straight from the driver's tuples.
+Only the columns that need it (dates on Postgres, rounding) are converted;
+everything else is passed through, and the payload is turned into bytes by
+orjson instead of FastAPI's generic jsonable_encoder + json.dumps walk.
+
+`?format=columnar` returns {"columns": [...], "rows": [[...], ...]}, which
+skips building a dict per row entirely and is much smaller on the wire.
+"""
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback keeps the API working without orjson
+    orjson = None
+    import json
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def json_response(payload, headers=None):
+    """Return pre-encoded JSON, bypassing FastAPI's response serialization."""
+    return FastJSONResponse(payload, headers=headers)
+
+
+# ─── Column converters ───────────────────────────────────────────────────────
+
+def to_str(value):
+    return str(value)
+
+
+def to_str_or_none(value):
+    return str(value) if value else None
+
+
+def round1(value):
+    return round(value, 1) if value else 0
+
+
+class RowEncoder:
+    """Precomputed per-endpoint mapping of cursor columns to JSON keys.
+
+    `spec` is a list of (key, converter) in cursor column order; converter
+    is None for values that are already JSON-ready.
+    """
+
+    def __init__(self, spec):
+        self.columns = [key for key, _ in spec]
+        self._converters = [(i, fn) for i, (_, fn) in enumerate(spec) if fn is not None]
+
+    def values(self, rows):
+        """Rows as JSON-ready sequences (tuples pass through untouched when possible)."""
+        converters = self._converters
+        if not converters:
+            return [tuple(row) for row in rows] if rows and not isinstance(rows[0], tuple) else rows
+        out = []
+        for row in rows:
+            row = list(row)
+            for i, fn in converters:
+                row[i] = fn(row[i])
+            out.append(row)
+        return out
+
+    def records(self, rows):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.values(rows)]
+
+    def columnar(self, rows):
+        return {"columns": self.columns, "rows": self.values(rows)}
+
+    def encode(self, rows, columnar=False, **extra):
+        """{"data": [...]} (or the columnar form) plus any extra top-level keys."""
+        payload = self.columnar(rows) if columnar else {"data": self.records(rows)}
+        payload.update(extra)
+        return payload
@@ -0,0 +1,396 @@
+"""
+Incremental Google Sheets export of the attendance and tasks tables.
+
+Each table maps to one tab with a header row, and every database row owns a
+fixed sheet row. A small local SQLite state file remembers which sheet row
+each record id was written to, a digest of the cells written there, and per
+table the change_outbox position and staff.updated_at it reflects and the
+next free sheet row.
+A sync reads the outbox records past that position (src/outbox.py; the
+capture triggers see every write, including ones that bypass AttendanceDB),
+re-reads just those rows by id (plus the rows of anyone renamed in staff),
+then:
+
+  1. patches rows whose digest changed and blanks rows that were deleted,
+     in one values.batchUpdate;
+  2. writes rows it has never seen below the last written row with
+     values.append (OVERWRITE at an explicit row, so a retry is idempotent).
+
+Outbox delivery is at-least-once and replaying a record is harmless: the row
+is re-read and only written if its cells differ. A full rewrite (clear +
+write everything) happens only on demand, on the first sync, when the
+spreadsheet or the columns change, when records it had not read were pruned,
+or when most of a tab changed at once (fewer requests than patching). New
+rows land in id order, so the tabs are in insertion order rather than sorted
+by date.
+
+FakeSpreadsheet stands in for the googleapiclient `spreadsheets()` resource
+so the exporter can be exercised without credentials or quota.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+
+from src.outbox import OutboxConsumer, OutboxGap
+
+TABLES = {
+    'attendance': {
+        'sheet': 'Attendance',
+        'columns': ['user_id', 'name', 'date', 'time_in', 'time_out', 'hours_worked', 'status', 'created_at'],
+    },
+    'tasks': {
+        'sheet': 'Tasks',
+        'columns': ['user_id', 'name', 'date', 'task_description', 'has_link', 'deliverable_url', 'created_at'],
+    },
+}
+
+APPEND_CHUNK = 5000     # rows per values.append request
+PATCH_CHUNK = 500       # ranges per values.batchUpdate request
+QUERY_CHUNK = 500       # parameters per IN (...) list
+REWRITE_FRACTION = 0.5  # rewrite instead once this share of a tab's rows changed
+
+STATE_VERSION = 3       # PRAGMA user_version; older state files are discarded
+STATE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sync_meta (
+        table_name TEXT PRIMARY KEY,
+        spreadsheet_id TEXT NOT NULL,
+        header TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        next_row INTEGER NOT NULL,
+        staff_stamp TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sheet_rows (
+        table_name TEXT NOT NULL,
+        record_id INTEGER NOT NULL,
+        sheet_row INTEGER NOT NULL,
+        digest TEXT NOT NULL,
+        PRIMARY KEY (table_name, record_id)
+    );
+'''
+
+
+def to_cells(row):
+    """Database values -> JSON-safe cell values (dates and timestamps as text)."""
+    return ['' if value is None else value if isinstance(value, (str, int, float)) else str(value)
+            for value in row]
+
+
+def digest(cells):
+    return hashlib.blake2b(json.dumps(cells).encode(), digest_size=8).hexdigest()
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SheetsExporter:
+    """Keeps the TABLES tabs of one spreadsheet in step with an AttendanceDB."""
+
+    def __init__(self, db, spreadsheet, spreadsheet_id, state_path):
+        self.db = db
+        self.spreadsheet = spreadsheet
+        self.spreadsheet_id = spreadsheet_id
+        self.state = sqlite3.connect(state_path)
+        if self.state.execute('PRAGMA user_version').fetchone()[0] != STATE_VERSION:
+            self.state.executescript('DROP TABLE IF EXISTS sync_meta; DROP TABLE IF EXISTS sheet_rows;')
+            self.state.execute(f'PRAGMA user_version = {STATE_VERSION}')
+        self.state.executescript(STATE_SCHEMA)
+        # The database-side checkpoint only holds back outbox pruning; the
+        # position that matters is the one committed with the sheet state
+        self.consumer = OutboxConsumer(db, f"sheets:{spreadsheet_id}", tables=TABLES, start='latest')
+
+    def sync(self, full=False):
+        """Bring every tab up to date. Returns {table: stats}, empty when nothing changed."""
+        meta = {table: self.state.execute('''
+            SELECT spreadsheet_id, header, position, next_row, staff_stamp FROM sync_meta WHERE table_name = ?
+        ''', (table,)).fetchone() for table in TABLES}
+        reasons = {}
+        for table, table_meta in meta.items():
+            if full:
+                reasons[table] = 'requested'
+            elif table_meta is None:
+                reasons[table] = 'first sync'
+            elif table_meta[0] != self.spreadsheet_id or table_meta[1] != json.dumps(TABLES[table]['columns']):
+                reasons[table] = 'spreadsheet or columns changed'
+
+        changed = {table: set() for table in TABLES}
+        after = min((table_meta[2] for table, table_meta in meta.items() if table not in reasons), default=None)
+        read_through = after
+        if after is not None:
+            try:
+                while True:
+                    records = self.consumer.poll(after=read_through)
+                    for record in records:
+                        if record.id > meta[record.table_name][2]:
+                            changed[record.table_name].add(record.pk)
+                    if self.consumer.read_through == read_through:
+                        break
+                    read_through = self.consumer.read_through
+            except OutboxGap:
+                reasons.update((table, 'outbox records were pruned') for table in TABLES if table not in reasons)
+
+        stats = {}
+        conn = self.db._get_conn()
+        try:
+            cursor = conn.cursor()
+            # Renames touch only staff (outside the outbox); their rows are re-checked here
+            cursor.execute('SELECT MAX(updated_at) FROM staff')
+            staff_stamp = cursor.fetchone()[0] or ''
+            if not reasons and read_through == after and all(meta[table][4] == staff_stamp for table in TABLES):
+                return {}
+            for table, record_ids in changed.items():
+                if table in reasons:
+                    continue
+                record_ids.update(self._renamed_records(cursor, table, meta[table][4]))
+                exported = self.state.execute('SELECT COUNT(*) FROM sheet_rows WHERE table_name = ?', (table,)).fetchone()[0]
+                if len(record_ids) > max(exported * REWRITE_FRACTION, APPEND_CHUNK):
+                    reasons[table] = f"{len(record_ids)} of {exported} rows changed"
+
+            for table in TABLES:
+                if table in reasons:
+                    stats[table] = self._rewrite(cursor, table)
+                    stats[table]['reason'] = reasons[table]
+                else:
+                    stats[table] = self._incremental(cursor, table, changed[table], meta[table][3],
+                                                     read_through, staff_stamp)
+        finally:
+            conn.close()
+        self.consumer.ack(min(position for position, in self.state.execute('SELECT position FROM sync_meta')))
+        return stats
+
+    # ─── Reads ─────────────────────────────────────────────────────────────────
+
+    def _select(self, table):
+        columns = ', '.join('s.name' if column == 'name' else f't.{column}' for column in TABLES[table]['columns'])
+        return f"SELECT t.id, {columns} FROM {table} t JOIN staff s ON s.user_id = t.user_id"
+
+    def _renamed_records(self, cursor, table, since):
+        """Ids of rows belonging to staff updated after `since`."""
+        cursor.execute(self.db._fix_sql('SELECT user_id FROM staff WHERE updated_at > ?'), (since,))
+        user_ids = [user_id for user_id, in cursor.fetchall()]
+        record_ids = []
+        for batch in chunks(user_ids, QUERY_CHUNK):
+            placeholders = ', '.join('?' for _ in batch)
+            cursor.execute(self.db._fix_sql(f"SELECT id FROM {table} WHERE user_id IN ({placeholders})"), batch)
+            record_ids.extend(record_id for record_id, in cursor.fetchall())
+        return record_ids
+
+    # ─── Writes ────────────────────────────────────────────────────────────────
+
+    def _incremental(self, cursor, table, record_ids, next_row, position, staff_stamp):
+        """Patch, blank and append the rows behind record_ids; the tab then reflects `position`."""
+        sheet = TABLES[table]['sheet']
+        rows, known = {}, {}
+        for ids in chunks(sorted(record_ids), QUERY_CHUNK):
+            placeholders = ', '.join('?' for _ in ids)
+            cursor.execute(self.db._fix_sql(f"{self._select(table)} WHERE t.id IN ({placeholders})"), ids)
+            rows.update((row[0], row) for row in cursor.fetchall())
+            known.update((record_id, (sheet_row, old_digest)) for record_id, sheet_row, old_digest in self.state.execute(f'''
+                SELECT record_id, sheet_row, digest FROM sheet_rows
+                WHERE table_name = ? AND record_id IN ({placeholders})
+            ''', (table, *ids)))
+
+        patches, appends = [], []
+        for record_id in sorted(rows):
+            cells = to_cells(rows[record_id][1:])
+            row_digest = digest(cells)
+            if record_id not in known:
+                appends.append((record_id, cells, row_digest))
+            elif known[record_id][1] != row_digest:
+                patches.append((record_id, known[record_id][0], cells, row_digest))
+        deleted = [(record_id, known[record_id][0]) for record_id in sorted(known) if record_id not in rows]
+
+        requests = 0
+        blank = [''] * len(TABLES[table]['columns'])
+        updates = ([(sheet_row, cells) for _, sheet_row, cells, _ in patches]
+                   + [(sheet_row, blank) for _, sheet_row in deleted])
+        for batch in chunks(updates, PATCH_CHUNK):
+            self.spreadsheet.values().batchUpdate(spreadsheetId=self.spreadsheet_id, body={
+                'valueInputOption': 'RAW',
+                'data': [{'range': f"{sheet}!A{sheet_row}", 'values': [cells]} for sheet_row, cells in batch],
+            }).execute()
+            requests += 1
+        requests += self._append(sheet, next_row, [cells for _, cells, _ in appends])
+
+        self.state.executemany('''
+            UPDATE sheet_rows SET digest = ? WHERE table_name = ? AND record_id = ?
+        ''', [(row_digest, table, record_id) for record_id, _, _, row_digest in patches])
+        self.state.executemany('DELETE FROM sheet_rows WHERE table_name = ? AND record_id = ?',
+                               [(table, record_id) for record_id, _ in deleted])
+        self._remember(table, next_row, [(record_id, row_digest) for record_id, _, row_digest in appends])
+        self.state.execute('''
+            UPDATE sync_meta SET position = ?, next_row = ?, staff_stamp = ? WHERE table_name = ?
+        ''', (position, next_row + len(appends), staff_stamp, table))
+        self.state.commit()
+        return {'appended': len(appends), 'patched': len(patches), 'blanked': len(deleted), 'requests': requests}
+
+    def _rewrite(self, cursor, table):
+        """Clear the tab and write the header plus every row, streaming from the database."""
+        sheet = TABLES[table]['sheet']
+        header = TABLES[table]['columns']
+        # Take the outbox head and staff stamp before reading rows, so nothing
+        # written meanwhile is missed
+        position = self.consumer.head()
+        cursor.execute('SELECT MAX(updated_at) FROM staff')
+        staff_stamp = cursor.fetchone()[0] or ''
+        self.spreadsheet.values().clear(spreadsheetId=self.spreadsheet_id, range=sheet).execute()
+        self.spreadsheet.values().update(spreadsheetId=self.spreadsheet_id, range=f"{sheet}!A1",
+                                         valueInputOption='RAW', body={'values': [header]}).execute()
+        self.state.execute('DELETE FROM sheet_rows WHERE table_name = ?', (table,))
+
+        requests, next_row = 2, 2
+        cursor.execute(f"{self._select(table)} ORDER BY t.id")
+        while True:
+            rows = cursor.fetchmany(APPEND_CHUNK)
+            if not rows:
+                break
+            cells = [to_cells(row[1:]) for row in rows]
+            requests += self._append(sheet, next_row, cells)
+            self._remember(table, next_row, [(row[0], digest(row_cells)) for row, row_cells in zip(rows, cells)])
+            next_row += len(rows)
+
+        self.state.execute('''
+            INSERT OR REPLACE INTO sync_meta (table_name, spreadsheet_id, header, position, next_row, staff_stamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (table, self.spreadsheet_id, json.dumps(header), position, next_row, staff_stamp))
+        self.state.commit()
+        return {'appended': next_row - 2, 'patched': 0, 'blanked': 0, 'requests': requests, 'full': True}
+
+    def _append(self, sheet, first_row, values):
+        """Write rows from first_row down (growing the grid as needed). Returns the request count."""
+        requests = 0
+        for offset, batch in enumerate(chunks(values, APPEND_CHUNK)):
+            self.spreadsheet.values().append(
+                spreadsheetId=self.spreadsheet_id, range=f"{sheet}!A{first_row + offset * APPEND_CHUNK}",
+                valueInputOption='RAW', insertDataOption='OVERWRITE', body={'values': batch},
+            ).execute()
+            requests += 1
+        return requests
+
+    def _remember(self, table, first_row, records):
+        self.state.executemany('''
+            INSERT OR REPLACE INTO sheet_rows (table_name, record_id, sheet_row, digest)
+            VALUES (?, ?, ?, ?)
+        ''', [(table, record_id, first_row + i, row_digest) for i, (record_id, row_digest) in enumerate(records)])
+
+    def expected_rows(self, table):
+        """Every row as cells, straight from the database (for checking a sheet)."""
+        conn = self.db._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"{self._select(table)} ORDER BY t.id")
+            return [to_cells(row[1:]) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+
+# ─── Local fake ──────────────────────────────────────────────────────────────
+
+class FakeSheetsError(Exception):
+    pass
+
+
+class _Request:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class FakeSpreadsheet:
+    """
+    In-memory stand-in for `build('sheets', 'v4').spreadsheets()` covering the
+    values calls the exporter makes (get, clear, update, append, batchUpdate).
+
+    Ranges are 'Tab', 'Tab!A<row>' or 'Tab!A<row>:<col>'. Like the real API,
+    update/batchUpdate fail past the grid (grid_rows per tab) while append
+    grows it. `requests` and `cells_written` count the traffic.
+    """
+
+    def __init__(self, grid_rows=1000):
+        self.grid_rows = grid_rows
+        self.tabs = {}          # tab -> list of rows (lists of cells), index 0 is row 1
+        self.grids = {}         # tab -> current row limit
+        self.requests = 0
+        self.cells_written = 0
+
+    def values(self):
+        return _FakeValues(self)
+
+    def rows(self, tab):
+        """Non-blank rows below the header."""
+        return [row for row in self.tabs.get(tab, [])[1:] if any(cell != '' for cell in row)]
+
+    def _parse(self, range_name):
+        tab, _, cell = range_name.partition('!')
+        match = re.fullmatch(r'A(\d+)(:[A-Z]+\d*)?', cell) if cell else None
+        if cell and not match:
+            raise FakeSheetsError(f"unsupported range {range_name!r}")
+        self.tabs.setdefault(tab, [])
+        self.grids.setdefault(tab, self.grid_rows)
+        return tab, int(match.group(1)) if match else 1
+
+    def _write(self, tab, first_row, values, grow=False):
+        last_row = first_row + len(values) - 1
+        if last_row > self.grids[tab]:
+            if not grow:
+                raise FakeSheetsError(f"Range ({tab}!A{last_row}) exceeds grid limits. Max rows: {self.grids[tab]}")
+            self.grids[tab] = last_row
+        rows = self.tabs[tab]
+        rows.extend([] for _ in range(last_row - len(rows)))
+        for i, row in enumerate(values):
+            rows[first_row - 1 + i] = list(row)
+            self.cells_written += len(row)
+
+
+class _FakeValues:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def _request(self, fn):
+        self.spreadsheet.requests += 1
+        return _Request(fn)
+
+    def get(self, spreadsheetId, range):
+        tab, first_row = self.spreadsheet._parse(range)
+        return self._request(lambda: {'range': range, 'values': self.spreadsheet.tabs[tab][first_row - 1:]})
+
+    def clear(self, spreadsheetId, range, body=None):
+        def run():
+            tab, first_row = self.spreadsheet._parse(range)
+            del self.spreadsheet.tabs[tab][first_row - 1:]
+            return {'clearedRange': range}
+        return self._request(run)
+
+    def update(self, spreadsheetId, range, valueInputOption, body):
+        def run():
+            tab, first_row = self.spreadsheet._parse(range)
+            self.spreadsheet._write(tab, first_row, body['values'])
+            return {'updatedRows': len(body['values'])}
+        return self._request(run)
+
+    def append(self, spreadsheetId, range, valueInputOption, body, insertDataOption='OVERWRITE'):
+        def run():
+            tab, row = self.spreadsheet._parse(range)
+            rows = self.spreadsheet.tabs[tab]
+            # The API appends after the table found at the range, i.e. the first empty row from there
+            while row <= len(rows) and any(cell != '' for cell in rows[row - 1]):
+                row += 1
+            self.spreadsheet._write(tab, row, body['values'], grow=True)
+            return {'updates': {'updatedRange': f"{tab}!A{row}", 'updatedRows': len(body['values'])}}
+        return self._request(run)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            # Validate every range first: the real call is all-or-nothing
+            targets = [(*self.spreadsheet._parse(data['range']), data['values']) for data in body['data']]
+            for tab, first_row, values in targets:
+                if first_row + len(values) - 1 > self.spreadsheet.grids[tab]:
+                    raise FakeSheetsError(f"Range ({tab}!A{first_row}) exceeds grid limits")
+            for tab, first_row, values in targets:
+                self.spreadsheet._write(tab, first_row, values)
+            return {'totalUpdatedRows': sum(len(values) for _, _, values in targets)}
+        return self._request(run)
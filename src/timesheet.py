@@ -0,0 +1,87 @@
+"""
+Per-employee timesheets.
+
+Rows come from a (user_id, date) range scan on the covering index
+idx_attendance_timesheet, already in (date, time_in) order; this module
+turns them into daily rows plus weekly/monthly subtotals. Shared by the API
+endpoint and the bot's !timesheet command.
+"""
+from datetime import date, datetime
+
+from src.periods import period_keys
+
+TIMESHEET_COLUMNS = ["date", "time_in", "time_out", "break_start", "break_end",
+                     "break_duration", "hours_worked", "status", "started_at", "ended_at"]
+
+TIMESHEET_SQL = '''
+    SELECT date, time_in, time_out, break_start, break_end,
+           break_duration, hours_worked, status, started_at, ended_at
+    FROM attendance
+    WHERE user_id = ? AND date >= ? AND date <= ?
+    ORDER BY date, time_in
+'''
+
+
+def _subtotal(bucket, key_name, key):
+    hours = round(bucket["hours"], 2)
+    return {
+        key_name: key,
+        "start": str(bucket["start"]),
+        "end": str(bucket["end"]),
+        "days_worked": len(bucket["days"]),
+        "total_hours": hours,
+        "break_hours": round(bucket["breaks"], 2),
+        "avg_hours_per_day": round(hours / len(bucket["days"]), 2) if bucket["days"] else 0,
+    }
+
+
+def build_timesheet(rows, date_from, date_to):
+    """Daily rows + weekly/monthly subtotals + totals for one person.
+
+    Only 'complete' rows count towards hours; open rows (clocked_in /
+    on_break) are listed but not totalled.
+    """
+    days = []
+    weeks, months = {}, {}
+    total = {"start": date_from, "end": date_to, "days": set(), "hours": 0.0, "breaks": 0.0}
+
+    for row in rows:
+        record = dict(zip(TIMESHEET_COLUMNS, row))
+        day = date.fromisoformat(str(record["date"]))
+        for column in ("date", "time_in", "time_out", "break_start", "break_end"):
+            if record[column] is not None:
+                record[column] = str(record[column])
+        for column in ("started_at", "ended_at"):
+            if isinstance(record[column], datetime):
+                record[column] = record[column].isoformat()
+        days.append(record)
+        if record["status"] != "complete":
+            continue
+        hours = record["hours_worked"] or 0
+        breaks = record["break_duration"] or 0
+        for buckets, key in zip((weeks, months), period_keys(day)):
+            bucket = buckets.setdefault(key, {"start": day, "end": day, "days": set(),
+                                              "hours": 0.0, "breaks": 0.0})
+            bucket["start"], bucket["end"] = min(bucket["start"], day), max(bucket["end"], day)
+            bucket["days"].add(day)
+            bucket["hours"] += hours
+            bucket["breaks"] += breaks
+        total["days"].add(day)
+        total["hours"] += hours
+        total["breaks"] += breaks
+
+    monthly = []
+    for key, bucket in sorted(months.items()):
+        entry = _subtotal(bucket, "month", key)
+        entry["month_name"] = datetime.strptime(key, '%Y-%m').strftime('%B %Y')
+        monthly.append(entry)
+
+    totals = _subtotal(total, "range", f"{date_from}..{date_to}")
+    return {
+        "from": str(date_from),
+        "to": str(date_to),
+        "days": days,
+        "weekly": [_subtotal(bucket, "week", key) for key, bucket in sorted(weeks.items())],
+        "monthly": monthly,
+        "totals": totals,
+    }
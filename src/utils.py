@@ -1,4 +1,40 @@
-from datetime import datetime
+import os
+import json
+
+from src.clock import clock_span, parse_clock
+
+# Regex patterns for parsing report messages (used by the bot's on_message)
+TIME_IN_PATTERN = r'Time [Ii]n:?\s*(\d{1,2}:\d{2}\s*[AP]M)'
+TIME_OUT_PATTERN = r'Time [Oo]ut:?\s*(\d{1,2}:\d{2}\s*[AP]M)'
+NAME_PATTERN = r'Name:?\s*([A-Za-z\s]+)'
+DATE_PATTERN = r'Date:?\s*(\d{1,2}\s+\w+\s+\d{4})'
+BREAK_START_PATTERN = r'[Oo]n [Bb]reak:?\s*(\d{1,2}:\d{2}\s*[APap][Mm])'
+BREAK_END_PATTERN = r'[Bb]ack [Ff]rom [Bb]reak:?\s*(\d{1,2}:\d{2}\s*[APap][Mm])'
+
+_json_cache = {}
+
+def load_json_cached(path, default=None):
+    """
+    Parse a JSON file once and re-read it only when its mtime changes
+    
+    Args:
+        path: JSON file path
+        default: Returned when the file doesn't exist
+    
+    Returns:
+        Parsed JSON (shared between callers - don't mutate it)
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return default
+    cached = _json_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r') as f:
+        data = json.load(f)
+    _json_cache[path] = (mtime, data)
+    return data
 
 def calculate_hours(time_in_str, time_out_str, deduct_lunch=False):
     """
@@ -12,26 +48,15 @@ def calculate_hours(time_in_str, time_out_str, deduct_lunch=False):
     Returns:
         float: hours worked
     """
-    try:
-        # Parse time strings
-        time_in = datetime.strptime(time_in_str.strip(), '%I:%M %p')
-        time_out = datetime.strptime(time_out_str.strip(), '%I:%M %p')
-        
-        # Handle case where time_out is before time_in (crossed midnight)
-        if time_out < time_in:
-            # Add 24 hours to time_out
-            from datetime import timedelta
-            time_out = time_out + timedelta(hours=24)
-        
-        # Calculate difference
-        time_diff = time_out - time_in
-        hours = time_diff.total_seconds() / 3600
-        
-        return round(hours, 2)
-    
-    except Exception as e:
-        print(f"❌ Error calculating hours: {e}")
+    # Table lookup instead of strptime (see src/clock.py)
+    time_in = parse_clock(time_in_str)
+    time_out = parse_clock(time_out_str)
+    if time_in is None or time_out is None:
+        print(f"❌ Error calculating hours: can't read {time_in_str!r} → {time_out_str!r}")
         return 0.0
+    
+    # clock_span rolls past midnight when time_out is before time_in
+    return round(clock_span(time_in, time_out) / 60, 2)
 
 def extract_tasks(message_content):
     """